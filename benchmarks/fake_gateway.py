@@ -0,0 +1,388 @@
+# benchmarks/fake_gateway.py
+"""Synthetic stand-ins for the discord.py objects LoggerCog touches.
+
+Only the attributes the event specs, MessageCache and the embed builder read
+are modelled, which keeps object construction cheap enough that the
+benchmark measures the logging pipeline rather than the fakes.
+"""
+import asyncio
+import random
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import discord
+
+# Discord snowflakes for "now"; ids only need to be unique and increasing
+_DISCORD_EPOCH_MS = 1420070400000
+
+
+def snowflake(seq: int) -> int:
+    return ((int(time.time() * 1000) - _DISCORD_EPOCH_MS) << 22) | (seq & 0x3FFFFF)
+
+
+class FakeAsset:
+    __slots__ = ("url",)
+
+    def __init__(self, url: str):
+        self.url = url
+
+    def __eq__(self, other):
+        return isinstance(other, FakeAsset) and other.url == self.url
+
+    def __hash__(self):
+        return hash(self.url)
+
+
+class FakeUser:
+    def __init__(self, id: int, name: str, bot: bool = False):
+        self.id = id
+        self.name = name
+        self.bot = bot
+        self.avatar = FakeAsset(f"https://cdn.discordapp.com/avatars/{id}/a.png")
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    @property
+    def display_avatar(self) -> FakeAsset:
+        return self.avatar
+
+    def __str__(self):
+        return self.name
+
+
+class FakeRole:
+    def __init__(self, id: int, name: str, guild):
+        self.id = id
+        self.name = name
+        self.guild = guild
+        self.color = discord.Color.default()
+        self.permissions = discord.Permissions.none()
+        self.hoist = False
+        self.mentionable = False
+
+    @property
+    def mention(self) -> str:
+        return f"<@&{self.id}>"
+
+    def copy(self, **changes) -> "FakeRole":
+        role = FakeRole(self.id, self.name, self.guild)
+        role.color, role.permissions = self.color, self.permissions
+        role.hoist, role.mentionable = self.hoist, self.mentionable
+        for key, value in changes.items():
+            setattr(role, key, value)
+        return role
+
+
+class FakeMember(FakeUser):
+    def __init__(self, user: FakeUser, guild, nick: str | None = None, roles=None):
+        super().__init__(user.id, user.name, user.bot)
+        self.avatar = user.avatar
+        self.guild = guild
+        self.nick = nick
+        self.roles = list(roles or [])
+
+    def copy(self, **changes) -> "FakeMember":
+        member = FakeMember(self, self.guild, self.nick, self.roles)
+        for key, value in changes.items():
+            setattr(member, key, value)
+        return member
+
+
+class FakeChannel:
+    def __init__(self, id: int, name: str, guild=None):
+        self.id = id
+        self.name = name
+        self.guild = guild
+        self.topic = None
+        self.category = None
+        self.overwrites = {}
+
+    @property
+    def mention(self) -> str:
+        return f"<#{self.id}>"
+
+
+class FakeGuild:
+    def __init__(self, id: int, name: str):
+        self.id = id
+        self.name = name
+        self._members: dict[int, FakeMember] = {}
+        self.channels: list[FakeChannel] = []
+        self.voice_channels: list[FakeChannel] = []
+        self.roles: list[FakeRole] = []
+        self.me = None
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    def get_member(self, user_id: int):
+        return self._members.get(user_id)
+
+    def get_channel_or_thread(self, channel_id: int):
+        for channel in self.channels:
+            if channel.id == channel_id:
+                return channel
+        return None
+
+
+class FakeMessage:
+    def __init__(self, id: int, channel: FakeChannel, author: FakeMember, content: str):
+        self.id = id
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.attachments = []
+        self.created_at = datetime.now(timezone.utc)
+        self.edited_at = None
+
+    @property
+    def jump_url(self) -> str:
+        return f"https://discord.com/channels/{self.guild.id}/{self.channel.id}/{self.id}"
+
+
+class _FakeResponse:
+    status = 429
+    reason = "Too Many Requests"
+
+
+class FakeLogChannel:
+    """Log channel whose send() takes `latency` seconds and enforces Discord's per-channel limit.
+
+    More than `limit` messages in `per` seconds raises a 429 HTTPException
+    carrying `retry_after`, like the real API once discord.py's own bucket
+    handling is exhausted; `error_rate` adds random 429s on top. Delivery
+    time of every embed (relative to the embed timestamp, i.e. when the
+    log entry was created) is recorded in `latencies`.
+    """
+
+    def __init__(self, id: int = 1, name: str = "sentry-logs", latency: float = 0.05, limit: int = 5,
+                 per: float = 5.0, error_rate: float = 0.0, seed: int = 0):
+        self.id = id
+        self.name = name
+        self.latency = latency
+        self.limit = limit
+        self.per = per
+        self.error_rate = error_rate
+        self._sent = deque()
+        self._random = random.Random(seed)
+        self.messages = 0
+        self.embeds = 0
+        self.rate_limited = 0
+        self.latencies: list[float] = []
+
+    async def send(self, content=None, *, embed=None, embeds=None):
+        await asyncio.sleep(self.latency)
+        now = time.monotonic()
+        while self._sent and now - self._sent[0] > self.per:
+            self._sent.popleft()
+        if len(self._sent) >= self.limit or (self.error_rate and self._random.random() < self.error_rate):
+            self.rate_limited += 1
+            retry_after = max(0.05, self.per - (now - self._sent[0])) if self._sent else self.per
+            error = discord.HTTPException(_FakeResponse(), {"message": "You are being rate limited.",
+                                                            "retry_after": retry_after, "code": 0})
+            error.retry_after = retry_after
+            raise error
+        self._sent.append(now)
+        embeds = embeds or ([embed] if embed else [])
+        self.messages += 1
+        self.embeds += len(embeds)
+        # Log embeds carry the naive UTC creation time; discord.Embed only attaches a tzinfo
+        delivered = datetime.utcnow()
+        for e in embeds:
+            if e.timestamp is not None:
+                self.latencies.append((delivered - e.timestamp.replace(tzinfo=None)).total_seconds())
+
+
+class FakeBot:
+    """The subset of LoggingBot that LoggerCog and its helpers use.
+
+    dispatch() schedules one task per listener like discord.py does; the
+    tasks are tracked so the benchmark can wait for all of them.
+    """
+
+    def __init__(self, config: dict, log_channel: FakeLogChannel):
+        self.config = config
+        self.user = FakeUser(1, "sentry", bot=True)
+        self.guilds: list[FakeGuild] = []
+        self.latency = 0.05
+        self._event_counters = defaultdict(int)
+        self._listeners: dict[str, list] = defaultdict(list)
+        self._log_channel = log_channel
+        self._tasks: set[asyncio.Task] = set()
+        self._cogs = {}
+        self.listener_errors = 0
+
+    # --- listener registry (discord.ext.commands.Bot API) ---
+
+    def add_listener(self, func, name: str):
+        self._listeners[name].append(func)
+
+    def remove_listener(self, func, name: str):
+        try:
+            self._listeners[name].remove(func)
+        except ValueError:
+            pass
+
+    def dispatch(self, event: str, *args):
+        for listener in self._listeners.get(f"on_{event}", ()):
+            task = asyncio.create_task(self._run_listener(listener, args))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_listener(self, listener, args):
+        try:
+            await listener(*args)
+        except Exception:
+            self.listener_errors += 1
+
+    async def wait_listeners(self):
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    @property
+    def pending_listeners(self) -> int:
+        return len(self._tasks)
+
+    # --- cache lookups ---
+
+    def get_channel(self, channel_id: int):
+        return self._log_channel if channel_id == self._log_channel.id else None
+
+    async def fetch_channel(self, channel_id: int):
+        return self.get_channel(channel_id)
+
+    def get_guild(self, guild_id: int):
+        for guild in self.guilds:
+            if guild.id == guild_id:
+                return guild
+        return None
+
+    def get_user(self, user_id: int):
+        for guild in self.guilds:
+            member = guild.get_member(user_id)
+            if member is not None:
+                return member
+        return None
+
+    def get_cog(self, name: str):
+        return self._cogs.get(name)
+
+
+class SyntheticGateway:
+    """Generates a reproducible stream of gateway events from a weighted event mix."""
+
+    # Default mix, roughly what a busy community server produces
+    DEFAULT_MIX = {
+        "message": 60,
+        "raw_message_edit": 8,
+        "raw_message_delete": 8,
+        "raw_bulk_message_delete": 0.2,
+        "member_join": 4,
+        "raw_member_remove": 3,
+        "member_update": 6,
+        "voice_state_update": 8,
+        "guild_role_update": 0.5,
+        "member_ban": 0.3,
+    }
+
+    def __init__(self, bot: FakeBot, guilds: int = 3, members: int = 2000, channels: int = 8,
+                 mix: dict | None = None, seed: int = 0):
+        self.bot = bot
+        self.random = random.Random(seed)
+        self.mix = mix or self.DEFAULT_MIX
+        self._events = list(self.mix)
+        self._weights = [self.mix[e] for e in self._events]
+        self._seq = 0
+        self._recent: dict[int, deque] = {}
+        self._member_ids: dict[int, list[int]] = {}
+        for g in range(guilds):
+            guild = FakeGuild(10_000 + g, f"guild-{g}")
+            guild.me = FakeMember(bot.user, guild)
+            guild.channels = [FakeChannel(self._next_id(), f"chat-{c}", guild) for c in range(channels)]
+            guild.voice_channels = [FakeChannel(self._next_id(), f"voice-{c}", guild) for c in range(3)]
+            guild.roles = [FakeRole(self._next_id(), f"role-{r}", guild) for r in range(10)]
+            self._member_ids[guild.id] = []
+            for m in range(members):
+                self._add_member(guild)
+            bot.guilds.append(guild)
+            self._recent[guild.id] = deque(maxlen=500)
+
+    def _next_id(self) -> int:
+        self._seq += 1
+        return snowflake(self._seq)
+
+    def _add_member(self, guild: FakeGuild) -> FakeMember:
+        user = FakeUser(self._next_id(), f"user{self._seq}")
+        member = FakeMember(user, guild, roles=self.random.sample(guild.roles, 2))
+        guild._members[member.id] = member
+        self._member_ids[guild.id].append(member.id)
+        return member
+
+    def _member(self, guild: FakeGuild) -> FakeMember:
+        return guild._members[self.random.choice(self._member_ids[guild.id])]
+
+    def _remove_member(self, guild: FakeGuild) -> FakeMember:
+        ids = self._member_ids[guild.id]
+        i = self.random.randrange(len(ids))
+        ids[i], ids[-1] = ids[-1], ids[i]
+        return guild._members.pop(ids.pop())
+
+    def _text(self) -> str:
+        words = ("raid", "hello", "gg", "anyone", "up", "for", "a", "game", "tonight", "lol", "link", "thanks")
+        return " ".join(self.random.choice(words) for _ in range(self.random.randint(3, 25)))
+
+    def next_events(self) -> list[tuple[str, tuple]]:
+        """Return the (event, args) pairs discord.py would dispatch for one synthetic gateway event."""
+        kind = self.random.choices(self._events, self._weights)[0]
+        guild = self.random.choice(self.bot.guilds)
+        recent = self._recent[guild.id]
+
+        if kind == "message" or (kind.startswith("raw_message") and not recent):
+            channel = self.random.choice(guild.channels)
+            message = FakeMessage(self._next_id(), channel, self._member(guild), self._text())
+            recent.append(message)
+            return [("message", (message,))]
+        if kind == "raw_message_edit":
+            message = self.random.choice(recent)
+            edited = FakeMessage(message.id, message.channel, message.author, self._text())
+            edited.edited_at = datetime.now(timezone.utc)
+            payload = SimpleNamespace(message_id=message.id, channel_id=message.channel.id, guild_id=guild.id,
+                                      data={"content": edited.content}, cached_message=None, message=edited)
+            return [(kind, (payload,))]
+        if kind == "raw_message_delete":
+            message = recent.pop()
+            return [(kind, (SimpleNamespace(message_id=message.id, channel_id=message.channel.id, guild_id=guild.id,
+                                            cached_message=None),))]
+        if kind == "raw_bulk_message_delete":
+            count = min(len(recent), self.random.randint(5, 100))
+            purged = [recent.pop() for _ in range(count)]
+            channel = purged[0].channel
+            return [(kind, (SimpleNamespace(message_ids={m.id for m in purged}, channel_id=channel.id,
+                                            guild_id=guild.id, cached_messages=[]),))]
+        if kind == "member_join":
+            return [(kind, (self._add_member(guild),))]
+        if kind == "raw_member_remove":
+            member = self._remove_member(guild)
+            return [("member_remove", (member,)), (kind, (SimpleNamespace(user=member, guild_id=guild.id),))]
+        if kind == "member_update":
+            before = self._member(guild)
+            after = before.copy(nick=f"nick{self._seq}")
+            guild._members[after.id] = after
+            return [(kind, (before, after))]
+        if kind == "voice_state_update":
+            member = self._member(guild)
+            before = SimpleNamespace(channel=self.random.choice([None] + guild.voice_channels))
+            after = SimpleNamespace(channel=self.random.choice([None] + guild.voice_channels))
+            return [(kind, (member, before, after))]
+        if kind == "guild_role_update":
+            before = self.random.choice(guild.roles)
+            return [(kind, (before, before.copy(name=f"{before.name}-x", hoist=not before.hoist)))]
+        if kind == "member_ban":
+            return [(kind, (guild, self._member(guild)))]
+        raise ValueError(f"unknown synthetic event {kind}")
@@ -0,0 +1,157 @@
+# benchmarks/ingest_bench.py
+"""Compare ways of writing log rows to Postgres on the same data set.
+
+- orm:        AsyncSession.add_all(LogEntry(...)) + flush, the pre-writer pattern
+- executemany: the LogWriter INSERT (pg_insert ... ON CONFLICT DO NOTHING RETURNING)
+- copy:       utils.database.copy_log_rows (binary COPY into a staging table)
+
+    python -m benchmarks.ingest_bench --rows 50000 --batch-size 500
+
+Every batch runs in its own transaction, which is rolled back unless
+--commit is given, so the benchmark leaves the logs table untouched. Rows
+are converted to the table form (utils.dimensions) once, before timing, so
+only the write itself is measured. Needs the same POSTGRES_* environment as
+the bot.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+METHODS = ("orm", "executemany", "copy")
+
+_EVENT_MIX = {"message_edit": 30, "message_delete": 25, "voice_join": 10, "voice_leave": 10, "member_join": 8,
+              "nickname_change": 7, "member_remove": 5, "roles_added": 4, "member_ban": 1}
+
+
+def make_rows(count: int, seed: int = 0, guilds: int = 5) -> list[dict]:
+    """Synthetic log rows shaped like what LoggerCog enqueues."""
+    rnd = random.Random(seed)
+    types, weights = list(_EVENT_MIX), list(_EVENT_MIX.values())
+    words = ("raid", "hello", "gg", "anyone", "up", "for", "a", "game", "tonight", "lol", "link", "thanks")
+    start = datetime.utcnow() - timedelta(minutes=10)
+    rows = []
+    for i in range(count):
+        event_type = rnd.choices(types, weights)[0]
+        author = rnd.randrange(10**17, 10**17 + 50000)
+        text = " ".join(rnd.choice(words) for _ in range(rnd.randint(3, 30)))
+        if event_type == "message_edit":
+            details = {"Before": text, "After": text + " (edited)", "Channel": "#general"}
+        elif event_type == "message_delete":
+            details = {"Content": text, "Channel": "#general"}
+        else:
+            details = None
+        rows.append({
+            "event_id": None,
+            "timestamp": start + timedelta(milliseconds=i * 10),
+            "event_type": event_type,
+            "author_id": str(author),
+            "author_name": f"user{author % 50000}",
+            "description": f"<@{author}> {event_type.replace('_', ' ')}.",
+            "guild_id": str(900000000000000000 + rnd.randrange(guilds)),
+            "details": details,
+            "archive": None,
+        })
+    return rows
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def write_batch(method: str, batch: list[dict], commit: bool):
+    import utils.database as udb
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from utils.database import LogEntry, copy_log_rows
+
+    if method == "orm":
+        async with udb.AsyncSessionLocal() as session:
+            session.add_all([LogEntry(**row) for row in batch])
+            await session.flush()
+            await (session.commit() if commit else session.rollback())
+        return
+    async with udb.async_engine.connect() as conn:
+        trans = await conn.begin()
+        if method == "copy":
+            await copy_log_rows(conn, batch)
+        else:
+            stmt = (pg_insert(LogEntry).on_conflict_do_nothing()
+                    .returning(LogEntry.guild_id, LogEntry.event_code, LogEntry.timestamp))
+            (await conn.execute(stmt, batch)).all()
+        await (trans.commit() if commit else trans.rollback())
+
+
+async def run_method(method: str, rows: list[dict], batch_size: int, commit: bool) -> dict:
+    # Fresh event ids, so committed runs don't collide with each other
+    rows = [{**row, "event_id": uuid.uuid4().hex} for row in rows]
+    timings = []
+    start = time.perf_counter()
+    for i in range(0, len(rows), batch_size):
+        t = time.perf_counter()
+        await write_batch(method, rows[i:i + batch_size], commit)
+        timings.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    return {
+        "method": method,
+        "rows": len(rows),
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(len(rows) / max(1e-9, elapsed), 1),
+        "batch_p50_ms": round(percentile(timings, 0.50) * 1000, 2),
+        "batch_p99_ms": round(percentile(timings, 0.99) * 1000, 2),
+    }
+
+
+async def run(args) -> list[dict]:
+    import utils.database as udb
+    from utils.dimensions import Dimensions
+    await udb.init_db_async()
+    rows = await Dimensions().to_db_rows(make_rows(args.rows, seed=args.seed))
+    methods = args.methods or list(METHODS)
+    # Warm up connections, prepared statements and the COPY staging table
+    for method in methods:
+        await run_method(method, rows[:args.batch_size], args.batch_size, commit=False)
+    results = {}
+    for _ in range(args.repeat):
+        for method in methods:
+            result = await run_method(method, rows, args.batch_size, args.commit)
+            best = results.get(method)
+            if best is None or result["rows_per_second"] > best["rows_per_second"]:
+                results[method] = result
+    await udb.async_engine.dispose()
+    baseline = results.get("orm") or next(iter(results.values()))
+    for result in results.values():
+        result["speedup"] = round(result["rows_per_second"] / max(1e-9, baseline["rows_per_second"]), 2)
+    return list(results.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per method; the best one is reported")
+    parser.add_argument("--methods", nargs="*", choices=METHODS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--commit", action="store_true", help="Commit the rows instead of rolling back")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+    print(f"{'method':<12} {'rows/s':>12} {'batch p50':>11} {'batch p99':>11} {'speedup':>8}")
+    for r in results:
+        print(f"{r['method']:<12} {r['rows_per_second']:>12.1f} {r['batch_p50_ms']:>9.2f}ms "
+              f"{r['batch_p99_ms']:>9.2f}ms {r['speedup']:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
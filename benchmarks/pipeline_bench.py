@@ -0,0 +1,249 @@
+# benchmarks/pipeline_bench.py
+"""End-to-end benchmark of the logging pipeline with a synthetic Discord gateway.
+
+Drives the real LoggerCog listeners (event registry, audit cache, message
+cache, burst detector, batched LogWriter, EmbedDispatcher) with fake
+members, messages, roles and voice states, and reports throughput, latency
+and memory.
+
+    python -m benchmarks.pipeline_bench --events 20000
+    python -m benchmarks.pipeline_bench --rate 500 --events 15000 --json
+    python -m benchmarks.pipeline_bench --db postgres   # uses POSTGRES_* like the bot
+
+With `--db sqlite` (default) rows go to a local SQLite file through the same
+writer batching, so runs are comparable without a Postgres server; use
+`--db postgres` to measure the real INSERT path.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY, event_id TEXT UNIQUE, timestamp TEXT, event_type TEXT, author_id TEXT,
+    author_name TEXT, description TEXT, guild_id TEXT, details TEXT, archive BLOB
+)
+"""
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def build_writer_classes():
+    from utils.log_writer import LogWriter
+
+    class TimedLogWriter(LogWriter):
+        """LogWriter that records, per committed row, the time since its log entry was created."""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.latencies: list[float] = []
+            self.first_commit = None
+            self.last_commit = None
+
+        def _record(self, batch: list[dict]):
+            now = datetime.utcnow()
+            self.latencies.extend((now - row["timestamp"]).total_seconds() for row in batch)
+            self.last_commit = time.perf_counter()
+            if self.first_commit is None:
+                self.first_commit = self.last_commit
+
+        async def _insert_rows(self, batch: list[dict]):
+            await super()._insert_rows(batch)
+            self._record(batch)
+
+    class SQLiteLogWriter(TimedLogWriter):
+        """Stand-in that writes batches to SQLite instead of Postgres."""
+
+        def __init__(self, path: str, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._conn = sqlite3.connect(path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(_SQLITE_SCHEMA)
+
+        async def _insert_rows(self, batch: list[dict]):
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO logs (event_id, timestamp, event_type, author_id, author_name, description, "
+                "guild_id, details, archive) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(r["event_id"], r["timestamp"].isoformat(), r["event_type"], r["author_id"], r["author_name"],
+                  r["description"], r["guild_id"], json.dumps(r["details"], default=str) if r["details"] else None,
+                  r.get("archive")) for r in batch])
+            self._conn.commit()
+            self._record(batch)
+
+    return TimedLogWriter, SQLiteLogWriter
+
+
+async def run(args) -> dict:
+    from benchmarks.fake_gateway import FakeBot, FakeLogChannel, SyntheticGateway
+    from cogs.logger_cog import LoggerCog, LOG_EVENTS
+    from utils.audit_cache import AuditLogCache
+    from utils.embed_dispatcher import EmbedDispatcher
+    from utils.loop_monitor import LoopLagMonitor
+    from utils.member_index import MemberIndex
+    from utils.message_cache import MessageCache
+
+    TimedLogWriter, SQLiteLogWriter = build_writer_classes()
+    writer_kwargs = dict(batch_size=args.batch_size, flush_interval=args.flush_interval, max_queue=args.queue_size)
+    if args.db == "postgres":
+        import utils.database as udb
+        await udb.init_db_async()
+        writer = TimedLogWriter(**writer_kwargs)
+    else:
+        writer = SQLiteLogWriter(args.sqlite_path, **writer_kwargs)
+
+    channel = FakeLogChannel(latency=args.send_latency_ms / 1000, limit=args.channel_limit, per=args.channel_per,
+                             error_rate=args.error_rate, seed=args.seed)
+    config = {
+        "log_channel_id": channel.id,
+        "events": {spec.config_key: True for spec in LOG_EVENTS},
+        "burst_threshold": args.burst_threshold,
+        "burst_window": 30.0,
+    }
+    bot = FakeBot(config, channel)
+    bot.log_writer = writer
+    bot.embed_dispatcher = EmbedDispatcher(rate=args.channel_limit, per=args.channel_per)
+    bot.audit_cache = AuditLogCache(wait_timeout=args.audit_wait)
+    bot.member_index = MemberIndex()
+    bot.member_index.attach(bot)
+    bot.message_cache = MessageCache(max_messages=args.message_cache)
+    bot.message_cache.attach(bot)
+    gateway = SyntheticGateway(bot, guilds=args.guilds, members=args.members, seed=args.seed)
+    await bot.member_index.rebuild(bot.guilds)
+
+    cog = LoggerCog(bot)
+    bot._cogs["LoggerCog"] = cog
+    await cog.cog_load()
+    cog.log_channel = channel
+    writer.start()
+    lag = LoopLagMonitor(interval=0.05, window=100000)
+    lag.start()
+
+    events = 0
+    start = time.perf_counter()
+    for i in range(args.events):
+        if args.rate:
+            delay = start + i / args.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        elif i % 100 == 0:
+            # Let listeners run, as the gateway reader would between frames
+            await asyncio.sleep(0)
+        for event, event_args in gateway.next_events():
+            bot.dispatch(event, *event_args)
+            events += 1
+    dispatched = time.perf_counter()
+    await bot.wait_listeners()
+    handled = time.perf_counter()
+    # Unloading flushes pending burst summaries, which still need the writer
+    await cog.cog_unload()
+    await writer.stop(timeout=args.drain_timeout)
+    written = time.perf_counter()
+    await bot.embed_dispatcher.stop(timeout=args.drain_timeout)
+    await lag.stop()
+
+    db_seconds = (writer.last_commit or written) - start
+    lag_samples = list(lag._samples)
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        "gateway_events": args.events,
+        "listener_events": events,
+        "listener_errors": bot.listener_errors,
+        "dispatch_seconds": round(dispatched - start, 3),
+        "handle_seconds": round(handled - start, 3),
+        "events_per_second": round(events / max(1e-9, handled - start), 1),
+        "db": {
+            "rows_enqueued": writer.stats["enqueued"],
+            "rows_written": writer.stats["written"],
+            "rows_dropped": writer.stats["dropped"],
+            "batches": writer.stats["batches"],
+            "rows_per_second": round(writer.stats["written"] / max(1e-9, db_seconds), 1),
+            "latency_p50_ms": round(percentile(writer.latencies, 0.50) * 1000, 2),
+            "latency_p99_ms": round(percentile(writer.latencies, 0.99) * 1000, 2),
+        },
+        "discord": {
+            "embeds_enqueued": bot.embed_dispatcher.stats["enqueued"],
+            "embeds_sent": channel.embeds,
+            "messages_sent": channel.messages,
+            "rate_limited_429": channel.rate_limited,
+            "embeds_dropped": bot.embed_dispatcher.stats["dropped"],
+            "embeds_unsent": bot.embed_dispatcher.stats["enqueued"] - channel.embeds - bot.embed_dispatcher.stats["dropped"],
+            "latency_p50_ms": round(percentile(channel.latencies, 0.50) * 1000, 2),
+            "latency_p99_ms": round(percentile(channel.latencies, 0.99) * 1000, 2),
+        },
+        "message_cache": {**bot.message_cache.stats, "hit_rate": bot.message_cache.hit_rate},
+        "bursts": dict(cog.burst.stats),
+        "loop_lag_p99_ms": round(percentile(lag_samples, 0.99) * 1000, 2),
+        "loop_lag_max_ms": round(max(lag_samples, default=0.0) * 1000, 2),
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def print_report(result: dict):
+    db, discord_ = result["db"], result["discord"]
+    print(f"Events:   {result['listener_events']} listener events from {result['gateway_events']} gateway events "
+          f"in {result['handle_seconds']}s -> {result['events_per_second']} events/s "
+          f"({result['listener_errors']} listener errors)")
+    print(f"DB:       {db['rows_written']}/{db['rows_enqueued']} rows in {db['batches']} batches, "
+          f"{db['rows_per_second']} rows/s, latency p50 {db['latency_p50_ms']} ms / p99 {db['latency_p99_ms']} ms "
+          f"(dropped {db['rows_dropped']})")
+    print(f"Discord:  {discord_['embeds_sent']}/{discord_['embeds_enqueued']} embeds in {discord_['messages_sent']} "
+          f"messages, {discord_['rate_limited_429']} x 429, latency p50 {discord_['latency_p50_ms']} ms / "
+          f"p99 {discord_['latency_p99_ms']} ms (dropped {discord_['embeds_dropped']}, unsent {discord_['embeds_unsent']})")
+    cache = result["message_cache"]
+    rate = cache["hit_rate"]
+    print(f"Cache:    hit rate {'n/a' if rate is None else f'{rate:.1%}'}, evicted {cache['evicted']}; "
+          f"bursts {result['bursts']['bursts']} ({result['bursts']['aggregated']} events aggregated)")
+    print(f"Loop lag: p99 {result['loop_lag_p99_ms']} ms, max {result['loop_lag_max_ms']} ms")
+    print(f"Memory:   peak RSS {result['peak_rss_mb']} MB")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--events", type=int, default=20000, help="Synthetic gateway events to generate")
+    parser.add_argument("--rate", type=float, default=0, help="Events per second (0 = as fast as possible)")
+    parser.add_argument("--guilds", type=int, default=3)
+    parser.add_argument("--members", type=int, default=2000, help="Members per guild")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", choices=("sqlite", "postgres"), default="sqlite")
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--flush-interval", type=float, default=1.0)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--send-latency-ms", type=float, default=50.0, help="Simulated channel.send() latency")
+    parser.add_argument("--channel-limit", type=int, default=5, help="Messages allowed per --channel-per seconds")
+    parser.add_argument("--channel-per", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a spurious 429 per send")
+    parser.add_argument("--audit-wait", type=float, default=0.0, help="Audit-log wait per moderated event")
+    parser.add_argument("--message-cache", type=int, default=50000, help="Message cache size (0 disables)")
+    parser.add_argument("--burst-threshold", type=int, default=20)
+    parser.add_argument("--drain-timeout", type=float, default=10.0,
+                        help="Seconds to wait for the writer / dispatcher to drain at the end")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+    result = asyncio.run(run(args))
+    if args.json:
+        json.dump(result, sys.stdout, indent=2, default=str)
+        print()
+    else:
+        print_report(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,22 @@ import logging
 import os
 import json
 import asyncio
-from utils.database import init_db
+import psutil
+from utils.database import init_db_async
 import utils.database as udb
-from utils.health import start_health_server
+from utils.health import start_health_server, HealthProber
+from utils.log_writer import LogWriter
+from utils.spool import LogSpool
+from utils.embed_dispatcher import EmbedDispatcher
+from utils.audit_cache import AuditLogCache
+from utils.member_index import MemberIndex
+from utils.message_cache import MessageCache
+from utils.retention import RetentionJob
+from utils.partitions import PartitionMaintainer, PARTITIONED_MODES
+from utils.event_counts import count_log_rows, events_today
+from utils.metrics import register_bot
+from utils.loop_monitor import LoopLagMonitor, SlowCallbackDetector
+from utils.startup import StartupTimer
 from sqlalchemy import text
 from datetime import datetime
 import logging
@@ -18,6 +31,9 @@ _SHUTDOWN_TIMEOUT = 5
 
 class LoggingBot(commands.Bot):
     def __init__(self):
+        # Stage timings from process start to "listening" (logged, and served on /health and /metrics)
+        self.startup = StartupTimer()
+        self.startup.mark("init")
         self.config = self.load_config()
         if not self.config:
             logging.error("Failed to load configuration. Exiting.")
@@ -38,9 +54,12 @@ class LoggingBot(commands.Bot):
         # Enable message and reaction intents to observe edits/deletes if available
         intents.messages = True
         intents.reactions = True
+        # Audit log entries are streamed via on_audit_log_entry_create (needs View Audit Log)
+        intents.moderation = True
         super().__init__(command_prefix='!', intents=intents)
 
-        init_db()
+        # Engine creation and schema checks run in setup_hook, alongside the gateway connection
+        self._db_task = None
         # Track whether we've already notified the configured log channel
         self._notified_ready = False
         # Record the start time for uptime calculation
@@ -48,6 +67,69 @@ class LoggingBot(commands.Bot):
         # In-memory counters for received events (useful for diagnostics)
         from collections import defaultdict
         self._event_counters = defaultdict(int)
+        # On-disk spool used by the writer while Postgres is unavailable
+        spool = None
+        if self.config["spool_dir"]:
+            try:
+                spool = LogSpool(
+                    self.config["spool_dir"],
+                    segment_bytes=self.config["spool_segment_bytes"],
+                    fsync=self.config["spool_fsync"],
+                )
+            except Exception as e:
+                logging.error(f"Failed to open log spool at {self.config['spool_dir']}: {e}")
+        # Batched background writer for log rows (held until the DB stage is done, flushed in close)
+        self.log_writer = LogWriter(
+            batch_size=self.config["writer_batch_size"],
+            flush_interval=self.config["writer_flush_interval"],
+            max_queue=self.config["writer_queue_size"],
+            overflow_policy=self.config["writer_overflow_policy"],
+            spool=spool,
+            write_timeout=self.config["writer_write_timeout"],
+            replay_interval=self.config["spool_replay_interval"],
+            copy_event_types=self.config["writer_copy_event_types"],
+            copy_min_rows=self.config["writer_copy_min_rows"],
+        )
+        # Outbound embed queue that packs log embeds per channel and paces sends
+        self.embed_dispatcher = EmbedDispatcher(
+            max_queue_per_channel=self.config["dispatch_queue_size"],
+            rate=self.config["dispatch_rate"],
+            per=self.config["dispatch_per"],
+        )
+        # Audit-log entries received from the gateway, used for actor attribution
+        self.audit_cache = AuditLogCache(
+            max_entries=self.config["audit_cache_size"],
+            ttl=self.config["audit_cache_ttl"],
+            wait_timeout=self.config["audit_wait_seconds"],
+        )
+        # Unique-user index across guilds (constant-time counts for status embeds)
+        self.member_index = MemberIndex()
+        self.member_index.attach(self)
+        # Compact content cache so raw delete/edit events can be logged with content
+        self.message_cache = MessageCache(
+            max_messages=self.config["message_cache_size"],
+            max_bytes=self.config["message_cache_max_mb"] * 1024 * 1024,
+            spill_path=self.config["message_cache_spill"] or None,
+            spill_max_rows=self.config["message_cache_spill_rows"],
+        )
+        self.message_cache.attach(self)
+        # Daily purge of rows older than retention_days (FR-7)
+        self.retention_job = RetentionJob(self, interval_hours=self.config["retention_interval_hours"])
+        # Background health probe; /health and /health/ready serve its cached snapshot
+        self.health_prober = HealthProber(self, interval=self.config["health_probe_interval"])
+        self._health_server_task = None
+        # Prometheus metrics (/metrics): component stats plus an event-loop lag sampler
+        register_bot(self)
+        self.loop_lag_monitor = LoopLagMonitor()
+        # Opt-in profiler for callbacks that block the loop (SLOW_CALLBACK_MS > 0)
+        self.slow_callback_detector = None
+        if self.config["slow_callback_ms"] > 0:
+            self.slow_callback_detector = SlowCallbackDetector(threshold_ms=self.config["slow_callback_ms"])
+        # Creates upcoming partitions when logs is range-partitioned (LOGS_PARTITIONING)
+        self.partition_maintainer = None
+        if udb.LOGS_PARTITIONING in PARTITIONED_MODES:
+            self.partition_maintainer = PartitionMaintainer(udb.LOGS_PARTITIONING, udb.LOGS_PARTITIONS_AHEAD)
+        self.startup.mark("constructed")
 
     def load_config(self):
         """Load configuration from environment variables (.env) with optional fallback to config.json.
@@ -60,6 +142,14 @@ class LoggingBot(commands.Bot):
         - HEALTH_HOST
         - HEALTH_PORT
         - EVENTS (comma-separated list of enabled event keys, e.g. on_member_join,on_message_edit)
+        - WRITER_BATCH_SIZE, WRITER_FLUSH_INTERVAL, WRITER_QUEUE_SIZE, WRITER_OVERFLOW_POLICY, WRITER_WRITE_TIMEOUT
+        - WRITER_COPY_EVENT_TYPES, WRITER_COPY_MIN_ROWS
+        - SPOOL_DIR, SPOOL_SEGMENT_BYTES, SPOOL_FSYNC, SPOOL_REPLAY_INTERVAL
+        - DISPATCH_QUEUE_SIZE, DISPATCH_RATE, DISPATCH_PER
+        - AUDIT_CACHE_SIZE, AUDIT_CACHE_TTL, AUDIT_WAIT_SECONDS, AUDIT_REST_FALLBACK
+        - BURST_THRESHOLD, BURST_WINDOW
+        - MESSAGE_CACHE_SIZE, MESSAGE_CACHE_MAX_MB, MESSAGE_CACHE_SPILL, MESSAGE_CACHE_SPILL_ROWS
+        - RETENTION_DAYS, RETENTION_BATCH_SIZE, RETENTION_BATCH_SLEEP, RETENTION_INTERVAL_HOURS
 
         If a config.json exists, its values are used only for keys not set via env.
         """
@@ -88,6 +178,12 @@ class LoggingBot(commands.Bot):
             except Exception:
                 return None
 
+        def _parse_float(val):
+            try:
+                return float(val)
+            except Exception:
+                return None
+
         cfg["log_channel_id"] = _parse_int(_get_env("LOG_CHANNEL_ID", "log_channel_id"))
         cfg["notify_channel_id"] = _parse_int(_get_env("NOTIFY_CHANNEL_ID", "notify_channel_id"))
         cfg["guild_id"] = _parse_int(_get_env("GUILD_ID", "guild_id"))
@@ -113,6 +209,63 @@ class LoggingBot(commands.Bot):
         # Health
         cfg["health_host"] = _get_env("HEALTH_HOST", "health_host", "0.0.0.0")
         cfg["health_port"] = _parse_int(_get_env("HEALTH_PORT", "health_port", 8080)) or 8080
+        # Event-loop profiling: log/export callbacks slower than this many ms (0 disables)
+        cfg["slow_callback_ms"] = _parse_float(_get_env("SLOW_CALLBACK_MS", "slow_callback_ms", 0)) or 0.0
+        cfg["health_probe_interval"] = _parse_float(_get_env("HEALTH_PROBE_INTERVAL", "health_probe_interval", 10.0)) or 10.0
+
+        # Database writer batching / backpressure
+        cfg["writer_batch_size"] = _parse_int(_get_env("WRITER_BATCH_SIZE", "writer_batch_size", 200)) or 200
+        cfg["writer_flush_interval"] = _parse_float(_get_env("WRITER_FLUSH_INTERVAL", "writer_flush_interval", 1.0)) or 1.0
+        cfg["writer_queue_size"] = _parse_int(_get_env("WRITER_QUEUE_SIZE", "writer_queue_size", 10000)) or 10000
+        cfg["writer_overflow_policy"] = str(_get_env("WRITER_OVERFLOW_POLICY", "writer_overflow_policy", "block")).lower()
+        cfg["writer_write_timeout"] = _parse_float(_get_env("WRITER_WRITE_TIMEOUT", "writer_write_timeout", 5.0)) or 5.0
+        # Event types ingested with COPY instead of INSERT ("*" = all); empty disables
+        copy_types = _get_env("WRITER_COPY_EVENT_TYPES", "writer_copy_event_types", [])
+        if isinstance(copy_types, str):
+            copy_types = [t.strip() for t in copy_types.split(",") if t.strip()]
+        cfg["writer_copy_event_types"] = list(copy_types or [])
+        cfg["writer_copy_min_rows"] = _parse_int(_get_env("WRITER_COPY_MIN_ROWS", "writer_copy_min_rows", 100)) or 100
+
+        # Local spool for log rows while the database is down (SPOOL_DIR=off disables it)
+        spool_dir = str(_get_env("SPOOL_DIR", "spool_dir", "spool") or "")
+        cfg["spool_dir"] = "" if spool_dir.lower() in ("off", "none", "false", "0") else spool_dir
+        cfg["spool_segment_bytes"] = _parse_int(_get_env("SPOOL_SEGMENT_BYTES", "spool_segment_bytes", 4194304)) or 4194304
+        cfg["spool_fsync"] = str(_get_env("SPOOL_FSYNC", "spool_fsync", "interval")).lower()
+        cfg["spool_replay_interval"] = _parse_float(_get_env("SPOOL_REPLAY_INTERVAL", "spool_replay_interval", 10.0)) or 10.0
+
+        # Discord embed dispatcher (per-channel queue size and send pacing)
+        cfg["dispatch_queue_size"] = _parse_int(_get_env("DISPATCH_QUEUE_SIZE", "dispatch_queue_size", 1000)) or 1000
+        cfg["dispatch_rate"] = _parse_int(_get_env("DISPATCH_RATE", "dispatch_rate", 5)) or 5
+        cfg["dispatch_per"] = _parse_float(_get_env("DISPATCH_PER", "dispatch_per", 5.0)) or 5.0
+
+        # Audit-log cache used to attribute kicks/bans/etc. to a moderator
+        cfg["audit_cache_size"] = _parse_int(_get_env("AUDIT_CACHE_SIZE", "audit_cache_size", 500)) or 500
+        cfg["audit_cache_ttl"] = _parse_float(_get_env("AUDIT_CACHE_TTL", "audit_cache_ttl", 120.0)) or 120.0
+        audit_wait = _parse_float(_get_env("AUDIT_WAIT_SECONDS", "audit_wait_seconds", 1.5))
+        cfg["audit_wait_seconds"] = 1.5 if audit_wait is None else audit_wait
+        cfg["audit_rest_fallback"] = str(_get_env("AUDIT_REST_FALLBACK", "audit_rest_fallback", False)).lower() in ("1", "true", "yes")
+
+        # Burst aggregation: above this many events per guild per window, member joins,
+        # voice changes and bulk deletes are summarized in Discord (rows are still stored)
+        burst_threshold = _parse_int(_get_env("BURST_THRESHOLD", "burst_threshold", 20))
+        cfg["burst_threshold"] = 20 if burst_threshold is None else burst_threshold
+        cfg["burst_window"] = _parse_float(_get_env("BURST_WINDOW", "burst_window", 30.0)) or 30.0
+
+        # Message content cache: MESSAGE_CACHE_SIZE=0 disables it; MESSAGE_CACHE_SPILL is an
+        # optional SQLite file for records evicted from memory
+        cache_size = _parse_int(_get_env("MESSAGE_CACHE_SIZE", "message_cache_size", 50000))
+        cfg["message_cache_size"] = 50000 if cache_size is None else cache_size
+        cfg["message_cache_max_mb"] = _parse_int(_get_env("MESSAGE_CACHE_MAX_MB", "message_cache_max_mb", 32)) or 32
+        cfg["message_cache_spill"] = str(_get_env("MESSAGE_CACHE_SPILL", "message_cache_spill", "") or "")
+        cfg["message_cache_spill_rows"] = _parse_int(_get_env("MESSAGE_CACHE_SPILL_ROWS", "message_cache_spill_rows", 500000)) or 500000
+
+        # Retention (FR-7): 0/empty disables the purge; purge_logs_after_days is the legacy key
+        retention = _get_env("RETENTION_DAYS", "retention_days", file_cfg.get("purge_logs_after_days"))
+        cfg["retention_days"] = _parse_int(retention) or 0
+        cfg["retention_batch_size"] = _parse_int(_get_env("RETENTION_BATCH_SIZE", "retention_batch_size", 5000)) or 5000
+        retention_sleep = _parse_float(_get_env("RETENTION_BATCH_SLEEP", "retention_batch_sleep", 0.5))
+        cfg["retention_batch_sleep"] = 0.5 if retention_sleep is None else retention_sleep
+        cfg["retention_interval_hours"] = _parse_float(_get_env("RETENTION_INTERVAL_HOURS", "retention_interval_hours", 24)) or 24.0
 
         # Events: default to file or sensible defaults
         default_events = file_cfg.get("events", {
@@ -160,23 +313,75 @@ class LoggingBot(commands.Bot):
                 except Exception as e:
                     logging.error(f"Failed to load cog {filename}: {e}")
 
-    async def on_ready(self):
-        logging.info(f'Logged in as {self.user} (ID: {self.user.id})')
-        logging.info("Bot is ready and listening for events.")
+    async def setup_hook(self):
+        """Runs once after the HTTP login, before the gateway connects.
+
+        Starts the health server and the database stage as background tasks
+        so connecting to Discord never waits on Postgres.
+        """
+        self.startup.mark("login")
         # Start a lightweight HTTP health endpoint in the background (checks DB connectivity)
         try:
-            host = os.getenv("HEALTH_HOST", "0.0.0.0")
-            port = int(os.getenv("HEALTH_PORT", "8080"))
-            # schedule the aiohttp server on the bot's event loop
-            asyncio.create_task(start_health_server(host=host, port=port))
-            logging.info(f"Scheduled health server on {host}:{port} (/health)")
+            if self._health_server_task is None:
+                host = os.getenv("HEALTH_HOST", "0.0.0.0")
+                port = int(os.getenv("HEALTH_PORT", "8080"))
+                # schedule the aiohttp server on the bot's event loop
+                self._health_server_task = asyncio.create_task(
+                    start_health_server(host=host, port=port, prober=self.health_prober))
+                logging.info(f"Scheduled health server on {host}:{port} (/health)")
         except Exception as e:
             logging.warning(f"Failed to schedule health server: {e}")
-        # Load cogs asynchronously (extensions expect the bot to be fully initialized)
+        self.health_prober.start()
+        # Rows logged before the schema is ready are spooled (or kept queued) instead of dropped
+        if self._db_task is None:
+            self.log_writer.hold()
+            self.log_writer.start()
+            self._db_task = asyncio.create_task(self._start_database(), name="startup-database")
+
+    async def _start_database(self):
+        """Startup stage: create the engines, ensure tables and run migrations, then start DB jobs.
+
+        The writer runs held meanwhile: log rows go to the spool (or wait in
+        its queue without one) and are replayed once it is released. If the
+        stage fails or is cancelled the writer is released anyway and
+        spools/retries as usual.
+        """
         try:
-            await self.load_cogs()
+            with self.startup.stage("database") as stage:
+                stage["ok"] = await init_db_async()
+                # An unconverted (legacy) logs table would reject every batch
+                await self.log_writer.check_schema()
         except Exception as e:
-            logging.error(f"Failed to load cogs: {e}")
+            logging.error(f"Database startup stage failed: {e}")
+        finally:
+            # Also when close() cancels the stage mid-migration, so the writer is never left held
+            self.log_writer.release()
+        self.retention_job.start()
+        if self.partition_maintainer is not None:
+            self.partition_maintainer.start()
+
+    async def on_ready(self):
+        logging.info(f'Logged in as {self.user} (ID: {self.user.id})')
+        self.startup.mark("ready")
+        # Guild member caches are complete at READY; (re)index them for unique-user counts
+        try:
+            await self.member_index.rebuild(self.guilds)
+        except Exception as e:
+            logging.warning(f"Failed to rebuild member index: {e}")
+        self.loop_lag_monitor.start()
+        if self.slow_callback_detector is not None:
+            self.slow_callback_detector.install()
+        # Load cogs asynchronously (extensions expect the bot to be fully initialized)
+        # (on_ready fires again after reconnects; extensions are only loaded once)
+        if not self.startup.complete:
+            try:
+                with self.startup.stage("cogs"):
+                    await self.load_cogs()
+            except Exception as e:
+                logging.error(f"Failed to load cogs: {e}")
+            self.startup.mark("listening")
+            logging.info("Bot is ready and listening for events.")
+            self.startup.log_summary()
     # Sync app commands (slash commands) to ensure they register with Discord.
     # If a dev guild is configured (`guild_id` in config or GUILD_ID env),
     # prefer registering commands to that guild only (DEV/GUILD-only mode) for
@@ -306,19 +511,18 @@ class LoggingBot(commands.Bot):
         except Exception:
             logging.debug("Readiness notification step encountered an unexpected error.")
 
-    async def _build_status_embed(self, title: str, event: str, extra: dict | None = None) -> discord.Embed:
-        """Build an embed with comprehensive bot stats for notifications."""
-        import psutil
+    async def _build_status_embed(self, title: str, event: str, extra: dict | None = None,
+                                  exact_count: bool = False) -> discord.Embed:
+        """Build an embed with comprehensive bot stats for notifications.
+
+        The stored event total is a planner estimate unless `exact_count` is set.
+        """
         import discord as discord_lib
         
         uptime = datetime.utcnow() - getattr(self, "_start_time", datetime.utcnow())
         guild_count = len(self.guilds)
-        # approximate user count by summing unique member ids in cached guilds
-        user_ids = set()
-        for g in self.guilds:
-            for m in g.members:
-                user_ids.add(m.id)
-        user_count = len(user_ids)
+        # unique users across cached guilds, maintained incrementally by MemberIndex
+        user_count = self.member_index.unique_count
 
         # System information
         try:
@@ -369,17 +573,18 @@ class LoggingBot(commands.Bot):
         # DB connectivity check and event counts
         db_status = "Desconectado"
         db_event_count = 0
+        db_today_count = 0
         session_events = sum(getattr(self, "_event_counters", {}).values())
         
         try:
-            udb_engine = getattr(udb, 'engine', None)
+            udb_engine = getattr(udb, 'async_engine', None)
             if udb_engine is not None:
-                with udb_engine.connect() as conn:
-                    conn.execute(text("SELECT 1"))
-                    # Try to count events in log_entries table
+                async with udb_engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+                    # Estimated (or exact on request) size of the logs table, plus today's counter
                     try:
-                        result = conn.execute(text("SELECT COUNT(*) FROM log_entries"))
-                        db_event_count = result.scalar() or 0
+                        db_event_count = await count_log_rows(conn, exact=exact_count)
+                        db_today_count = await events_today(conn)
                     except Exception:
                         pass
                 db_status = "Conectado"
@@ -391,7 +596,8 @@ class LoggingBot(commands.Bot):
         embed.add_field(
             name="🗄️ Base de Datos",
             value=f"**Estado:** {db_status}\n"
-                  f"**Eventos:** {db_event_count:,}\n"
+                  f"**Eventos:** {'' if exact_count else '~'}{db_event_count:,}\n"
+                  f"**Hoy:** {db_today_count:,}\n"
                   f"**Sesión:** {session_events:,}",
             inline=False
         )
@@ -502,5 +708,34 @@ class LoggingBot(commands.Bot):
             await asyncio.sleep(0.5)
         except Exception:
             logging.debug("Error while sending shutdown notification; proceeding to close.")
+        # Deliver queued log embeds and flush buffered log rows before the loop goes away
+        if self._db_task is not None and not self._db_task.done():
+            self._db_task.cancel()
+        await self.health_prober.stop()
+        await self.loop_lag_monitor.stop()
+        if self.slow_callback_detector is not None:
+            self.slow_callback_detector.uninstall()
+        await self.retention_job.stop()
+        if self.partition_maintainer is not None:
+            await self.partition_maintainer.stop()
+        # Summaries of a burst still in progress go out with the final flush
+        logger_cog = self.get_cog("LoggerCog")
+        if logger_cog is not None:
+            try:
+                await logger_cog._flush_bursts()
+            except Exception:
+                logging.exception("Error while flushing burst summaries during shutdown.")
+        try:
+            await self.embed_dispatcher.stop(timeout=_SHUTDOWN_TIMEOUT)
+        except Exception:
+            logging.exception("Error while draining the embed dispatcher during shutdown.")
+        try:
+            await self.log_writer.stop(timeout=_SHUTDOWN_TIMEOUT)
+        except Exception:
+            logging.exception("Error while flushing the log writer during shutdown.")
+        try:
+            await self.message_cache.close()
+        except Exception:
+            logging.exception("Error while closing the message cache during shutdown.")
         # Call the parent close
         await super().close()
\ No newline at end of file
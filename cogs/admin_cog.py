@@ -6,6 +6,18 @@ logger = logging.getLogger(__name__)
 import aiohttp
 import importlib
 from datetime import datetime
+from utils.log_queries import search_logs
+from utils.message_archive import fetch_archive, ARCHIVE_PAGE_SIZE
+from utils.rollups import fetch_trend
+
+_SPARK = "▁▂▃▄▅▆▇█"
+
+
+def _sparkline(values: list[int]) -> str:
+    top = max(values, default=0)
+    if top <= 0:
+        return _SPARK[0] * len(values)
+    return "".join(_SPARK[min(len(_SPARK) - 1, v * len(_SPARK) // (top + 1))] if v else " " for v in values)
 
 
 class AdminCog(commands.Cog):
@@ -64,11 +76,11 @@ class AdminCog(commands.Cog):
         return False
 
     async def _check_db(self):
-        """Attempt a lightweight DB check if an engine is available.
+        """Attempt a lightweight DB check if an async engine is available.
 
         Tries the following (in order):
         - `self.bot.db_engine` attribute
-        - `utils.database.engine` module attribute (if available)
+        - `utils.database.async_engine` module attribute (if available)
 
         If no engine is available the function returns (None, 'no-engine').
         """
@@ -78,7 +90,7 @@ class AdminCog(commands.Cog):
             # try lazy import of utils.database if present in a host project
             try:
                 ud = importlib.import_module('utils.database')
-                engine = getattr(ud, 'engine', None)
+                engine = getattr(ud, 'async_engine', None)
             except Exception:
                 engine = None
 
@@ -94,18 +106,19 @@ class AdminCog(commands.Cog):
 
         try:
             if text_fn:
-                with engine.connect() as conn:
-                    conn.execute(text_fn('SELECT 1'))
+                async with engine.connect() as conn:
+                    await conn.execute(text_fn('SELECT 1'))
             else:
                 # best-effort: try a simple connect/close
-                with engine.connect() as conn:
+                async with engine.connect() as conn:
                     pass
             return True, None
         except Exception as e:
             return False, str(e)
 
     @app_commands.command(name="status", description="Show comprehensive service status (System + DB + Health)")
-    async def status(self, interaction: discord.Interaction):
+    @app_commands.describe(exact="Run an exact COUNT(*) of stored events instead of the fast estimate")
+    async def status(self, interaction: discord.Interaction, exact: bool = False):
         """Enhanced status slash command with comprehensive system information."""
         member = interaction.user
         if not isinstance(member, discord.Member):
@@ -126,7 +139,8 @@ class AdminCog(commands.Cog):
                 extra={
                     "Solicitado por": str(member),
                     "Tipo de consulta": "Manual"
-                }
+                },
+                exact_count=exact
             )
             
             # Send response to user
@@ -268,6 +282,11 @@ class AdminCog(commands.Cog):
             
             if new_config:
                 self.bot.config = new_config
+                # Swap the LoggerCog listener table to match the new event flags
+                active_events = None
+                logger_cog = self.bot.get_cog("LoggerCog")
+                if logger_cog is not None:
+                    active_events = logger_cog.apply_event_config()
                 
                 # Compare configurations and build change summary
                 changes = []
@@ -313,6 +332,13 @@ class AdminCog(commands.Cog):
                         inline=False
                     )
                 
+                if active_events is not None:
+                    embed.add_field(
+                        name="📡 Eventos Activos",
+                        value=f"{len(active_events)}/{len(logger_cog.registry.specs)}",
+                        inline=True
+                    )
+                
                 embed.add_field(
                     name="👤 Solicitado por",
                     value=str(member),
@@ -362,6 +388,160 @@ class AdminCog(commands.Cog):
             await interaction.followup.send(embed=embed, ephemeral=True)
             await self._send_notify_embed(embed)
 
+    @app_commands.command(name="search_logs", description="Full-text search of logged messages and events in this server")
+    @app_commands.describe(query='Words to find; supports "exact phrases", -exclude and OR',
+                           event_type="Optional event type filter, e.g. message_delete",
+                           limit="Number of results (max 25)")
+    async def search_logs(self, interaction: discord.Interaction, query: str, event_type: str | None = None, limit: int = 10):
+        """Ranked full-text search over log descriptions and message content for the current guild."""
+        member = interaction.user
+        if not isinstance(member, discord.Member):
+            await interaction.response.send_message("Command must be used in a guild by a member.", ephemeral=True)
+            return
+
+        if not self._is_authorized(member):
+            await interaction.response.send_message("You are not authorized to run this command.", ephemeral=True)
+            return
+
+        await interaction.response.defer(thinking=True, ephemeral=True)
+
+        limit = max(1, min(limit, 25))
+        start_time = datetime.utcnow()
+        try:
+            hits = await search_logs(query, guild_id=str(interaction.guild.id), event_type=event_type, limit=limit)
+        except Exception as e:
+            logger.error(f"search_logs failed: {e}")
+            await interaction.followup.send(f"Search failed: {str(e)[:200]}", ephemeral=True)
+            return
+        took_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
+
+        embed = discord.Embed(
+            title="🔎 Resultados de Búsqueda",
+            description=f"**Consulta:** `{query[:200]}`\n**Resultados:** {len(hits)} ({took_ms:.0f} ms)",
+            color=discord.Color.blue(),
+            timestamp=datetime.utcnow()
+        )
+        for hit in hits:
+            details = hit.get("details") or {}
+            content = details.get("Content") or details.get("After") or details.get("Before") or hit.get("description") or ""
+            content = str(content)
+            if len(content) > 200:
+                content = content[:197] + "..."
+            ts = (hit.get("timestamp") or "")[:19].replace("T", " ")
+            embed.add_field(
+                name=f"{hit.get('event_type')} • {hit.get('author_name')} • {ts}",
+                value=content or "N/A",
+                inline=False
+            )
+        embed.set_footer(text=f"Solicitado por {member}")
+        # Results can contain message content, so they are only shown to the invoker
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        logger.info(f"search_logs by {member}: {len(hits)} hits in {took_ms:.0f} ms")
+
+    @app_commands.command(name="stats", description="Event trends for this server from the hourly rollups")
+    @app_commands.describe(days="Days to cover (max 90; hourly buckets up to 2 days)",
+                           event_type="Optional event type filter, e.g. member_ban")
+    async def stats(self, interaction: discord.Interaction, days: int = 7, event_type: str | None = None):
+        """Per-event-type totals and a trend line for the current guild, read from log_event_hourly."""
+        member = interaction.user
+        if not isinstance(member, discord.Member):
+            await interaction.response.send_message("Command must be used in a guild by a member.", ephemeral=True)
+            return
+
+        if not self._is_authorized(member):
+            await interaction.response.send_message("You are not authorized to run this command.", ephemeral=True)
+            return
+
+        await interaction.response.defer(thinking=True, ephemeral=True)
+
+        days = max(1, min(days, 90))
+        start_time = datetime.utcnow()
+        try:
+            trend = await fetch_trend(guild_id=interaction.guild.id, days=days, event_type=event_type)
+        except Exception as e:
+            logger.error(f"stats failed: {e}")
+            await interaction.followup.send(f"Could not load stats: {str(e)[:200]}", ephemeral=True)
+            return
+        took_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
+
+        unit = "hora" if trend["bucket"] == "hour" else "día"
+        embed = discord.Embed(
+            title="📈 Estadísticas de Eventos",
+            description=(f"**Periodo:** últimos {days} días (por {unit})\n"
+                         f"**Total:** {trend['total']} eventos ({took_ms:.0f} ms)"),
+            color=discord.Color.blue(),
+            timestamp=datetime.utcnow()
+        )
+        if trend["total"]:
+            all_events = [sum(values) for values in zip(*trend["series"].values())]
+            embed.add_field(name="Tendencia", value=f"`{_sparkline(all_events[-60:])}`", inline=False)
+        # Embeds allow 25 fields; the busiest event types come first
+        for name, total in list(trend["totals"].items())[:20]:
+            values = trend["series"][name]
+            peak = max(values)
+            embed.add_field(
+                name=f"{name} • {total}",
+                value=f"`{_sparkline(values[-60:])}` máx {peak}/{unit}",
+                inline=False
+            )
+        if not trend["total"]:
+            embed.add_field(name="Sin datos", value="No hay eventos registrados en este periodo.", inline=False)
+        embed.set_footer(text=f"Solicitado por {member}")
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        logger.info(f"stats by {member}: {days} days, {trend['total']} events in {took_ms:.0f} ms")
+
+    @app_commands.command(name="purge_archive", description="Show the messages removed by a bulk delete")
+    @app_commands.describe(entry="Log id or event id of the bulk_message_delete entry (shown in its embed footer)",
+                           page="Page of messages to show")
+    async def purge_archive(self, interaction: discord.Interaction, entry: str, page: int = 1):
+        """Page through the archived messages of a purge logged in this guild."""
+        member = interaction.user
+        if not isinstance(member, discord.Member):
+            await interaction.response.send_message("Command must be used in a guild by a member.", ephemeral=True)
+            return
+
+        if not self._is_authorized(member):
+            await interaction.response.send_message("You are not authorized to run this command.", ephemeral=True)
+            return
+
+        await interaction.response.defer(thinking=True, ephemeral=True)
+
+        try:
+            found = await fetch_archive(entry, str(interaction.guild.id))
+        except Exception as e:
+            logger.error(f"purge_archive failed: {e}")
+            await interaction.followup.send(f"Could not load the archive: {str(e)[:200]}", ephemeral=True)
+            return
+        if found is None:
+            await interaction.followup.send("No archived bulk delete with that id in this server.", ephemeral=True)
+            return
+
+        info, messages = found
+        pages = max(1, -(-len(messages) // ARCHIVE_PAGE_SIZE))
+        page = max(1, min(page, pages))
+        chunk = messages[(page - 1) * ARCHIVE_PAGE_SIZE:page * ARCHIVE_PAGE_SIZE]
+        embed = discord.Embed(
+            title="🗑️ Mensajes Eliminados",
+            description=(f"**Entrada:** {info['id']} • {info['details'].get('Channel', '')}\n"
+                         f"**Mensajes:** {len(messages)} ({info['archive_bytes']} bytes comprimidos)"),
+            color=discord.Color.dark_red(),
+            timestamp=info["timestamp"]
+        )
+        for message in chunk:
+            content = message["content"] or ""
+            if message["attachments"]:
+                content = f"{content}\n{message['attachments']}".strip()
+            if len(content) > 300:
+                content = content[:297] + "..."
+            embed.add_field(
+                name=f"{message['author_name']} • {message['created_at']:%Y-%m-%d %H:%M:%S}",
+                value=content or "N/A",
+                inline=False
+            )
+        embed.set_footer(text=f"Página {page}/{pages} • Solicitado por {member}")
+        # Archived content is only shown to the invoker
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
     @app_commands.command(name="ready", description="Notify the configured log channel that the bot is ready")
     async def ready(self, interaction: discord.Interaction):
         # Slash command implemented using discord.py's app_commands
@@ -503,8 +683,44 @@ class AdminCog(commands.Cog):
         for k, v in counters.items():
             lines.append(f"{k}: {v}")
 
+        cache = getattr(self.bot, "message_cache", None)
+        if cache is not None and cache.enabled:
+            rate = cache.hit_rate
+            lines.append(f"Message cache: {len(cache)} msgs, {cache.bytes // 1024} KiB, "
+                         f"hit rate {'n/a' if rate is None else f'{rate:.0%}'}")
+
+        # Event-loop health: lag samples and (if enabled) slow callbacks
+        lag_monitor = getattr(self.bot, "loop_lag_monitor", None)
+        if lag_monitor is not None:
+            lag = lag_monitor.summary()
+            lines.append(f"Loop lag: last {lag['last_ms']} ms, p99 {lag['p99_ms']} ms, max {lag['max_ms']} ms "
+                         f"({lag['samples']} samples)")
+        startup = getattr(self.bot, "startup", None)
+        if startup is not None:
+            stages = ", ".join(f"{name} {e['seconds']:.2f}s" + ("" if e["ok"] else " (failed)")
+                               for name, e in startup.stages.items() if e["seconds"] is not None)
+            listening = startup.milestones.get("listening")
+            lines.append(f"Startup: listening after {'n/a' if listening is None else f'{listening:.2f}s'}"
+                         f" ({stages or 'no stages finished'})")
+        detector = getattr(self.bot, "slow_callback_detector", None)
+        slow_stack = None
+        if detector is None:
+            lines.append("Slow callbacks: detector off (set SLOW_CALLBACK_MS)")
+        else:
+            lines.append(f"Slow callbacks (>{detector.threshold * 1000:.0f} ms): {sum(detector.counts.values())}")
+            top = detector.top(5)
+            if top:
+                lines.append("Top slow callbacks: " + "; ".join(
+                    f"{name[:80]} ({count}x, worst {worst_ms:.0f} ms)" for name, count, worst_ms in top))
+            if detector.recent:
+                last = detector.recent[-1]
+                slow_stack = f"{last['callback']} {last['duration_ms']} ms at {last['at']}\n{last['stack'] or '(no stack captured)'}"
+
         # ephemeral to invoker
         await interaction.followup.send("```\n" + "\n".join(lines) + "\n```", ephemeral=True)
+        if slow_stack:
+            # Most recent slow callback with the stack captured while it was blocking
+            await interaction.followup.send("```\n" + slow_stack[-1900:] + "\n```", ephemeral=True)
         # notify channel embed
         embed = discord.Embed(title="Sentry Diagnose", color=discord.Color.blue())
         for l in lines:
@@ -1,9 +1,15 @@
 # src/cogs/logger_cog.py
 from discord.ext import commands
 import discord
+import asyncio
 import logging
+import uuid
 from datetime import datetime
-from utils.database import get_db_session, LogEntry 
+from utils.metrics import instrumented
+from utils.event_registry import EventRegistry, EventSpec, LogItem
+from utils.burst import BurstDetector
+from utils.message_cache import CachedMessage
+from utils.message_archive import pack_messages
 logger = logging.getLogger(__name__)
 
 
@@ -11,6 +17,9 @@ class LoggerCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.log_channel = None
+        # Raid/burst aggregation of noisy events (member joins, voice churn, bulk deletes)
+        self.burst = BurstDetector(self.bot.config.get("burst_threshold", 20), self.bot.config.get("burst_window", 30.0))
+        self._burst_task = None
         # Try to show a friendly channel label (name) when possible instead of raw ID
         configured = self.bot.config.get('log_channel_id') or self.bot.config.get('notify_channel_id')
         cfg_label = configured
@@ -28,11 +37,25 @@ class LoggerCog(commands.Cog):
         logger.info(f"LoggerCog initialized; configured log channel: {cfg_label}")
 
     async def _get_audit_actor(self, guild: discord.Guild, action, target_id: int | None = None):
-        """Attempt to find the actor responsible for an audited action.
+        """Find the actor responsible for an audited action.
 
-        Returns a discord.User/Member or None. This requires the bot to have
-        the 'view_audit_log' permission in the guild. We search recent entries
-        for the given action and, if provided, match the target id.
+        Returns a discord.User/Member or None. Entries come from the shared
+        audit-log cache (fed by on_audit_log_entry_create), waiting briefly for
+        the entry to arrive. If `audit_rest_fallback` is enabled, a cache miss
+        falls back to querying the guild's audit log over REST.
+        """
+        try:
+            actor = await self.bot.audit_cache.lookup(guild.id, action, target_id)
+        except Exception:
+            actor = None
+        if actor is None and self.bot.config.get("audit_rest_fallback"):
+            actor = await self._fetch_audit_actor(guild, action, target_id)
+        return actor
+
+    async def _fetch_audit_actor(self, guild: discord.Guild, action, target_id: int | None = None):
+        """Search recent audit-log entries over REST for the given action/target.
+
+        This requires the bot to have the 'view_audit_log' permission in the guild.
         """
         try:
             # guild.audit_logs returns an AsyncIterator
@@ -55,6 +78,23 @@ class LoggerCog(commands.Cog):
         return None
 
     @commands.Cog.listener()
+    @instrumented
+    async def on_audit_log_entry_create(self, entry: discord.AuditLogEntry):
+        """Feed the shared audit-log cache from the gateway stream."""
+        actor = entry.user
+        if actor is None and entry.user_id:
+            try:
+                actor = await self.bot.fetch_user(entry.user_id)
+            except Exception:
+                actor = None
+        if actor is None:
+            return
+        targ = getattr(entry, 'target', None)
+        target_id = getattr(targ, 'id', None) or (targ if isinstance(targ, int) else None)
+        self.bot.audit_cache.add(entry.guild.id, entry.action, target_id, actor)
+
+    @commands.Cog.listener()
+    @instrumented
     async def on_ready(self):
         """Fetches the log channel object once the bot is ready."""
         # Prefer explicit log_channel_id, but fall back to notify_channel_id (startup/shutdown channel)
@@ -84,27 +124,90 @@ class LoggerCog(commands.Cog):
 
     async def _add_log(self, event_type: str, author: discord.User | discord.Member | None, description: str, guild: discord.Guild, details: dict = None, color: discord.Color = discord.Color.blue()):
         """Helper function to log an event to both the database and Discord channel."""
-        # 1. Write to database
-        db_session = get_db_session()
-        try:
-            new_log = LogEntry(
-                event_type=event_type,
-                author_id=str(author.id) if author else "0",
-                author_name=str(author) if author else "System",
-                description=description,
-                guild_id=str(guild.id) if guild else "0",
-                details=details
-            )
-            db_session.add(new_log)
-            db_session.commit()
-            logger.debug(f"Logged event '{event_type}' to DB.")
-        except Exception as e:
-            logger.error(f"Failed to write log to database: {e}", exc_info=True)
-            db_session.rollback()
-        finally:
-            db_session.close()
-
-        # 2. Send to Discord channel (if configured). Try to resolve channel if not cached.
+        await self._add_logs([LogItem(event_type, author, description, guild, details, color)])
+
+    async def _add_logs(self, items: list[LogItem]):
+        """Log several entries at once: one writer enqueue for all rows, then one embed per entry."""
+        if not items:
+            return
+        # 1. Queue the rows for the batched DB writer instead of committing inline
+        now = datetime.utcnow()
+        rows = [{
+            "event_id": uuid.uuid4().hex,
+            "timestamp": now,
+            "event_type": item.event_type,
+            "author_id": str(item.author.id) if item.author else "0",
+            "author_name": str(item.author) if item.author else "System",
+            "description": item.description,
+            "guild_id": str(item.guild.id) if item.guild else "0",
+            "details": item.details,
+            "archive": item.archive,
+        } for item in items]
+        if len(rows) == 1:
+            queued = int(await self.bot.log_writer.enqueue(rows[0]))
+        else:
+            queued = await self.bot.log_writer.enqueue_many(rows)
+        if queued:
+            logger.debug(f"Queued {queued} '{items[0].event_type}' rows for DB write.")
+
+        # 2. Send to Discord channel (if configured). During a burst, individual
+        # embeds are folded into the periodic summary instead.
+        pending = [(item, row["event_id"]) for item, row in zip(items, rows)
+                   if not (item.guild and self.burst.observe(item.guild.id, item.event_type, self._burst_id(item)))]
+        if not pending:
+            return
+        channel = await self._resolve_log_channel()
+        if not channel:
+            logger.debug("No log channel configured or available; skipping Discord send for log entry.")
+            return
+        for item, event_id in pending:
+            embed = self._build_embed(item, now)
+            if item.archive is not None:
+                embed.set_footer(text=f"Archived messages: /purge_archive entry:{event_id}")
+            # Queued per channel; the dispatcher packs up to 10 embeds per message
+            try:
+                self.bot.embed_dispatcher.enqueue(channel, embed)
+            except Exception as e:
+                # When queueing fails, include a friendly channel label if possible
+                ch_label = f"#{getattr(channel, 'name', None)}" if getattr(channel, 'name', None) else str(getattr(channel, 'id', 'unknown'))
+                logger.error(f"An unexpected error occurred when queueing Discord log for '{item.event_type}' to {ch_label}: {e}", exc_info=True)
+
+    @staticmethod
+    def _burst_id(item: LogItem) -> str | None:
+        if item.author:
+            return str(item.author.id)
+        if item.details and "Channel" in item.details:
+            return str(item.details["Channel"])
+        return None
+
+    async def _burst_loop(self):
+        while True:
+            await asyncio.sleep(self.burst.window)
+            try:
+                await self._flush_bursts()
+            except Exception:
+                logger.exception("Failed to emit burst summaries")
+
+    async def _flush_bursts(self):
+        """Log one summary entry per guild/group that was aggregated since the last flush."""
+        items = []
+        for summary in self.burst.drain():
+            guild = self.bot.get_guild(summary["guild_id"])
+            ids = summary["ids"]
+            details = {"Count": summary["count"], "Window": f"{summary['seconds']}s"}
+            if len(summary["types"]) > 1:
+                details["Breakdown"] = ", ".join(f"{k}: {v}" for k, v in sorted(summary["types"].items()))
+            if ids:
+                suffix = f" (first {len(ids)})" if len(ids) < summary["count"] else ""
+                details[f"IDs{suffix}"] = ", ".join(ids)
+            items.append(LogItem(
+                f"{summary['group']}_burst", None,
+                f"{summary['count']} {summary['noun']} in {summary['seconds']}s.",
+                guild, details, discord.Color.orange()))
+        await self._add_logs(items)
+
+    async def _resolve_log_channel(self):
+        """Return the log channel, resolving it if it was not cached yet."""
         if not self.log_channel:
             channel_id = self.bot.config.get("log_channel_id") or self.bot.config.get("notify_channel_id")
             if channel_id:
@@ -119,248 +222,250 @@ class LoggerCog(commands.Cog):
                             self.log_channel = await self.bot.fetch_channel(chan_id)
                         except Exception as e:
                             logger.warning(f"Failed to fetch log channel {chan_id} at send time: {e}")
+        return self.log_channel
 
-        if not self.log_channel:
-            logger.debug("No log channel configured or available; skipping Discord send for log entry.")
-            return
-
+    @staticmethod
+    def _build_embed(item: LogItem, timestamp: datetime) -> discord.Embed:
         embed = discord.Embed(
-            description=description,
-            color=color,
-            timestamp=datetime.utcnow()
+            description=item.description,
+            color=item.color,
+            timestamp=timestamp
         )
-        if author:
-            embed.set_author(name=f"{author}", icon_url=author.display_avatar.url)
+        if item.author:
+            embed.set_author(name=f"{item.author}", icon_url=item.author.display_avatar.url)
         else:
-            embed.set_author(name=event_type.replace("_", " ").title())
+            embed.set_author(name=item.event_type.replace("_", " ").title())
 
         # Add details to embed if they exist
-        if details:
-            for key, value in details.items():
+        if item.details:
+            for key, value in item.details.items():
                 if len(str(value)) > 1024:
                     value = str(value)[:1021] + "..."
                 embed.add_field(name=key.replace("_", " ").title(), value=f"```{value}```" if value else "N/A", inline=False)
-
-        try:
-            await self.log_channel.send(embed=embed)
-        except Exception as e:
-            # When send fails, include a friendly channel label if possible
-            ch_label = f"#{getattr(self.log_channel, 'name', None)}" if getattr(self.log_channel, 'name', None) else str(getattr(self.log_channel, 'id', 'unknown'))
-            logger.error(f"An unexpected error occurred when sending Discord log for '{event_type}' to {ch_label}: {e}", exc_info=True)
-
-    # --- Member Events ---
-
-    @commands.Cog.listener()
-    async def on_member_join(self, member):
-        if not self.bot.config["events"].get("on_member_join"):
-            return
-        await self._add_log("member_join", member, f"{member.mention} joined the server.", member.guild, color=discord.Color.green())
-
-    @commands.Cog.listener()
-    async def on_member_remove(self, member):
-        if not self.bot.config["events"].get("on_member_remove"):
-            return
-        # Try to detect if this remove was a kick by checking the audit logs
-        actor = None
-        try:
-            actor = await self._get_audit_actor(member.guild, discord.AuditLogAction.kick, target_id=getattr(member, 'id', None))
-        except Exception:
-            actor = None
-
-        if actor:
-            desc = f"{member.mention} was kicked by {actor.mention}."
-            await self._add_log("member_kick", actor, desc, member.guild, color=discord.Color.red())
+        return embed
+
+    # --- Event registry ---
+
+    async def cog_load(self):
+        self.registry = EventRegistry(self.bot, LOG_EVENTS, self._dispatch)
+        self.apply_event_config()
+        self._burst_task = asyncio.create_task(self._burst_loop(), name="log-burst-summaries")
+
+    async def cog_unload(self):
+        self.registry.clear()
+        if self._burst_task is not None:
+            self._burst_task.cancel()
+            self._burst_task = None
+        # Don't lose summaries of a burst that is still in progress
+        await self._flush_bursts()
+
+    def apply_event_config(self) -> list[str]:
+        """(Re)register listeners for the events enabled in bot.config["events"]."""
+        self.burst.configure(self.bot.config.get("burst_threshold", 20), self.bot.config.get("burst_window", 30.0))
+        return self.registry.apply(self.bot.config.get("events", {}))
+
+    async def _dispatch(self, spec: EventSpec, *args):
+        """Common listener body: render the spec's log items and queue them."""
+        await self._add_logs(await spec.render(self, *args))
+
+
+# --- Event specs ---
+# Each entry maps one gateway event to log entries; see utils.event_registry.
+# A new event type only needs a spec here and a key in config["events"].
+
+def _channel_label(channel) -> str:
+    return getattr(channel, 'name', None) or str(getattr(channel, 'id', 'unknown'))
+
+
+def _raw_channel_label(guild, channel_id: int) -> str:
+    channel = guild.get_channel_or_thread(channel_id) if guild else None
+    return f"#{_channel_label(channel) if channel else channel_id}"
+
+
+def _cached_author(cog, guild, record: CachedMessage):
+    """Resolve the author of a cached message, or None if the user is no longer known."""
+    member = guild.get_member(record.author_id) if guild else None
+    return member or cog.bot.get_user(record.author_id)
+
+
+async def _build_raw_message_delete(cog, payload):
+    # Raw events fire for every deletion; content comes from the message cache
+    # (or discord.py's own cache) when the message was seen after startup.
+    if payload.guild_id is None:
+        return []
+    guild = cog.bot.get_guild(payload.guild_id)
+    record = await cog.bot.message_cache.pop(payload.message_id)
+    if record is None and payload.cached_message is not None:
+        record = CachedMessage.from_message(payload.cached_message)
+    channel = _raw_channel_label(guild, payload.channel_id)
+    if record is None:
+        # Our own log embeds are never cached; don't log their cleanup
+        if cog.log_channel and payload.channel_id == cog.log_channel.id:
+            return []
+        details = {"Content": "N/A (message not cached)", "Message ID": payload.message_id, "Channel": channel}
+        return [LogItem("message_delete", None, "A message was deleted.", guild, details, discord.Color.dark_red())]
+    if record.bot:
+        return []
+    author = _cached_author(cog, guild, record)
+    details = {"Content": record.content or "N/A", "Channel": channel}
+    if record.attachments:
+        details["Attachments"] = record.attachments
+    if author is None:
+        details["Author"] = f"{record.author_name} ({record.author_id})"
+    return [LogItem("message_delete", author, "A message was deleted.", guild, details, discord.Color.dark_red())]
+
+
+async def _build_raw_message_edit(cog, payload):
+    message = payload.message
+    if payload.guild_id is None or message.author.bot:
+        return []
+    cache = cog.bot.message_cache
+    record = await cache.get(payload.message_id)
+    if record is not None:
+        before = record.content
+        cache.update_content(payload.message_id, message.content)
+    else:
+        before = payload.cached_message.content if payload.cached_message is not None else None
+        cache.add(message)
+        # Uncached and never edited: an embed/unfurl update, not a content edit
+        if before is None and message.edited_at is None:
+            return []
+    if before == message.content:
+        return []
+    details = {"Before": "N/A (message not cached)" if before is None else before, "After": message.content,
+               "Channel": _raw_channel_label(message.guild, payload.channel_id)}
+    return [LogItem("message_edit", message.author, f"A message was edited. [Jump to Message]({message.jump_url})",
+                    message.guild, details, discord.Color.greyple())]
+
+
+async def _build_raw_bulk_message_delete(cog, payload):
+    if payload.guild_id is None:
+        return []
+    guild = cog.bot.get_guild(payload.guild_id)
+    records = await cog.bot.message_cache.pop_many(payload.message_ids)
+    for message in payload.cached_messages:
+        records.setdefault(message.id, CachedMessage.from_message(message))
+    count = len(payload.message_ids)
+    details = {"Count": count, "Channel": _raw_channel_label(guild, payload.channel_id),
+               "Archived": f"{len(records)}/{count}"}
+    # The recovered messages go into one compressed blob on this row instead of a row each
+    archive = pack_messages(records.values()) if records else None
+    return [LogItem("bulk_message_delete", None, f"{count} messages were deleted.", guild, details,
+                    discord.Color.dark_red(), archive)]
+
+
+async def _build_member_remove(cog, member):
+    # Try to detect if this remove was a kick by checking the audit logs
+    actor = await cog._get_audit_actor(member.guild, discord.AuditLogAction.kick, target_id=getattr(member, 'id', None))
+    if actor:
+        return [LogItem("member_kick", actor, f"{member.mention} was kicked by {actor.mention}.", member.guild, color=discord.Color.red())]
+    return [LogItem("member_remove", member, f"{member.mention} left the server.", member.guild, color=discord.Color.orange())]
+
+
+async def _build_member_update(cog, before, after):
+    items = []
+    # Nickname change
+    if before.nick != after.nick:
+        # Try to see if an admin changed the nickname (audit log entry)
+        actor = await cog._get_audit_actor(after.guild, discord.AuditLogAction.member_update, target_id=getattr(after, 'id', None))
+        details = {"Before": before.nick or "None", "After": after.nick or "None"}
+        if actor and actor.id != after.id:
+            items.append(LogItem("nickname_change", actor, f"{after.mention}'s nickname was changed by {actor.mention}.", after.guild, details, discord.Color.purple()))
         else:
-            await self._add_log("member_remove", member, f"{member.mention} left the server.", member.guild, color=discord.Color.orange())
-
-    @commands.Cog.listener()
-    async def on_member_ban(self, guild, user):
-        if not self.bot.config["events"].get("on_member_ban"):
-            return
-        # Attempt to find who performed the ban via audit logs
-        actor = None
-        try:
-            actor = await self._get_audit_actor(guild, discord.AuditLogAction.ban, target_id=getattr(user, 'id', None))
-        except Exception:
-            actor = None
-
-        if actor:
-            desc = f"{user.mention} was banned by {actor.mention}."
-            await self._add_log("member_ban", actor, desc, guild, color=discord.Color.red())
-        else:
-            await self._add_log("member_ban", user, f"{user.mention} was banned.", guild, color=discord.Color.red())
-
-    @commands.Cog.listener()
-    async def on_member_unban(self, guild, user):
-        if not self.bot.config["events"].get("on_member_unban"):
-            return
-        # Attempt to find who performed the unban via audit logs
-        actor = None
-        try:
-            actor = await self._get_audit_actor(guild, discord.AuditLogAction.unban, target_id=getattr(user, 'id', None))
-        except Exception:
-            actor = None
-
-        if actor:
-            desc = f"{user.mention} was unbanned by {actor.mention}."
-            await self._add_log("member_unban", actor, desc, guild, color=discord.Color.light_grey())
-        else:
-            await self._add_log("member_unban", user, f"{user.mention} was unbanned.", guild, color=discord.Color.light_grey())
-
-    @commands.Cog.listener()
-    async def on_member_update(self, before, after):
-        if not self.bot.config["events"].get("on_member_update") or before.bot:
-            return
-        # Nickname change
-        if before.nick != after.nick:
-            # Try to see if an admin changed the nickname (audit log entry)
-            actor = None
-            try:
-                actor = await self._get_audit_actor(after.guild, discord.AuditLogAction.member_update, target_id=getattr(after, 'id', None))
-            except Exception:
-                actor = None
-
-            details = {"Before": before.nick or "None", "After": after.nick or "None"}
-            if actor and actor.id != after.id:
-                desc = f"{after.mention}'s nickname was changed by {actor.mention}."
-                await self._add_log("nickname_change", actor, desc, after.guild, details=details, color=discord.Color.purple())
-            else:
-                await self._add_log("nickname_change", after, f"{after.mention}'s nickname was changed.", after.guild, details=details, color=discord.Color.purple())
-        # Role change
-        if before.roles != after.roles:
-            added_roles = [r.name for r in after.roles if r not in before.roles]
-            removed_roles = [r.name for r in before.roles if r not in after.roles]
-            if added_roles:
-                await self._add_log("roles_added", after, f"Roles added to {after.mention}", after.guild, details={"Roles": ", ".join(added_roles)}, color=discord.Color.teal())
-            if removed_roles:
-                await self._add_log("roles_removed", after, f"Roles removed from {after.mention}", after.guild, details={"Roles": ", ".join(removed_roles)}, color=discord.Color.dark_teal())
-
-    @commands.Cog.listener()
-    async def on_user_update(self, before, after):
-        if not self.bot.config["events"].get("on_user_update") or before.bot:
-            return
-        if before.name != after.name:
-            details = {"Before": before.name, "After": after.name}
-            for guild in self.bot.guilds:
-                if guild.get_member(after.id):
-                    await self._add_log("username_change", after, f"{after.mention}'s username was changed.", guild, details=details, color=discord.Color.purple())
-        if before.avatar != after.avatar:
-            details = {"Avatar URL": str(after.display_avatar.url)}
-            for guild in self.bot.guilds:
-                if guild.get_member(after.id):
-                    await self._add_log("avatar_change", after, f"{after.mention}'s avatar was changed.", guild, details=details, color=discord.Color.purple())
+            items.append(LogItem("nickname_change", after, f"{after.mention}'s nickname was changed.", after.guild, details, discord.Color.purple()))
+    # Role change
+    if before.roles != after.roles:
+        added_roles = [r.name for r in after.roles if r not in before.roles]
+        removed_roles = [r.name for r in before.roles if r not in after.roles]
+        if added_roles:
+            items.append(LogItem("roles_added", after, f"Roles added to {after.mention}", after.guild, {"Roles": ", ".join(added_roles)}, discord.Color.teal()))
+        if removed_roles:
+            items.append(LogItem("roles_removed", after, f"Roles removed from {after.mention}", after.guild, {"Roles": ", ".join(removed_roles)}, discord.Color.dark_teal()))
+    return items
+
+
+async def _build_user_update(cog, before, after):
+    # A user update is global; log it once per shared guild. Guilds come from the
+    # member index instead of probing every guild's member cache.
+    changes = []
+    if before.name != after.name:
+        changes.append(("username_change", f"{after.mention}'s username was changed.", {"Before": before.name, "After": after.name}))
+    if before.avatar != after.avatar:
+        changes.append(("avatar_change", f"{after.mention}'s avatar was changed.", {"Avatar URL": str(after.display_avatar.url)}))
+    if not changes:
+        return []
+    guilds = [g for g in map(cog.bot.get_guild, cog.bot.member_index.guilds_for(after.id)) if g is not None]
+    return [LogItem(event_type, after, description, guild, details, discord.Color.purple())
+            for event_type, description, details in changes for guild in guilds]
+
+
+async def _build_voice_state_update(cog, member, before, after):
+    # Joined a channel
+    if not before.channel and after.channel:
+        return [LogItem("voice_join", member, f"{member.mention} joined voice channel `{after.channel.name}`.", member.guild, color=discord.Color.dark_green())]
+    # Left a channel
+    if before.channel and not after.channel:
+        return [LogItem("voice_leave", member, f"{member.mention} left voice channel `{before.channel.name}`.", member.guild, color=discord.Color.dark_orange())]
+    # Moved channel
+    if before.channel and after.channel and before.channel != after.channel:
+        details = {"From": before.channel.name, "To": after.channel.name}
+        return [LogItem("voice_move", member, f"{member.mention} moved voice channels.", member.guild, details, discord.Color.dark_purple())]
+    return []
+
+
+def _by_actor(actor, done: str, base: str) -> str:
+    return f"{base} {done} by {actor.mention}." if actor else f"{base} {done}."
+
+
+LOG_EVENTS = [
+    # --- Member Events ---
+    EventSpec("on_member_join", "member_join", discord.Color.green(),
+              describe=lambda actor, member: f"{member.mention} joined the server.",
+              guild=lambda member: member.guild, author=lambda actor, member: member),
+    EventSpec("on_member_remove", build=_build_member_remove),
+    EventSpec("on_member_ban", "member_ban", discord.Color.red(),
+              describe=lambda actor, guild, user: _by_actor(actor, "banned", f"{user.mention} was"),
+              guild=lambda guild, user: guild, author=lambda actor, guild, user: actor or user,
+              audit_action=discord.AuditLogAction.ban, audit_target=lambda guild, user: getattr(user, 'id', None)),
+    EventSpec("on_member_unban", "member_unban", discord.Color.light_grey(),
+              describe=lambda actor, guild, user: _by_actor(actor, "unbanned", f"{user.mention} was"),
+              guild=lambda guild, user: guild, author=lambda actor, guild, user: actor or user,
+              audit_action=discord.AuditLogAction.unban, audit_target=lambda guild, user: getattr(user, 'id', None)),
+    EventSpec("on_member_update", build=_build_member_update, skip=lambda before, after: before.bot),
+    EventSpec("on_user_update", build=_build_user_update, skip=lambda before, after: before.bot),
 
     # --- Message Events ---
-
-    @commands.Cog.listener()
-    async def on_message_delete(self, message):
-        # Log the channel name instead of raw ID for better readability
-        ch_label = getattr(message.channel, 'name', None) or getattr(message.channel, 'id', None)
-        logger.info(f"on_message_delete event received: author={getattr(message.author, 'id', None)} channel={ch_label}")
-        try:
-            self.bot._event_counters['message_delete'] += 1
-        except Exception:
-            pass
-        if not self.bot.config["events"].get("on_message_delete") or (message.author and message.author.bot):
-            return
-        ch_label = getattr(message.channel, 'name', None) or str(getattr(message.channel, 'id', 'unknown'))
-        details = {"Content": message.content or "N/A", "Channel": f"#{ch_label}"}
-        await self._add_log("message_delete", message.author, f"A message was deleted.", message.guild, details=details, color=discord.Color.dark_red())
-
-    @commands.Cog.listener()
-    async def on_message_edit(self, before, after):
-        ch_label = getattr(before.channel, 'name', None) or getattr(before.channel, 'id', None)
-        logger.info(f"on_message_edit event received: author={getattr(before.author, 'id', None)} channel={ch_label}")
-        try:
-            self.bot._event_counters['message_edit'] += 1
-        except Exception:
-            pass
-        if not self.bot.config["events"].get("on_message_edit") or (before.author and before.author.bot) or before.content == after.content:
-            return
-        ch_label = getattr(before.channel, 'name', None) or str(getattr(before.channel, 'id', 'unknown'))
-        details = {"Before": before.content, "After": after.content, "Channel": f"#{ch_label}"}
-        await self._add_log("message_edit", before.author, f"A message was edited. [Jump to Message]({after.jump_url})", before.guild, details=details, color=discord.Color.greyple())
-
-    @commands.Cog.listener()
-    async def on_bulk_message_delete(self, messages):
-        logger.info(f"on_bulk_message_delete event received: count={len(messages)}")
-        try:
-            self.bot._event_counters['bulk_message_delete'] += 1
-        except Exception:
-            pass
-        if not self.bot.config["events"].get("on_bulk_message_delete"):
-            return
-        guild = messages[0].guild
-        channel = messages[0].channel
-        ch_label = getattr(channel, 'name', None) or str(getattr(channel, 'id', 'unknown'))
-        details = {"Count": len(messages), "Channel": f"#{ch_label}"}
-        await self._add_log("bulk_message_delete", None, f"{len(messages)} messages were deleted.", guild, details=details, color=discord.Color.darker_red())
+    # Raw variants fire even when discord.py no longer caches the message;
+    # they keep the legacy config keys so existing configs stay valid.
+    EventSpec("on_raw_message_delete", build=_build_raw_message_delete, config_key="on_message_delete",
+              counter="message_delete"),
+    EventSpec("on_raw_message_edit", build=_build_raw_message_edit, config_key="on_message_edit",
+              counter="message_edit"),
+    EventSpec("on_raw_bulk_message_delete", build=_build_raw_bulk_message_delete,
+              config_key="on_bulk_message_delete", counter="bulk_message_delete"),
 
     # --- Role & Channel Events ---
-
-    @commands.Cog.listener()
-    async def on_guild_role_create(self, role):
-        if not self.bot.config["events"].get("on_guild_role_create"):
-            return
-        # Attempt to include the actor who created the role via audit logs
-        actor = await self._get_audit_actor(role.guild, discord.AuditLogAction.role_create, target_id=getattr(role, 'id', None))
-        if actor:
-            description = f"Role {role.mention} (`{role.name}`) was created by {actor.mention}."
-        else:
-            description = f"Role {role.mention} (`{role.name}`) was created."
-        await self._add_log("role_create", actor if actor else None, description, role.guild, color=discord.Color.blue())
-
-    @commands.Cog.listener()
-    async def on_guild_role_delete(self, role):
-        if not self.bot.config["events"].get("on_guild_role_delete"):
-            return
-        # Include both mention and name so the Discord embed clearly references the deleted role
-        # role.mention won't work for deleted role; include the name explicitly
-        actor = await self._get_audit_actor(role.guild, discord.AuditLogAction.role_delete, target_id=getattr(role, 'id', None))
-        if actor:
-            description = f"Role `{role.name}` was deleted by {actor.mention}. (Previously: {role.name})"
-        else:
-            description = f"Role `{role.name}` was deleted. (Previously: {role.name})"
-        await self._add_log("role_delete", actor if actor else None, description, role.guild, color=discord.Color.dark_blue())
-
-    @commands.Cog.listener()
-    async def on_guild_channel_create(self, channel):
-        if not self.bot.config["events"].get("on_guild_channel_create"):
-            return
-        actor = await self._get_audit_actor(channel.guild, discord.AuditLogAction.channel_create, target_id=getattr(channel, 'id', None))
-        if actor:
-            description = f"Channel `{channel.name}` was created by {actor.mention}."
-        else:
-            description = f"Channel `{channel.name}` was created."
-        await self._add_log("channel_create", actor if actor else None, description, channel.guild, color=discord.Color.blue())
-
-    @commands.Cog.listener()
-    async def on_guild_channel_delete(self, channel):
-        if not self.bot.config["events"].get("on_guild_channel_delete"):
-            return
-        actor = await self._get_audit_actor(channel.guild, discord.AuditLogAction.channel_delete, target_id=getattr(channel, 'id', None))
-        if actor:
-            description = f"Channel `{channel.name}` was deleted by {actor.mention}."
-        else:
-            description = f"Channel `{channel.name}` was deleted."
-        await self._add_log("channel_delete", actor if actor else None, description, channel.guild, color=discord.Color.dark_blue())
+    EventSpec("on_guild_role_create", "role_create", discord.Color.blue(),
+              describe=lambda actor, role: _by_actor(actor, "created", f"Role {role.mention} (`{role.name}`) was"),
+              guild=lambda role: role.guild,
+              audit_action=discord.AuditLogAction.role_create, audit_target=lambda role: getattr(role, 'id', None)),
+    EventSpec("on_guild_role_delete", "role_delete", discord.Color.dark_blue(),
+              # role.mention won't work for a deleted role; include the name explicitly
+              describe=lambda actor, role: _by_actor(actor, "deleted", f"Role `{role.name}` was") + f" (Previously: {role.name})",
+              guild=lambda role: role.guild,
+              audit_action=discord.AuditLogAction.role_delete, audit_target=lambda role: getattr(role, 'id', None)),
+    EventSpec("on_guild_channel_create", "channel_create", discord.Color.blue(),
+              describe=lambda actor, channel: _by_actor(actor, "created", f"Channel `{channel.name}` was"),
+              guild=lambda channel: channel.guild,
+              audit_action=discord.AuditLogAction.channel_create, audit_target=lambda channel: getattr(channel, 'id', None)),
+    EventSpec("on_guild_channel_delete", "channel_delete", discord.Color.dark_blue(),
+              describe=lambda actor, channel: _by_actor(actor, "deleted", f"Channel `{channel.name}` was"),
+              guild=lambda channel: channel.guild,
+              audit_action=discord.AuditLogAction.channel_delete, audit_target=lambda channel: getattr(channel, 'id', None)),
 
     # --- Voice Events ---
-
-    @commands.Cog.listener()
-    async def on_voice_state_update(self, member, before, after):
-        if not self.bot.config["events"].get("on_voice_state_update") or member.bot:
-            return
-        # Joined a channel
-        if not before.channel and after.channel:
-            await self._add_log("voice_join", member, f"{member.mention} joined voice channel `{after.channel.name}`.", member.guild, color=discord.Color.dark_green())
-        # Left a channel
-        elif before.channel and not after.channel:
-            await self._add_log("voice_leave", member, f"{member.mention} left voice channel `{before.channel.name}`.", member.guild, color=discord.Color.dark_orange())
-        # Moved channel
-        elif before.channel and after.channel and before.channel != after.channel:
-            details = {"From": before.channel.name, "To": after.channel.name}
-            await self._add_log("voice_move", member, f"{member.mention} moved voice channels.", member.guild, details=details, color=discord.Color.dark_purple())
+    EventSpec("on_voice_state_update", build=_build_voice_state_update, skip=lambda member, before, after: member.bot),
+]
 
 
 async def setup(bot):
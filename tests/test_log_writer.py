@@ -0,0 +1,42 @@
+# tests/test_log_writer.py
+import asyncio
+from datetime import datetime
+
+from utils.log_writer import LogWriter, is_transient
+from utils.spool import LogSpool
+
+
+class SlowWriter(LogWriter):
+    """Writer whose inserts never finish within write_timeout."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.attempts = 0
+
+    async def _insert_rows(self, batch):
+        self.attempts += 1
+        await asyncio.sleep(self.write_timeout * 10)
+
+
+def _rows(n):
+    return [{"event_id": str(i), "timestamp": datetime.utcnow(), "event_type": "message_sent"} for i in range(n)]
+
+
+def test_wait_for_timeout_is_transient():
+    assert is_transient(asyncio.TimeoutError())
+
+
+def test_timed_out_batch_is_spooled_not_dead_lettered(tmp_path):
+    async def run():
+        spool = LogSpool(str(tmp_path))
+        writer = SlowWriter(spool=spool, write_timeout=0.05)
+        await writer._flush(_rows(8))
+        return writer, spool
+
+    writer, spool = asyncio.run(run())
+    assert writer.attempts == 1
+    assert writer.stats["spooled"] == 8
+    assert writer.stats["dead_lettered"] == 0
+    assert not writer._db_available
+    assert spool.has_pending()
+    assert not list(tmp_path.glob("dead-letter-*"))
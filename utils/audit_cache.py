@@ -0,0 +1,105 @@
+# utils/audit_cache.py
+import asyncio
+import logging
+import time
+from collections import deque
+logger = logging.getLogger(__name__)
+
+from utils.metrics import AUDIT_LOOKUP_SECONDS
+
+
+class AuditLogCache:
+    """Per-guild ring buffer of recent audit-log entries, indexed by (action, target_id).
+
+    Entries arrive through the `on_audit_log_entry_create` gateway event, so
+    attributing an action to a moderator becomes a dict lookup instead of a
+    `guild.audit_logs()` REST call. Gateway events such as `on_member_ban`
+    can arrive slightly before the matching audit entry, so `lookup()` waits
+    up to `wait_timeout` seconds for it to show up.
+
+    Entries older than `ttl` seconds are ignored and evicted; each guild keeps
+    at most `max_entries` entries.
+    """
+
+    def __init__(self, max_entries: int = 500, ttl: float = 120.0, wait_timeout: float = 1.5):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self.wait_timeout = float(wait_timeout)
+        # guild_id -> deque[(added_at, key, actor)]
+        self._buffers: dict[int, deque] = {}
+        # guild_id -> {(action, target_id) -> (added_at, actor)}; target_id None = latest for action
+        self._index: dict[int, dict[tuple, tuple]] = {}
+        # (guild_id, action, target_id) -> [Future]
+        self._waiters: dict[tuple, list[asyncio.Future]] = {}
+        # Counters exposed for diagnostics
+        self.stats = {"entries": 0, "hits": 0, "waited_hits": 0, "misses": 0}
+
+    def _evict(self, guild_id: int, now: float):
+        buf = self._buffers[guild_id]
+        index = self._index[guild_id]
+        while buf and (len(buf) > self.max_entries or now - buf[0][0] > self.ttl):
+            added_at, key, _ = buf.popleft()
+            for k in (key, (key[0], None)):
+                cached = index.get(k)
+                if cached is not None and cached[0] <= added_at:
+                    del index[k]
+
+    def add(self, guild_id: int, action, target_id: int | None, actor):
+        """Record that `actor` performed `action` on `target_id` in `guild_id`."""
+        now = time.monotonic()
+        key = (action, int(target_id) if target_id is not None else None)
+        buf = self._buffers.setdefault(guild_id, deque())
+        index = self._index.setdefault(guild_id, {})
+        buf.append((now, key, actor))
+        index[key] = (now, actor)
+        index[(action, None)] = (now, actor)
+        self.stats["entries"] += 1
+        self._evict(guild_id, now)
+
+        for wkey in ((guild_id,) + key, (guild_id, action, None)):
+            for fut in self._waiters.pop(wkey, []):
+                if not fut.done():
+                    fut.set_result(actor)
+
+    def get(self, guild_id: int, action, target_id: int | None = None):
+        """Return the cached actor (or None) without waiting."""
+        index = self._index.get(guild_id)
+        if not index:
+            return None
+        cached = index.get((action, int(target_id) if target_id is not None else None))
+        if cached is None or time.monotonic() - cached[0] > self.ttl:
+            return None
+        return cached[1]
+
+    async def lookup(self, guild_id: int, action, target_id: int | None = None, timeout: float | None = None):
+        """Return the actor for (action, target_id), waiting briefly for the entry to arrive."""
+        start = time.perf_counter()
+        actor = self.get(guild_id, action, target_id)
+        if actor is not None:
+            self.stats["hits"] += 1
+            AUDIT_LOOKUP_SECONDS.labels("hit").observe(time.perf_counter() - start)
+            return actor
+
+        timeout = self.wait_timeout if timeout is None else timeout
+        if timeout <= 0:
+            self.stats["misses"] += 1
+            AUDIT_LOOKUP_SECONDS.labels("miss").observe(time.perf_counter() - start)
+            return None
+        wkey = (guild_id, action, int(target_id) if target_id is not None else None)
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(wkey, []).append(fut)
+        try:
+            actor = await asyncio.wait_for(fut, timeout=timeout)
+            self.stats["waited_hits"] += 1
+            AUDIT_LOOKUP_SECONDS.labels("waited_hit").observe(time.perf_counter() - start)
+            return actor
+        except asyncio.TimeoutError:
+            self.stats["misses"] += 1
+            AUDIT_LOOKUP_SECONDS.labels("miss").observe(time.perf_counter() - start)
+            return None
+        finally:
+            waiters = self._waiters.get(wkey)
+            if waiters and fut in waiters:
+                waiters.remove(fut)
+                if not waiters:
+                    del self._waiters[wkey]
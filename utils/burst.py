@@ -0,0 +1,135 @@
+# utils/burst.py
+import logging
+import time
+from collections import Counter, deque
+logger = logging.getLogger(__name__)
+
+# event_type -> burst group; only these event types are ever aggregated
+BURST_GROUPS = {
+    "member_join": "member_join",
+    "voice_join": "voice",
+    "voice_leave": "voice",
+    "voice_move": "voice",
+    "bulk_message_delete": "bulk_message_delete",
+}
+
+_GROUP_NOUNS = {
+    "member_join": "members joined",
+    "voice": "voice state changes",
+    "bulk_message_delete": "bulk deletions",
+}
+
+# Ids kept per summary; the count is always exact
+MAX_SUMMARY_IDS = 1000
+
+
+class _GuildBurst:
+    __slots__ = ("times", "active", "since", "count", "ids", "types")
+
+    def __init__(self, maxlen: int):
+        self.times = deque(maxlen=maxlen)
+        self.active = False
+        self.since = 0.0
+        self.count = 0
+        self.ids = []
+        self.types = Counter()
+
+
+class BurstDetector:
+    """Per-guild rate detector that switches noisy event groups into summary mode.
+
+    Events are counted per (guild, group) over a sliding `window`. Once a
+    group reaches `threshold` events in the window it enters burst mode:
+    observe() returns True and the caller skips the individual Discord embed
+    (the DB row is still written), while the event is folded into a pending
+    summary. drain() returns those summaries and is called every `window`
+    seconds; a group leaves burst mode only when its rate falls below half
+    the threshold, so a raid hovering around the limit doesn't flap.
+    """
+
+    def __init__(self, threshold: int = 20, window: float = 30.0):
+        self.threshold = max(0, int(threshold))
+        self.window = max(1.0, float(window))
+        self._state: dict[tuple[int, str], _GuildBurst] = {}
+        # Counters exposed for diagnostics
+        self.stats = {"bursts": 0, "aggregated": 0, "summaries": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def configure(self, threshold: int, window: float):
+        self.threshold = max(0, int(threshold))
+        self.window = max(1.0, float(window))
+        if not self.enabled:
+            self._state.clear()
+            return
+        # Resize the history of guilds already seen; pending summaries are kept
+        for state in self._state.values():
+            if state.times.maxlen != self.threshold:
+                state.times = deque(state.times, maxlen=self.threshold)
+
+    def _prune(self, state: _GuildBurst, now: float):
+        cutoff = now - self.window
+        while state.times and state.times[0] < cutoff:
+            state.times.popleft()
+
+    def observe(self, guild_id: int, event_type: str, item_id: str | None = None) -> bool:
+        """Record one event; returns True if it should be aggregated instead of sent individually."""
+        group = BURST_GROUPS.get(event_type)
+        if group is None or not self.enabled:
+            return False
+        now = time.monotonic()
+        key = (guild_id, group)
+        state = self._state.get(key)
+        if state is None:
+            # Only the newest `threshold` timestamps matter for the rate check
+            state = self._state[key] = _GuildBurst(self.threshold)
+        self._prune(state, now)
+        state.times.append(now)
+        if not state.active:
+            if len(state.times) < self.threshold:
+                return False
+            state.active = True
+            state.since = now
+            self.stats["bursts"] += 1
+            logger.warning(f"Burst of {group} events in guild {guild_id} "
+                           f"({len(state.times)} in {self.window:.0f}s); switching to summaries.")
+        state.count += 1
+        state.types[event_type] += 1
+        if item_id is not None and len(state.ids) < MAX_SUMMARY_IDS:
+            state.ids.append(item_id)
+        self.stats["aggregated"] += 1
+        return True
+
+    def drain(self) -> list[dict]:
+        """Collect pending summaries and end bursts whose rate has dropped.
+
+        Returns dicts with guild_id, group, count, seconds, ids and types.
+        """
+        now = time.monotonic()
+        summaries = []
+        for key, state in list(self._state.items()):
+            guild_id, group = key
+            if state.count:
+                summaries.append({
+                    "guild_id": guild_id,
+                    "group": group,
+                    "noun": _GROUP_NOUNS.get(group, "events"),
+                    "count": state.count,
+                    "seconds": max(1, round(now - state.since)),
+                    "ids": state.ids,
+                    "types": dict(state.types),
+                })
+                self.stats["summaries"] += 1
+                state.count = 0
+                state.ids = []
+                state.types = Counter()
+                state.since = now
+            self._prune(state, now)
+            if state.active and len(state.times) < self.threshold / 2:
+                state.active = False
+                logger.info(f"Burst of {group} events in guild {guild_id} ended; back to per-event logging.")
+            if not state.active and not state.times:
+                del self._state[key]
+        return summaries
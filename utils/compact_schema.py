@@ -0,0 +1,263 @@
+# utils/compact_schema.py
+"""Online migration of `logs` to the compact schema (BIGINT ids, event codes, authors table).
+
+Older releases stored guild_id / author_id as VARCHAR and repeated event_type
+and author_name text on every row. This is schema version 4 in
+utils.migrations, which runs every step below. The steps can also be run one
+by one, so the slow part happens while the previous release keeps writing:
+
+    python -m utils.compact_schema status
+    python -m utils.compact_schema all          # prepare + backfill + index, online
+    python -m utils.compact_schema cutover      # stop the old bot first; takes a few ms
+    python -m utils.compact_schema drop-legacy  # once the new release runs fine
+
+- prepare:  add guild_id_new / author_id_new / event_code and a BEFORE INSERT
+            trigger that fills them (and the lookup tables) for new rows
+- backfill: fill existing rows in id ranges of --batch-size, one short
+            transaction per range, sleeping --sleep seconds in between
+- index:    build the new composite indexes (CONCURRENTLY unless partitioned)
+- cutover:  in one transaction under a lock_timeout: drop the trigger and the
+            old indexes, rename the old columns to *_legacy and the new ones
+            to their final names
+- drop-legacy: drop the *_legacy columns
+
+Every step is idempotent; an interrupted backfill can be resumed with
+--start-id (the last range is logged as it goes).
+"""
+import argparse
+import logging
+import sys
+import time
+logger = logging.getLogger(__name__)
+
+from sqlalchemy import text
+import utils.database as udb
+from utils.database import Author, EventType
+
+# (temporary name, final name, columns)
+_NEW_INDEXES = [
+    ("ix_logs_guild_ts_v2", "ix_logs_guild_ts", "guild_id_new, timestamp, id"),
+    ("ix_logs_guild_event_ts_v2", "ix_logs_guild_event_ts", "guild_id_new, event_code, timestamp, id"),
+    ("ix_logs_guild_author_ts_v2", "ix_logs_guild_author_ts", "guild_id_new, author_id_new, timestamp, id"),
+]
+# Indexes on the legacy VARCHAR columns; ix_logs_guild_id / ix_logs_event_type are
+# the single-column indexes the first release created
+_OLD_INDEXES = ["ix_logs_guild_ts", "ix_logs_guild_event_ts", "ix_logs_guild_author_ts",
+                "ix_logs_guild_id", "ix_logs_event_type"]
+_RENAMES = [("guild_id", "guild_id_legacy"), ("author_id", "author_id_legacy"),
+            ("event_type", "event_type_legacy"), ("author_name", "author_name_legacy"),
+            ("guild_id_new", "guild_id"), ("author_id_new", "author_id")]
+
+# Digit strings that fit a BIGINT; anything else ("N/A", "") becomes NULL
+_SNOWFLAKE_FN = """
+CREATE OR REPLACE FUNCTION logs_snowflake(value text) RETURNS bigint LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE WHEN value ~ '^[0-9]{1,18}$' OR (value ~ '^[0-9]{19}$' AND value <= '9223372036854775807')
+                THEN value::bigint END
+$$
+"""
+
+# Looks up existing event types before inserting: an ON CONFLICT skip would
+# still use up a value of the SMALLINT identity.
+_FILL_FN = """
+CREATE OR REPLACE FUNCTION logs_compact_fill() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.guild_id_new = logs_snowflake(NEW.guild_id);
+    NEW.author_id_new = logs_snowflake(NEW.author_id);
+    IF NEW.event_type IS NOT NULL THEN
+        SELECT code INTO NEW.event_code FROM event_types WHERE name = NEW.event_type;
+        IF NOT FOUND THEN
+            INSERT INTO event_types (name) VALUES (NEW.event_type) ON CONFLICT (name) DO NOTHING;
+            SELECT code INTO NEW.event_code FROM event_types WHERE name = NEW.event_type;
+        END IF;
+    END IF;
+    IF NEW.author_id_new IS NOT NULL AND NEW.author_name IS NOT NULL THEN
+        INSERT INTO authors (id, name, updated_at)
+        VALUES (NEW.author_id_new, NEW.author_name, coalesce(NEW.timestamp, now() AT TIME ZONE 'utc'))
+        ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, updated_at = EXCLUDED.updated_at
+        WHERE authors.updated_at <= EXCLUDED.updated_at AND authors.name <> EXCLUDED.name;
+    END IF;
+    RETURN NEW;
+END
+$$
+"""
+
+_BACKFILL_EVENT_TYPES = """
+INSERT INTO event_types (name)
+SELECT DISTINCT l.event_type FROM logs l
+ WHERE l.id >= :lo AND l.id < :hi AND l.event_type IS NOT NULL
+   AND NOT EXISTS (SELECT 1 FROM event_types e WHERE e.name = l.event_type)
+ON CONFLICT (name) DO NOTHING
+"""
+
+# Latest name per author within the range; an older range never overwrites a newer name
+_BACKFILL_AUTHORS = """
+INSERT INTO authors (id, name, updated_at)
+SELECT DISTINCT ON (a.author) a.author, a.name, a.ts FROM (
+    SELECT logs_snowflake(l.author_id) AS author, l.author_name AS name,
+           coalesce(l.timestamp, now() AT TIME ZONE 'utc') AS ts, l.id AS row_id
+      FROM logs l
+     WHERE l.id >= :lo AND l.id < :hi AND l.author_name IS NOT NULL
+) a
+ WHERE a.author IS NOT NULL
+ ORDER BY a.author, a.ts DESC, a.row_id DESC
+ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, updated_at = EXCLUDED.updated_at
+ WHERE authors.updated_at <= EXCLUDED.updated_at AND authors.name <> EXCLUDED.name
+"""
+
+_BACKFILL_ROWS = """
+UPDATE logs l
+   SET guild_id_new = logs_snowflake(l.guild_id),
+       author_id_new = logs_snowflake(l.author_id),
+       event_code = (SELECT e.code FROM event_types e WHERE e.name = l.event_type)
+ WHERE l.id >= :lo AND l.id < :hi
+   AND (l.guild_id_new IS NULL AND l.guild_id IS NOT NULL
+        OR l.author_id_new IS NULL AND l.author_id IS NOT NULL
+        OR l.event_code IS NULL AND l.event_type IS NOT NULL)
+"""
+
+
+def _require(conn, *states: str) -> str:
+    state = udb.logs_schema_state(conn)
+    if state not in states:
+        raise RuntimeError(f"logs table is in the '{state}' state; this step needs {' or '.join(states)}")
+    return state
+
+
+def prepare(lock_timeout_ms: int = 3000):
+    """Add the new columns, the lookup tables and the fill trigger (one short transaction)."""
+    udb.Base.metadata.create_all(bind=udb.engine, tables=[EventType.__table__, Author.__table__])
+    with udb.engine.begin() as conn:
+        if _require(conn, "legacy", "migrating", "compact") == "compact":
+            logger.info("logs already uses the compact schema; nothing to prepare.")
+            return
+        conn.execute(text(f"SET LOCAL lock_timeout = '{int(lock_timeout_ms)}ms'"))
+        conn.execute(text("ALTER TABLE logs ADD COLUMN IF NOT EXISTS guild_id_new BIGINT, "
+                          "ADD COLUMN IF NOT EXISTS author_id_new BIGINT, "
+                          "ADD COLUMN IF NOT EXISTS event_code SMALLINT"))
+        conn.execute(text(_SNOWFLAKE_FN))
+        conn.execute(text(_FILL_FN))
+        conn.execute(text("DROP TRIGGER IF EXISTS logs_compact_fill ON logs"))
+        conn.execute(text("CREATE TRIGGER logs_compact_fill BEFORE INSERT ON logs "
+                          "FOR EACH ROW EXECUTE FUNCTION logs_compact_fill()"))
+    logger.info("Added compact columns and the fill trigger; new rows are now written in both forms.")
+
+
+def backfill(batch_size: int = 10000, sleep: float = 0.1, start_id: int | None = None) -> int:
+    """Fill the new columns of rows written before prepare(). Returns the number of rows updated."""
+    from utils.migrations import Backfill, MigrationRunner
+    with udb.engine.connect() as conn:
+        _require(conn, "migrating")
+    # Rows inserted after prepare() were filled by the trigger; the statements skip them
+    step = Backfill(_BACKFILL_EVENT_TYPES, _BACKFILL_AUTHORS, _BACKFILL_ROWS)
+    return step.run(MigrationRunner(batch_size=batch_size, batch_sleep=sleep), start_id=start_id)
+
+
+def build_indexes(lock_timeout_ms: int = 3000):
+    """Build the composite indexes on the new columns next to the old ones."""
+    from utils.migrations import CreateIndex, MigrationRunner
+    with udb.engine.connect() as conn:
+        _require(conn, "migrating")
+    runner = MigrationRunner(lock_timeout_ms=lock_timeout_ms)
+    for name, _, columns in _NEW_INDEXES:
+        started = time.monotonic()
+        CreateIndex(name, "logs", f"({columns})").run(runner)
+        logger.info(f"Index {name} ready ({time.monotonic() - started:.1f}s).")
+
+
+def cutover(lock_timeout_ms: int = 3000):
+    """Swap the new columns and indexes in. Run with the previous bot release stopped."""
+    from utils.migrations import MigrationRunner
+    with udb.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if _require(conn, "migrating", "compact") == "compact":
+            logger.info("logs already uses the compact schema.")
+            return
+        conn.execute(text("SET statement_timeout = 0"))
+        for name, _, _ in _NEW_INDEXES:
+            valid = conn.execute(text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+                                 {"name": name}).scalar()
+            if not valid:
+                raise RuntimeError(f"index {name} is missing or invalid; run the index step first")
+        pending = conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM logs WHERE event_code IS NULL AND event_type IS NOT NULL)")).scalar()
+        if pending:
+            raise RuntimeError("some rows are not backfilled yet; run the backfill step first")
+    # Retried with backoff if the ACCESS EXCLUSIVE lock isn't granted within lock_timeout
+    MigrationRunner(lock_timeout_ms=lock_timeout_ms).with_lock_retries(_swap_columns)
+    logger.info("Cutover done; logs now uses the compact schema.")
+
+
+def _swap_columns(lock_timeout_ms: int):
+    with udb.engine.begin() as conn:
+        conn.execute(text(f"SET LOCAL lock_timeout = '{int(lock_timeout_ms)}ms'"))
+        conn.execute(text("DROP TRIGGER IF EXISTS logs_compact_fill ON logs"))
+        conn.execute(text("DROP FUNCTION IF EXISTS logs_compact_fill()"))
+        conn.execute(text(f"DROP INDEX IF EXISTS {', '.join(_OLD_INDEXES)}"))
+        for old, new in _RENAMES:
+            conn.execute(text(f"ALTER TABLE logs RENAME COLUMN {old} TO {new}"))
+        for name, final, _ in _NEW_INDEXES:
+            conn.execute(text(f"ALTER INDEX {name} RENAME TO {final}"))
+
+
+def migrate(batch_size: int = 10000, sleep: float = 0.1, lock_timeout_ms: int = 3000):
+    """All steps up to the cutover; already finished steps are cheap no-ops."""
+    with udb.engine.connect() as conn:
+        if udb.logs_schema_state(conn) == "compact":
+            return
+    prepare(lock_timeout_ms)
+    backfill(batch_size, sleep)
+    build_indexes(lock_timeout_ms)
+    cutover(lock_timeout_ms)
+
+
+def drop_legacy(lock_timeout_ms: int = 3000):
+    """Drop the *_legacy columns. Metadata only; the space is reclaimed as rows are rewritten."""
+    with udb.engine.begin() as conn:
+        _require(conn, "compact")
+        conn.execute(text(f"SET LOCAL lock_timeout = '{int(lock_timeout_ms)}ms'"))
+        conn.execute(text("ALTER TABLE logs " + ", ".join(
+            f"DROP COLUMN IF EXISTS {new}" for old, new in _RENAMES if new.endswith("_legacy"))))
+        conn.execute(text("DROP FUNCTION IF EXISTS logs_snowflake(text)"))
+    logger.info("Dropped the legacy logs columns.")
+
+
+def status() -> dict:
+    with udb.engine.connect() as conn:
+        state = udb.logs_schema_state(conn)
+        indexes = {name: conn.execute(text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+                                      {"name": name}).scalar() for name, _, _ in _NEW_INDEXES}
+        legacy = conn.execute(text(
+            "SELECT count(*) FROM information_schema.columns WHERE table_schema = current_schema() "
+            "AND table_name = 'logs' AND column_name LIKE '%\\_legacy'")).scalar()
+    return {"state": state, "new_indexes": indexes, "legacy_columns": legacy}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("step", choices=("status", "prepare", "backfill", "index", "all", "cutover", "drop-legacy"))
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows (id range) per backfill transaction")
+    parser.add_argument("--sleep", type=float, default=0.1, help="Seconds to pause between backfill batches")
+    parser.add_argument("--start-id", type=int, help="Resume the backfill from this id")
+    parser.add_argument("--lock-timeout-ms", type=int, default=3000)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    try:
+        if args.step == "status":
+            print(status())
+        if args.step in ("prepare", "all"):
+            prepare(args.lock_timeout_ms)
+        if args.step in ("backfill", "all"):
+            backfill(args.batch_size, args.sleep, args.start_id)
+        if args.step in ("index", "all"):
+            build_indexes(args.lock_timeout_ms)
+        if args.step == "cutover":
+            cutover(args.lock_timeout_ms)
+        if args.step == "drop-legacy":
+            drop_legacy(args.lock_timeout_ms)
+    except Exception as e:
+        logger.error(f"{args.step} failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
 # util/database.py
 import os
+import json
+import asyncio
 from datetime import datetime, timedelta
 import logging
 logger = logging.getLogger(__name__)
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
+from sqlalchemy import (create_engine, Column, Integer, BigInteger, SmallInteger, String, DateTime, Identity,
+                        Index, LargeBinary, text)
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.dialects.postgresql import JSONB
 
@@ -36,37 +40,247 @@ def get_secret(name, file_var):
 
     raise RuntimeError(f"{name} not found")
 
-db_password = get_secret("POSTGRES_PASSWORD", "POSTGRES_PASSWORD_FILE")
-                               
 db_user = os.getenv("POSTGRES_USER")
 db_name = os.getenv("POSTGRES_DB")
 # Defaults: container name/service is typically 'postgres-db' on the compose network; default port 5432
 db_host = os.getenv("POSTGRES_HOST", "postgres-db")
 db_port = os.getenv("POSTGRES_PORT", "5432")
 
-DATABASE_URL = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except Exception:
+        logger.warning(f"Invalid integer for {name}, using default {default}")
+        return int(default)
+
+# Connection pool / session settings (shared by the sync and async engines)
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 30)
+DB_POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = _env_int("DB_STATEMENT_TIMEOUT_MS", 15000)
+
+# Optional range partitioning of `logs` by timestamp: none | daily | monthly.
+# Only applies when the table is first created (see utils.partitions).
+LOGS_PARTITIONING = os.getenv("LOGS_PARTITIONING", "none").lower()
+LOGS_PARTITIONS_AHEAD = _env_int("LOGS_PARTITIONS_AHEAD", 3)
+
+# Schema migrations (see utils.migrations): auto applies pending versions at
+# startup up to the first one marked manual, all applies every version, off skips.
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "auto").lower()
+MIGRATION_LOCK_TIMEOUT_MS = _env_int("MIGRATION_LOCK_TIMEOUT_MS", 3000)
+MIGRATION_BATCH_SIZE = _env_int("MIGRATION_BATCH_SIZE", 10000)
+MIGRATION_BATCH_SLEEP_MS = _env_int("MIGRATION_BATCH_SLEEP_MS", 100)
+
+_pool_kwargs = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+
+def _database_url(driver: str) -> str:
+    password = get_secret("POSTGRES_PASSWORD", "POSTGRES_PASSWORD_FILE")
+    return f"postgresql+{driver}://{db_user}:{password}@{db_host}:{db_port}/{db_name}"
+
+# Engines are created on first use rather than at import, so importing the bot
+# (or a CLI helper) never resolves secrets, and startup can connect to Discord
+# while the database is still coming up. Existing callers keep using
+# `udb.engine` / `udb.async_engine`; module __getattr__ builds them lazily.
+_LAZY = {}
+
+def get_engine():
+    """Synchronous engine (psycopg2): init/migration scripts and get_db_session()."""
+    if "engine" not in _LAZY:
+        _LAZY["engine"] = create_engine(
+            _database_url("psycopg2"),
+            echo=False,
+            connect_args={"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"},
+            **_pool_kwargs,
+        )
+    return _LAZY["engine"]
+
+def get_async_engine():
+    """Async engine (asyncpg): used by everything running on the bot's event loop."""
+    if "async_engine" not in _LAZY:
+        _LAZY["async_engine"] = create_async_engine(
+            _database_url("asyncpg"),
+            echo=False,
+            connect_args={"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}},
+            **_pool_kwargs,
+        )
+    return _LAZY["async_engine"]
+
+def _session_factory(name: str):
+    if name not in _LAZY:
+        if name == "SessionLocal":
+            _LAZY[name] = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+        else:
+            _LAZY[name] = async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+    return _LAZY[name]
+
+def __getattr__(name):
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    if name in ("SessionLocal", "AsyncSessionLocal"):
+        return _session_factory(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-engine = create_engine(DATABASE_URL, echo=False) 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Full-text document for a log row: the description plus the message content
+# fields stored in `details`. Indexed as an expression (GIN) so existing tables
+# gain search without a rewrite; queries must use this exact expression.
+SEARCH_VECTOR_SQL = (
+    "to_tsvector('simple'::regconfig, "
+    "coalesce(description, '') || ' ' || "
+    "coalesce(details ->> 'Content', '') || ' ' || "
+    "coalesce(details ->> 'Before', '') || ' ' || "
+    "coalesce(details ->> 'After', ''))"
+)
+
 class LogEntry(Base):
     __tablename__ = "logs"
     id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime, default=datetime.utcnow)
-    event_type = Column(String, index=True)
-    author_id = Column(String)
-    author_name = Column(String)
+    # Client-generated id so replayed/retried rows are written exactly once
+    event_id = Column(String(32), nullable=True)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    # Discord snowflakes; names live in the `authors` / `event_types` lookup tables
+    event_code = Column(SmallInteger)
+    author_id = Column(BigInteger)
     description = Column(String)
-    guild_id = Column(String, index=True)
+    guild_id = Column(BigInteger)
     details = Column(JSONB, nullable=True)
+    # Compressed messages of a bulk delete (see utils.message_archive); NULL otherwise
+    archive = Column(LargeBinary, nullable=True)
+
+    __table_args__ = (
+        Index("ix_logs_event_id", "event_id", unique=True),
+        # Keyset pagination / filtered browsing (see utils.log_queries)
+        Index("ix_logs_guild_ts", "guild_id", "timestamp", "id"),
+        Index("ix_logs_guild_event_ts", "guild_id", "event_code", "timestamp", "id"),
+        Index("ix_logs_guild_author_ts", "guild_id", "author_id", "timestamp", "id"),
+        # Full-text search over description / message content (see utils.log_queries)
+        Index("ix_logs_search", text(SEARCH_VECTOR_SQL), postgresql_using="gin"),
+    )
 
-def init_db():
+class EventType(Base):
+    """Event type names, referenced from `logs.event_code` (see utils.dimensions)."""
+    __tablename__ = "event_types"
+    code = Column(SmallInteger, Identity(), primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+
+class Author(Base):
+    """Latest known display name per user id, referenced from `logs.author_id`.
+
+    `updated_at` is the timestamp of the log row the name was taken from, so
+    an older row (spool replay, backfill) never overwrites a newer name.
+    """
+    __tablename__ = "authors"
+    id = Column(BigInteger, primary_key=True, autoincrement=False)
+    name = Column(String, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class LogEventHourly(Base):
+    """Rows written per (guild, event code, UTC hour); maintained by the log writer.
+
+    Trends (/stats, /api/stats) are read from here, so their cost depends on
+    the time window and not on the size of `logs` (see utils.rollups).
+    """
+    __tablename__ = "log_event_hourly"
+    # Key order serves "one guild, a time window, any event types"
+    guild_id = Column(BigInteger, primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    event_code = Column(SmallInteger, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_log_event_hourly_hour", "hour"),
+    )
+
+class SchemaMigration(Base):
+    """Applied schema versions (see utils.migrations)."""
+    __tablename__ = "schema_migrations"
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String, nullable=False)
+    applied_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    duration_ms = Column(Integer)
+
+def logs_schema_state(conn) -> str:
+    """'compact' (BIGINT ids, event codes), 'migrating' (utils.compact_schema in progress), 'legacy' or 'missing'."""
+    types = dict(conn.execute(text(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = 'logs'"
+    )).all())
+    if not types:
+        return "missing"
+    if types.get("guild_id") == "bigint":
+        return "compact"
+    return "migrating" if "guild_id_new" in types else "legacy"
+
+# Bulk ingest: COPY into a per-connection staging table, then one INSERT ... SELECT.
+# COPY itself can't skip duplicates, so the final INSERT keeps ON CONFLICT DO
+# NOTHING (event_id de-duplication) and RETURNING for the per-day counters.
+COPY_COLUMNS = ("event_id", "timestamp", "event_code", "author_id", "description", "guild_id", "details", "archive")
+_COPY_STAGE_DDL = (
+    "CREATE TEMP TABLE IF NOT EXISTS logs_copy_stage ("
+    "event_id VARCHAR(32), timestamp TIMESTAMP WITHOUT TIME ZONE, event_code SMALLINT, author_id BIGINT, "
+    "description VARCHAR, guild_id BIGINT, details JSONB, archive BYTEA"
+    ") ON COMMIT DELETE ROWS"
+)
+_COPY_INSERT_SQL = (
+    f"INSERT INTO logs ({', '.join(COPY_COLUMNS)}) SELECT {', '.join(COPY_COLUMNS)} FROM logs_copy_stage "
+    "ON CONFLICT DO NOTHING RETURNING guild_id, event_code, timestamp"
+)
+
+async def copy_log_rows(conn, rows: list[dict]) -> list:
+    """Write log rows through binary COPY; returns (guild_id, event_code, timestamp) of inserted rows.
+
+    `conn` must be an AsyncConnection inside a transaction (async_engine.begin())
+    and `rows` must already be in table form (see utils.dimensions.to_db_rows).
+    Rows are streamed with asyncpg's copy_records_to_table, which skips
+    per-row parameter binding and statement overhead entirely; the staging
+    table empties itself at commit.
+    """
+    # Runs through SQLAlchemy first so the transaction is open before the raw COPY
+    await conn.execute(text(_COPY_STAGE_DDL))
+    raw = await conn.get_raw_connection()
+    records = [(
+        r["event_id"], r["timestamp"], r["event_code"], r["author_id"], r["description"], r["guild_id"],
+        json.dumps(r["details"]) if r.get("details") is not None else None, r.get("archive"),
+    ) for r in rows]
+    await raw.driver_connection.copy_records_to_table("logs_copy_stage", records=records, columns=COPY_COLUMNS)
+    return (await conn.execute(text(_COPY_INSERT_SQL))).all()
+
+async def init_db_async() -> bool:
+    """Create the engine, ensure tables and apply migrations; False if any step failed (already logged)."""
     try:
-        Base.metadata.create_all(bind=engine)
+        async with get_async_engine().begin() as conn:
+            if LOGS_PARTITIONING in ("daily", "monthly"):
+                from utils.partitions import prepare_partitioned_logs
+                await conn.run_sync(prepare_partitioned_logs, LOGS_PARTITIONING, LOGS_PARTITIONS_AHEAD)
+            await conn.run_sync(Base.metadata.create_all)
         logger.info("Database tables ensured to be created (or already exist).")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
+        return False
+    if MIGRATE_ON_STARTUP in ("auto", "all"):
+        from utils.migrations import migrate
+        try:
+            # The runner is synchronous (psycopg2) and may wait on locks and index builds
+            await asyncio.to_thread(migrate, include_manual=MIGRATE_ON_STARTUP == "all")
+        except Exception as e:
+            logger.error(f"Schema migration failed: {e}")
+            return False
+    return True
 
 def get_db_session():
-    return SessionLocal()
\ No newline at end of file
+    return _session_factory("SessionLocal")()
+
+def get_async_db_session():
+    """Return a new AsyncSession; use as `async with get_async_db_session() as session:`."""
+    return _session_factory("AsyncSessionLocal")()
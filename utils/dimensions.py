@@ -0,0 +1,115 @@
+# utils/dimensions.py
+import logging
+from collections import OrderedDict
+logger = logging.getLogger(__name__)
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import utils.database as udb
+from utils.database import Author, EventType
+
+_BIGINT_MAX = 2**63 - 1
+
+
+def to_snowflake(value) -> int | None:
+    """Parse a Discord id (int or digit string) for a BIGINT column; None if it isn't one."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value if 0 <= value <= _BIGINT_MAX else None
+    value = str(value).strip()
+    if not value.isdigit():
+        return None
+    number = int(value)
+    return number if number <= _BIGINT_MAX else None
+
+
+class Dimensions:
+    """In-process view of the `event_types` and `authors` lookup tables.
+
+    Producers (LoggerCog, the spool) keep handing the writer logical rows
+    with `event_type`, `author_name` and string ids; to_db_rows() turns them
+    into the compact `logs` row (BIGINT ids, SMALLINT event code) and
+    upsert_authors() records each author's latest name. Both are cached, so
+    a steady-state batch adds no lookups and at most one small upsert for
+    authors whose name changed.
+    """
+
+    def __init__(self, max_authors: int = 100000):
+        self.max_authors = max(0, int(max_authors))
+        self._codes: dict[str, int] = {}
+        self._authors: OrderedDict[int, str] = OrderedDict()
+
+    async def event_codes(self, names) -> dict[str, int]:
+        """Codes for `names`, registering unknown ones.
+
+        Unknown names are registered in their own short transaction so a
+        code is never cached for a row that was rolled back. Existing names
+        are looked up before inserting, because every ON CONFLICT skip would
+        still burn a value of the SMALLINT identity.
+        """
+        missing = sorted({n for n in names if n and n not in self._codes})
+        if missing:
+            async with udb.async_engine.begin() as conn:
+                await self._load_codes(conn, missing)
+                unknown = [n for n in missing if n not in self._codes]
+                if unknown:
+                    await conn.execute(pg_insert(EventType).values([{"name": n} for n in unknown])
+                                       .on_conflict_do_nothing(index_elements=[EventType.name]))
+                    await self._load_codes(conn, unknown)
+        return self._codes
+
+    async def _load_codes(self, conn, names: list[str]):
+        result = await conn.execute(select(EventType.code, EventType.name).where(EventType.name.in_(names)))
+        for code, name in result.all():
+            self._codes[name] = code
+
+    async def to_db_rows(self, rows: list[dict]) -> list[dict]:
+        """Convert logical log rows into `logs` table rows."""
+        codes = await self.event_codes(r.get("event_type") for r in rows)
+        return [{
+            "event_id": r.get("event_id"),
+            "timestamp": r["timestamp"],
+            "event_code": codes.get(r.get("event_type")),
+            "author_id": to_snowflake(r.get("author_id")),
+            "description": r.get("description"),
+            "guild_id": to_snowflake(r.get("guild_id")),
+            "details": r.get("details"),
+            "archive": r.get("archive"),
+        } for r in rows]
+
+    def changed_authors(self, rows: list[dict]) -> dict[int, tuple[str, object]]:
+        """{author id: (name, timestamp)} for authors whose latest name isn't cached yet."""
+        latest = {}
+        for r in rows:
+            author_id = to_snowflake(r.get("author_id"))
+            name = r.get("author_name")
+            if author_id is None or not name:
+                continue
+            seen = latest.get(author_id)
+            if seen is None or r["timestamp"] >= seen[1]:
+                latest[author_id] = (name, r["timestamp"])
+        return {a: v for a, v in latest.items() if self._authors.get(a) != v[0]}
+
+    async def upsert_authors(self, conn, authors: dict[int, tuple[str, object]]):
+        """Record latest author names in the caller's transaction; call remember_authors() after commit."""
+        if not authors:
+            return
+        # Sorted so concurrent upserts lock author rows in the same order
+        values = [{"id": a, "name": name, "updated_at": ts} for a, (name, ts) in sorted(authors.items())]
+        stmt = pg_insert(Author).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Author.id],
+            set_={"name": stmt.excluded.name, "updated_at": stmt.excluded.updated_at},
+            where=(Author.updated_at <= stmt.excluded.updated_at) & (Author.name != stmt.excluded.name),
+        )
+        await conn.execute(stmt)
+
+    def remember_authors(self, authors: dict[int, tuple[str, object]]):
+        if not self.max_authors:
+            return
+        for author_id, (name, _) in authors.items():
+            self._authors[author_id] = name
+            self._authors.move_to_end(author_id)
+        while len(self._authors) > self.max_authors:
+            self._authors.popitem(last=False)
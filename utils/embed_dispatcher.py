@@ -0,0 +1,190 @@
+# utils/embed_dispatcher.py
+import asyncio
+import logging
+import time
+from collections import deque
+logger = logging.getLogger(__name__)
+
+import discord
+from utils.metrics import DISCORD_SEND_SECONDS
+
+# Discord limits for a single message
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+
+class EmbedDispatcher:
+    """Per-channel outbound queue that packs embeds into as few messages as possible.
+
+    Each destination channel gets its own bounded queue and worker task. The
+    worker takes up to 10 embeds (and at most 6000 embed characters) per
+    message, so a burst of events turns into a handful of HTTP requests.
+
+    discord.py already honours the X-RateLimit bucket headers on each request;
+    on top of that the dispatcher paces each channel with a token bucket
+    (`rate` messages per `per` seconds, Discord's per-channel send limit) so it
+    waits *before* a 429 rather than after. While a worker waits, new embeds
+    keep accumulating and get packed into the next message. If a 429 still
+    comes back the batch is retried after `retry_after`, and each retry takes
+    a token like any other send.
+
+    When a channel queue is full the oldest embed is dropped and counted.
+    """
+
+    def __init__(self, max_queue_per_channel: int = 1000, rate: int = 5, per: float = 5.0, max_retries: int = 3):
+        self.max_queue_per_channel = max(1, int(max_queue_per_channel))
+        self.rate = max(1, int(rate))
+        self.per = max(0.1, float(per))
+        self.max_retries = max_retries
+        self._queues: dict[int, deque] = {}
+        self._channels: dict[int, discord.abc.Messageable] = {}
+        self._wakeups: dict[int, asyncio.Event] = {}
+        self._tasks: dict[int, asyncio.Task] = {}
+        self._send_times: dict[int, deque] = {}
+        # Embeds a worker has taken off its queue and is still sending
+        self._in_flight: dict[int, int] = {}
+        self._closing = False
+        # Counters exposed for diagnostics
+        self.stats = {"enqueued": 0, "dropped": 0, "messages": 0, "embeds": 0, "rate_limited": 0, "failed": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    @property
+    def in_flight(self) -> int:
+        return sum(self._in_flight.values())
+
+    def queue_depths(self) -> dict[int, int]:
+        return {cid: len(q) for cid, q in self._queues.items()}
+
+    def enqueue(self, channel, embed: discord.Embed) -> bool:
+        """Queue an embed for `channel` without waiting. Returns False if dropped."""
+        if self._closing:
+            self.stats["dropped"] += 1
+            return False
+        cid = channel.id
+        queue = self._queues.get(cid)
+        if queue is None:
+            queue = self._queues[cid] = deque()
+            self._wakeups[cid] = asyncio.Event()
+            self._send_times[cid] = deque(maxlen=self.rate)
+        self._channels[cid] = channel
+
+        dropped = False
+        if len(queue) >= self.max_queue_per_channel:
+            queue.popleft()
+            self.stats["dropped"] += 1
+            dropped = True
+            logger.warning(f"Embed queue for channel {cid} is full ({self.max_queue_per_channel}); dropped oldest embed.")
+        queue.append(embed)
+        self.stats["enqueued"] += 1
+        self._wakeups[cid].set()
+
+        task = self._tasks.get(cid)
+        if task is None or task.done():
+            self._tasks[cid] = asyncio.create_task(self._run(cid), name=f"embed-dispatch-{cid}")
+        return not dropped
+
+    def _take_batch(self, queue: deque) -> list[discord.Embed]:
+        batch = []
+        chars = 0
+        while queue and len(batch) < MAX_EMBEDS_PER_MESSAGE:
+            size = len(queue[0])
+            if batch and chars + size > MAX_EMBED_CHARS_PER_MESSAGE:
+                break
+            batch.append(queue.popleft())
+            chars += size
+        return batch
+
+    async def _wait_for_token(self, cid: int):
+        """Sleep until sending one more message stays within `rate` per `per` seconds."""
+        loop = asyncio.get_running_loop()
+        sent = self._send_times[cid]
+        if len(sent) >= self.rate:
+            wait = sent[0] + self.per - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        sent.append(loop.time())
+
+    async def _run(self, cid: int):
+        queue = self._queues[cid]
+        wakeup = self._wakeups[cid]
+        while True:
+            if not queue:
+                if self._closing:
+                    return
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+            await self._wait_for_token(cid)
+            batch = self._take_batch(queue)
+            if batch:
+                self._in_flight[cid] = len(batch)
+                try:
+                    await self._send(cid, batch)
+                finally:
+                    self._in_flight[cid] = 0
+
+    async def _send(self, cid: int, batch: list[discord.Embed]):
+        channel = self._channels[cid]
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                # A retry is another message as far as the channel limit is concerned
+                await self._wait_for_token(cid)
+            start = time.perf_counter()
+            try:
+                await channel.send(embeds=batch)
+                DISCORD_SEND_SECONDS.labels("ok").observe(time.perf_counter() - start)
+                self.stats["messages"] += 1
+                self.stats["embeds"] += len(batch)
+                return
+            except discord.RateLimited as e:
+                DISCORD_SEND_SECONDS.labels("rate_limited").observe(time.perf_counter() - start)
+                retry_after = e.retry_after
+            except discord.HTTPException as e:
+                DISCORD_SEND_SECONDS.labels("rate_limited" if e.status == 429 else "error").observe(
+                    time.perf_counter() - start)
+                if e.status != 429:
+                    self.stats["failed"] += len(batch)
+                    ch_label = f"#{getattr(channel, 'name', None)}" if getattr(channel, 'name', None) else str(cid)
+                    logger.error(f"Failed to send {len(batch)} log embeds to {ch_label}: {e}")
+                    return
+                retry_after = getattr(e, 'retry_after', None) or self.per
+            except Exception as e:
+                self.stats["failed"] += len(batch)
+                logger.error(f"Unexpected error sending {len(batch)} log embeds to {cid}: {e}", exc_info=True)
+                return
+            finally:
+                # Discord counts the message when it arrives, so the window starts at the response
+                sent = self._send_times.get(cid)
+                if sent:
+                    sent[-1] = asyncio.get_running_loop().time()
+            self.stats["rate_limited"] += 1
+            logger.warning(f"Rate limited sending to channel {cid}; retrying in {retry_after:.2f}s "
+                           f"(attempt {attempt + 1}/{self.max_retries + 1})")
+            await asyncio.sleep(retry_after)
+        self.stats["failed"] += len(batch)
+        logger.error(f"Giving up on {len(batch)} log embeds for channel {cid} after repeated rate limits.")
+
+    async def stop(self, timeout: float = 5.0):
+        """Deliver whatever is still queued or being sent (up to `timeout`), then stop all workers.
+
+        Workers exit on their own once their queue is empty; only those still
+        busy when the timeout expires are cancelled.
+        """
+        self._closing = True
+        for wakeup in self._wakeups.values():
+            wakeup.set()
+        tasks = [t for t in self._tasks.values() if not t.done()]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            if pending:
+                logger.warning(f"Embed dispatcher did not drain within {timeout}s; "
+                               f"{self.queue_depth + self.in_flight} embeds not sent.")
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks.clear()
+        logger.info(f"Embed dispatcher stopped (messages={self.stats['messages']}, embeds={self.stats['embeds']}, "
+                    f"dropped={self.stats['dropped']}, rate_limited={self.stats['rate_limited']})")
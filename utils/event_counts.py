@@ -0,0 +1,43 @@
+# utils/event_counts.py
+import logging
+from datetime import datetime, time
+logger = logging.getLogger(__name__)
+
+from sqlalchemy import func, select, text
+from utils.database import LogEventHourly
+from utils.dimensions import to_snowflake
+
+# Planner statistics for `logs`. A partitioned parent has no rows of its own,
+# so its estimate is the sum over its partitions. reltuples is -1 until the
+# table has been vacuumed/analyzed once.
+_ESTIMATE_SQL = text("""
+SELECT CASE WHEN c.relkind = 'p' THEN
+           (SELECT coalesce(sum(greatest(p.reltuples, 0)), 0)
+              FROM pg_inherits i JOIN pg_class p ON p.oid = i.inhrelid
+             WHERE i.inhparent = c.oid)
+       ELSE greatest(c.reltuples, 0) END
+  FROM pg_class c
+ WHERE c.oid = to_regclass('logs')
+""")
+
+
+async def estimate_log_rows(conn) -> int:
+    """Approximate row count of `logs` from pg_class; O(1) regardless of table size."""
+    value = (await conn.execute(_ESTIMATE_SQL)).scalar()
+    return int(value or 0)
+
+
+async def count_log_rows(conn, exact: bool = False) -> int:
+    """Row count of `logs`: the planner estimate, or a full COUNT(*) when `exact` is set."""
+    if exact:
+        return int((await conn.execute(text("SELECT COUNT(*) FROM logs"))).scalar() or 0)
+    return await estimate_log_rows(conn)
+
+
+async def events_today(conn, guild_id: str | None = None) -> int:
+    """Rows written since UTC midnight, summed from today's hourly rollups."""
+    midnight = datetime.combine(datetime.utcnow().date(), time())
+    stmt = select(func.coalesce(func.sum(LogEventHourly.count), 0)).where(LogEventHourly.hour >= midnight)
+    if guild_id:
+        stmt = stmt.where(LogEventHourly.guild_id == (to_snowflake(guild_id) or 0))
+    return int((await conn.execute(stmt)).scalar() or 0)
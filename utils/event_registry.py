@@ -0,0 +1,158 @@
+# utils/event_registry.py
+import logging
+from typing import NamedTuple
+logger = logging.getLogger(__name__)
+
+import discord
+from utils.metrics import instrumented
+
+
+class LogItem(NamedTuple):
+    """One log entry produced by an event spec (the arguments of LoggerCog._add_log)."""
+    event_type: str
+    author: object
+    description: str
+    guild: object
+    details: dict | None = None
+    color: discord.Color = discord.Color.blue()
+    # Compressed payload stored in logs.archive (bulk deletes)
+    archive: bytes | None = None
+
+
+class EventSpec:
+    """Declarative description of how one gateway event becomes log entries.
+
+    Simple events are fully described by their fields:
+    - guild(*args): the guild the event belongs to
+    - audit_action / audit_target(*args): look up the acting moderator first
+    - author(actor, *args), describe(actor, *args), details(*args)
+    - event_type and color of the resulting entry
+    Events that fan out into several entries (or pick a type at runtime)
+    pass `build`, an async callable (cog, *args) -> list[LogItem], instead.
+
+    `skip(*args)` is a cheap pre-filter (bots, no-op edits) evaluated before
+    any lookup. `config_key` is the key in config["events"] that enables the
+    spec (defaults to the event name); `counter` names a diagnostics counter
+    in bot._event_counters.
+    """
+
+    def __init__(self, event: str, event_type: str | None = None, color: discord.Color | None = None,
+                 describe=None, guild=None, author=None, details=None, audit_action=None, audit_target=None,
+                 skip=None, build=None, config_key: str | None = None, counter: str | None = None):
+        if build is None and (event_type is None or describe is None or guild is None):
+            raise ValueError(f"EventSpec {event}: needs either build or event_type/describe/guild")
+        self.event = event
+        self.event_type = event_type
+        self.color = color or discord.Color.blue()
+        self.describe = describe
+        self.guild = guild
+        self.author = author
+        self.details = details
+        self.audit_action = audit_action
+        self.audit_target = audit_target
+        self.skip = skip
+        self.build = build
+        self.config_key = config_key or event
+        self.counter = counter
+
+    async def render(self, cog, *args) -> list[LogItem]:
+        """Turn the event arguments into log items (empty when the event is skipped)."""
+        if self.skip is not None and self.skip(*args):
+            return []
+        if self.build is not None:
+            return await self.build(cog, *args)
+        guild = self.guild(*args)
+        actor = None
+        if self.audit_action is not None:
+            target_id = self.audit_target(*args) if self.audit_target else None
+            actor = await cog._get_audit_actor(guild, self.audit_action, target_id=target_id)
+        author = self.author(actor, *args) if self.author else actor
+        details = self.details(*args) if self.details else None
+        return [LogItem(self.event_type, author, self.describe(actor, *args), guild, details, self.color)]
+
+
+class EventRegistry:
+    """Registers one bot listener per enabled EventSpec.
+
+    Disabled events get no listener at all, so discord.py never schedules a
+    task for them, except that a spec with a `counter` keeps a listener that
+    only bumps bot._event_counters, so the session counts in /stats cover
+    every received event as before. apply() builds the complete new listener
+    table first and then swaps it in without awaiting, so a config reload
+    never observes a half-updated table or double-registers an event.
+    """
+
+    def __init__(self, bot, specs, dispatch):
+        self.bot = bot
+        self.specs = {spec.event: spec for spec in specs}
+        # async dispatch(spec, *args), normally LoggerCog._dispatch
+        self._dispatch = dispatch
+        # Listeners are built once per event so apply() can compare them by identity
+        self._handlers: dict[str, object] = {}
+        self._counters: dict[str, object] = {}
+        self._listeners: dict[str, object] = {}
+        self._active: list[str] = []
+
+    @property
+    def active(self) -> list[str]:
+        return list(self._active)
+
+    def _count(self, spec: EventSpec):
+        if spec.counter:
+            self.bot._event_counters[spec.counter] += 1
+
+    def _handler(self, spec: EventSpec):
+        if spec.event not in self._handlers:
+            dispatch = self._dispatch
+            count = self._count
+
+            async def listener(*args):
+                count(spec)
+                await dispatch(spec, *args)
+
+            # instrumented() labels metrics by the function name
+            listener.__name__ = listener.__qualname__ = spec.event
+            self._handlers[spec.event] = instrumented(listener)
+        return self._handlers[spec.event]
+
+    def _counter(self, spec: EventSpec):
+        if spec.event not in self._counters:
+            count = self._count
+
+            async def listener(*args):
+                count(spec)
+
+            self._counters[spec.event] = listener
+        return self._counters[spec.event]
+
+    def apply(self, events_config: dict) -> list[str]:
+        """Register listeners for the enabled specs and drop the rest. Returns the active events."""
+        table = {}
+        active = []
+        for event, spec in self.specs.items():
+            if events_config.get(spec.config_key):
+                table[event] = self._handler(spec)
+                active.append(event)
+            elif spec.counter:
+                table[event] = self._counter(spec)
+        # Swap without yielding to the loop
+        for event, listener in self._listeners.items():
+            if table.get(event) is not listener:
+                self.bot.remove_listener(listener, event)
+        for event, listener in table.items():
+            if self._listeners.get(event) is not listener:
+                self.bot.add_listener(listener, event)
+        self._listeners = table
+        self._active = sorted(active)
+        unknown = [k for k, v in events_config.items() if v and not k.startswith("//") and
+                   k not in {s.config_key for s in self.specs.values()}]
+        if unknown:
+            logger.warning(f"Enabled events without a handler spec: {', '.join(sorted(unknown))}")
+        logger.info(f"Log events active: {len(active)}/{len(self.specs)}")
+        return self.active
+
+    def clear(self):
+        for event, listener in self._listeners.items():
+            self.bot.remove_listener(listener, event)
+        self._listeners = {}
+        self._active = []
@@ -5,39 +5,59 @@ logger = logging.getLogger(__name__)
 import utils.database as udb
 from sqlalchemy import text
 from datetime import datetime, timezone
+from collections import deque
 import psutil
+import time
 import os
+import json
+import hmac
+from utils.event_counts import count_log_rows, events_today
+from utils.metrics import render_latest
+from utils.log_queries import build_logs_query, encode_cursor, row_to_dict, search_logs, DEFAULT_PAGE_SIZE
+from utils.rollups import fetch_trend
 
 
-def _sync_db_check():
-    """Synchronous database health check."""
+async def _check_db(exact: bool = False):
+    """Database health check on the async engine (no executor hop).
+
+    The event count is the pg_class estimate for `logs` plus today's count
+    from log_event_hourly, so the probe stays O(1) however large the table
+    grows; `exact` runs a real COUNT(*) instead.
+    """
     try:
-        udb_engine = getattr(udb, 'engine', None)
+        udb_engine = getattr(udb, 'async_engine', None)
         if udb_engine is None:
-            return False, 'no-engine', 0
+            return False, 'no-engine', 0, 0, 0
         
         start_time = datetime.now()
-        with udb_engine.connect() as conn:
+        async with udb_engine.connect() as conn:
             # Test basic connectivity
-            conn.execute(text("SELECT 1"))
+            await conn.execute(text("SELECT 1"))
             
-            # Try to get event count if log_entries table exists
             try:
-                result = conn.execute(text("SELECT COUNT(*) FROM log_entries"))
-                event_count = result.scalar() or 0
-            except Exception:
-                event_count = 0
+                event_count = await count_log_rows(conn, exact=exact)
+                today_count = await events_today(conn)
+            except Exception as e:
+                logger.debug(f"Event count unavailable: {e}")
+                event_count, today_count = 0, 0
                 
         response_time = (datetime.now() - start_time).total_seconds() * 1000  # ms
-        return True, None, event_count, response_time
+        return True, None, event_count, today_count, response_time
     except Exception as e:
-        return False, str(e), 0, 0
+        return False, str(e), 0, 0, 0
+
+
+_PROCESS = None
 
 
 def _get_system_info():
     """Get system resource information."""
+    global _PROCESS
     try:
-        process = psutil.Process()
+        # Reuse one Process so cpu_percent() measures the interval since the previous call
+        if _PROCESS is None:
+            _PROCESS = psutil.Process()
+        process = _PROCESS
         return {
             "cpu_percent": process.cpu_percent(),
             "memory_mb": process.memory_info().rss / 1024 / 1024,
@@ -56,68 +76,391 @@ def _get_system_info():
         }
 
 
-async def _check_db():
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, _sync_db_check)
+_PROCESS_START = None
 
 
-async def health_handler(request):
-    """Enhanced health check endpoint with comprehensive status."""
-    # Get database status
-    db_result = await _check_db()
-    if len(db_result) == 4:
-        db_ok, db_err, event_count, db_response_time = db_result
-    else:
-        # Fallback for old format
-        db_ok, db_err = db_result[:2]
-        event_count, db_response_time = 0, 0
-    
-    # Get system information
-    system_info = _get_system_info()
-    
-    # Build comprehensive health response
-    health_data = {
-        "status": "healthy" if db_ok else "unhealthy",
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-        "database": {
-            "status": "connected" if db_ok else "disconnected",
-            "error": db_err if not db_ok else None,
-            "response_time_ms": round(db_response_time, 2) if db_ok else None,
-            "event_count": event_count if db_ok else None
-        },
-        "system": {
-            "cpu_percent": round(system_info["cpu_percent"], 1),
-            "memory_mb": round(system_info["memory_mb"], 1),
-            "pid": system_info["pid"],
-            "threads": system_info["threads"],
-            "uptime_seconds": round(system_info["uptime_seconds"])
-        },
-        "service": {
-            "name": "sentry-discord-bot",
-            "version": "1.0.0"
+def _process_start_time() -> float:
+    """Process start as a UNIX timestamp (looked up once)."""
+    global _PROCESS_START
+    if _PROCESS_START is None:
+        try:
+            _PROCESS_START = psutil.Process().create_time()
+        except Exception:
+            _PROCESS_START = time.time()
+    return _PROCESS_START
+
+
+# Upper bounds (ms) of the DB probe latency histogram buckets
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class HealthProber:
+    """Refreshes a health snapshot in the background so probes never touch the DB.
+
+    Every `interval` seconds one DB round trip and one psutil sample are
+    taken, together with pool stats, gateway latency and queue depths. The
+    HTTP handlers serve the last snapshot as-is; `?fresh=1` forces a refresh,
+    and concurrent refreshes share a single probe. The last `window` DB
+    latencies are kept for percentiles, next to a cumulative bucket histogram.
+    """
+
+    def __init__(self, bot=None, interval: float = 10.0, window: int = 360):
+        self.bot = bot
+        self.interval = max(1.0, float(interval))
+        self.stale_after = self.interval * 3
+        self._latencies = deque(maxlen=max(1, int(window)))
+        self._buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._task = None
+        self._inflight = None
+        self.snapshot = None
+        self._taken_at = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="health-prober")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Health probe failed unexpectedly")
+            await asyncio.sleep(self.interval)
+
+    @property
+    def age(self) -> float | None:
+        """Seconds since the current snapshot was taken (None before the first probe)."""
+        if self._taken_at is None:
+            return None
+        return time.monotonic() - self._taken_at
+
+    async def refresh(self) -> dict:
+        """Take a new snapshot; callers arriving while one is in flight await the same probe."""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self.probe())
+        return await asyncio.shield(self._inflight)
+
+    def _record_latency(self, ms: float):
+        self._latencies.append(ms)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self._buckets[i] += 1
+                break
+        else:
+            self._buckets[-1] += 1
+
+    def _latency_summary(self) -> dict:
+        values = sorted(self._latencies)
+        if not values:
+            return {"samples": 0}
+
+        def pct(p):
+            return round(values[min(len(values) - 1, int(p * len(values)))], 2)
+
+        # Cumulative counts per upper bound (all probes since start), Prometheus-style
+        histogram = {}
+        running = 0
+        for bound, n in zip(LATENCY_BUCKETS_MS, self._buckets):
+            running += n
+            histogram[f"le_{bound}"] = running
+        histogram["le_inf"] = running + self._buckets[-1]
+        return {"samples": len(values), "p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99),
+                "max": round(values[-1], 2), "histogram": histogram}
+
+    def _pool_stats(self) -> dict:
+        try:
+            pool = udb.async_engine.pool
+            return {"size": pool.size(), "checked_out": pool.checkedout(), "checked_in": pool.checkedin(),
+                    "overflow": pool.overflow()}
+        except Exception:
+            return {}
+
+    def _bot_stats(self) -> tuple[dict, dict]:
+        bot = self.bot
+        if bot is None:
+            return {}, {}
+        latency = bot.latency
+        discord_info = {
+            "ready": bot.is_ready(),
+            "latency_ms": round(latency * 1000, 1) if latency == latency and latency != float("inf") else None,
+            "guilds": len(bot.guilds)
         }
+        queues = {}
+        writer = getattr(bot, "log_writer", None)
+        if writer is not None:
+            queues["writer"] = {"depth": writer.queue_depth, **writer.stats}
+            if writer.spool is not None:
+                queues["writer"]["spool_segments"] = writer.spool.pending_segments()
+        dispatcher = getattr(bot, "embed_dispatcher", None)
+        if dispatcher is not None:
+            queues["dispatcher"] = {"depth": dispatcher.queue_depth, **dispatcher.stats}
+        return discord_info, queues
+
+    async def probe(self, exact: bool = False) -> dict:
+        """Run one probe. Snapshots with an exact event count are returned but never cached."""
+        db_ok, db_err, event_count, today_count, db_response_time = await _check_db(exact=exact)
+        if db_ok and not exact:
+            self._record_latency(db_response_time)
+        system_info = _get_system_info()
+        discord_info, queues = self._bot_stats()
+        startup = getattr(self.bot, "startup", None)
+        writer = getattr(self.bot, "log_writer", None)
+        schema_state = writer.schema_state if writer is not None else None
+        # The bot is not storing logs while the table layout is unsupported
+        schema_ok = schema_state in (None, "compact")
+        snapshot = {
+            "status": "healthy" if db_ok and schema_ok else "unhealthy",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "database": {
+                "status": "connected" if db_ok else "disconnected",
+                "error": db_err if not db_ok else None,
+                "response_time_ms": round(db_response_time, 2) if db_ok else None,
+                "event_count": event_count if db_ok else None,
+                "event_count_exact": exact,
+                "events_today": today_count if db_ok else None,
+                "latency_ms": self._latency_summary(),
+                "pool": self._pool_stats(),
+                "schema": schema_state
+            },
+            "discord": discord_info,
+            "queues": queues,
+            "startup": startup.summary() if startup is not None else None,
+            "system": {
+                "cpu_percent": round(system_info["cpu_percent"], 1),
+                "memory_mb": round(system_info["memory_mb"], 1),
+                "pid": system_info["pid"],
+                "threads": system_info["threads"],
+                "uptime_seconds": round(system_info["uptime_seconds"])
+            },
+            "service": {
+                "name": "sentry-discord-bot",
+                "version": "1.0.0"
+            }
+        }
+        if not db_ok:
+            logger.warning(f"Health check failed - DB: {db_err}")
+        if not exact:
+            self.snapshot = snapshot
+            self._taken_at = time.monotonic()
+        return snapshot
+
+
+def _query_flag(request, name: str) -> bool:
+    return request.query.get(name, "").lower() in ("1", "true", "yes")
+
+
+def _check_probe_auth(request):
+    """?fresh=1 / ?exact=1 query the database on demand, so they need the log API token."""
+    if _query_flag(request, "exact") or _query_flag(request, "fresh"):
+        return _check_api_auth(request)
+    return None
+
+
+async def _current_snapshot(request) -> tuple[dict, float]:
+    """Return (snapshot, age_seconds); probes only on ?fresh=1 / ?exact=1 or before the first probe."""
+    prober = request.app.get("prober")
+    if prober is None:
+        prober = request.app["prober"] = HealthProber()
+    if _query_flag(request, "exact"):
+        return await prober.probe(exact=True), 0.0
+    if _query_flag(request, "fresh") or prober.snapshot is None:
+        await prober.refresh()
+    return prober.snapshot, prober.age or 0.0
+
+
+async def health_handler(request):
+    """Comprehensive health status, served from the prober's cached snapshot.
+
+    `?fresh=1` probes before answering; `?exact=1` also runs an exact COUNT(*)
+    of stored events. Both require the log API token. `snapshot.age_seconds` /
+    `snapshot.stale` report how old the data is.
+    """
+    denied = _check_probe_auth(request)
+    if denied is not None:
+        return denied
+    snapshot, age = await _current_snapshot(request)
+    prober = request.app["prober"]
+    health_data = dict(snapshot)
+    health_data["snapshot"] = {
+        "age_seconds": round(age, 3),
+        "stale": age > prober.stale_after,
+        "interval_seconds": prober.interval
     }
-    
-    status_code = 200 if db_ok else 503
-    
-    if not db_ok:
-        logger.warning(f"Health check failed - DB: {db_err}")
-        
+    status_code = 200 if snapshot["status"] == "healthy" else 503
     return web.json_response(health_data, status=status_code)
 
 
-async def start_health_server(host: str = "0.0.0.0", port: int = 8080):
+def _api_token():
+    """Bearer token protecting the /api endpoints (LOG_API_TOKEN / LOG_API_TOKEN_FILE / secret)."""
+    try:
+        return udb.get_secret("LOG_API_TOKEN", "LOG_API_TOKEN_FILE")
+    except RuntimeError:
+        return None
+
+
+def _check_api_auth(request):
+    """Return an error response if the request is not authorized for the log API, else None."""
+    token = request.app.get("api_token")
+    if not token:
+        return web.json_response({"error": "log API disabled (LOG_API_TOKEN not configured)"}, status=503)
+    supplied = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+        return web.json_response({"error": "unauthorized"}, status=401)
+    return None
+
+
+def _parse_time(value):
+    """Parse an ISO-8601 query value into a naive UTC datetime (as stored in `logs`)."""
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+async def logs_api_handler(request):
+    """GET /api/logs - filtered, keyset-paginated log browsing (FR-5).
+
+    Query parameters: guild_id, event_type, author_id, since, until (ISO-8601),
+    q (free text), limit (<= 500) and cursor (from the previous page's
+    `next_cursor`). Rows are streamed to the client as they are read.
+    """
+    denied = _check_api_auth(request)
+    if denied is not None:
+        return denied
+    params = request.query
+    try:
+        stmt, limit = build_logs_query(
+            guild_id=params.get("guild_id"),
+            event_type=params.get("event_type"),
+            author_id=params.get("author_id"),
+            since=_parse_time(params.get("since")),
+            until=_parse_time(params.get("until")),
+            text_query=params.get("q"),
+            cursor=params.get("cursor"),
+            limit=int(params.get("limit", DEFAULT_PAGE_SIZE)),
+        )
+    except ValueError as e:
+        return web.json_response({"error": f"bad request: {e}"}, status=400)
+
+    resp = web.StreamResponse(headers={"Content-Type": "application/json"})
+    await resp.prepare(request)
+    await resp.write(b'{"items":[')
+    count = 0
+    last = None
+    more = False
+    try:
+        async with udb.async_engine.connect() as conn:
+            result = await conn.stream(stmt)
+            async for row in result:
+                if count == limit:
+                    # the extra row only signals that another page exists
+                    more = True
+                    break
+                await resp.write((b"," if count else b"") + json.dumps(row_to_dict(row), default=str).encode())
+                count += 1
+                last = row
+            await result.close()
+    except Exception as e:
+        logger.warning(f"/api/logs query failed: {e}")
+        await resp.write(b'],"error":' + json.dumps(str(e)[:200]).encode() + b"}")
+        await resp.write_eof()
+        return resp
+    next_cursor = encode_cursor(last.timestamp, last.id) if more else None
+    await resp.write(b'],"count":' + str(count).encode() + b',"next_cursor":' + json.dumps(next_cursor).encode() + b"}")
+    await resp.write_eof()
+    return resp
+
+
+async def logs_search_handler(request):
+    """GET /api/logs/search?q=...&guild_id=&event_type=&limit= - ranked full-text hits."""
+    denied = _check_api_auth(request)
+    if denied is not None:
+        return denied
+    params = request.query
+    text_query = (params.get("q") or "").strip()
+    if not text_query:
+        return web.json_response({"error": "bad request: q is required"}, status=400)
+    try:
+        limit = int(params.get("limit", 25))
+    except ValueError:
+        return web.json_response({"error": "bad request: invalid limit"}, status=400)
+    start_time = datetime.now()
+    try:
+        hits = await search_logs(text_query, guild_id=params.get("guild_id"),
+                                 event_type=params.get("event_type"), limit=limit)
+    except ValueError as e:
+        return web.json_response({"error": f"bad request: {e}"}, status=400)
+    except Exception as e:
+        logger.warning(f"/api/logs/search failed: {e}")
+        return web.json_response({"error": str(e)[:200]}, status=500)
+    took_ms = (datetime.now() - start_time).total_seconds() * 1000
+    return web.json_response({"items": hits, "count": len(hits), "took_ms": round(took_ms, 2)},
+                             dumps=lambda obj: json.dumps(obj, default=str))
+
+
+async def stats_api_handler(request):
+    """GET /api/stats?guild_id=&days=&event_type=&bucket= - event trends from the hourly rollups.
+
+    `days` defaults to 7 (max 366); `bucket` is hour or day (hour when days <= 2).
+    Without guild_id the counts cover every guild.
+    """
+    denied = _check_api_auth(request)
+    if denied is not None:
+        return denied
+    params = request.query
+    try:
+        days = int(params.get("days", 7))
+    except ValueError:
+        return web.json_response({"error": "bad request: invalid days"}, status=400)
+    start_time = datetime.now()
+    try:
+        trend = await fetch_trend(guild_id=params.get("guild_id"), days=days, event_type=params.get("event_type"),
+                                  bucket=params.get("bucket"))
+    except ValueError as e:
+        return web.json_response({"error": f"bad request: {e}"}, status=400)
+    except Exception as e:
+        logger.warning(f"/api/stats failed: {e}")
+        return web.json_response({"error": str(e)[:200]}, status=500)
+    trend["took_ms"] = round((datetime.now() - start_time).total_seconds() * 1000, 2)
+    return web.json_response(trend)
+
+
+async def metrics_handler(request):
+    """Prometheus exposition of listener, DB writer, Discord send, audit and event-loop metrics."""
+    body, content_type = render_latest()
+    return web.Response(body=body, headers={"Content-Type": content_type})
+
+
+async def start_health_server(host: str = "0.0.0.0", port: int = 8080, prober: HealthProber | None = None):
     app = web.Application()
+    app["api_token"] = _api_token()
+    # Serves cached health snapshots; the owner starts/stops its refresh loop
+    app["prober"] = prober
     app.router.add_get('/health', health_handler)
     app.router.add_get('/health/ready', readiness_handler)
     app.router.add_get('/health/live', liveness_handler)
+    app.router.add_get('/metrics', metrics_handler)
+    app.router.add_get('/api/logs', logs_api_handler)
+    app.router.add_get('/api/logs/search', logs_search_handler)
+    app.router.add_get('/api/stats', stats_api_handler)
     
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, host, port)
     await site.start()
     logger.info(f"Health server running on http://{host}:{port}/health")
-    logger.info(f"Endpoints available: /health, /health/ready, /health/live")
+    logger.info(f"Endpoints available: /health, /health/ready, /health/live, /metrics, /api/logs, /api/logs/search, /api/stats")
     
     # Keep the coroutine alive
     while True:
@@ -125,29 +468,34 @@ async def start_health_server(host: str = "0.0.0.0", port: int = 8080):
 
 
 async def readiness_handler(request):
-    """Kubernetes-style readiness probe - checks if service is ready to receive traffic."""
-    db_result = await _check_db()
-    db_ok = db_result[0] if db_result else False
+    """Kubernetes-style readiness probe - ready while the cached DB check passes and is recent."""
+    denied = _check_probe_auth(request)
+    if denied is not None:
+        return denied
+    snapshot, age = await _current_snapshot(request)
+    prober = request.app["prober"]
+    db_ok = snapshot["database"]["status"] == "connected"
     
-    if db_ok:
+    if db_ok and age <= prober.stale_after:
         return web.json_response({
             "status": "ready",
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "snapshot_age_seconds": round(age, 3)
         }, status=200)
     else:
         return web.json_response({
             "status": "not_ready", 
-            "reason": "database_unavailable",
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "reason": "database_unavailable" if not db_ok else "health_snapshot_stale",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "snapshot_age_seconds": round(age, 3)
         }, status=503)
 
 
 async def liveness_handler(request):
     """Kubernetes-style liveness probe - checks if service is alive (always returns OK if reachable)."""
-    system_info = _get_system_info()
     return web.json_response({
         "status": "alive",
         "timestamp": datetime.now(timezone.utc).isoformat(),
-        "uptime_seconds": round(system_info["uptime_seconds"]),
-        "pid": system_info["pid"]
+        "uptime_seconds": round(time.time() - _process_start_time()),
+        "pid": os.getpid()
     }, status=200)
@@ -0,0 +1,143 @@
+# utils/log_queries.py
+import base64
+import logging
+from datetime import datetime
+logger = logging.getLogger(__name__)
+
+from sqlalchemy import select, tuple_, func, literal_column
+import utils.database as udb
+from utils.database import Author, EventType, LogEntry, SEARCH_VECTOR_SQL
+from utils.dimensions import to_snowflake
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_SEARCH_RESULTS = 100
+
+_COLUMNS = (
+    LogEntry.id,
+    LogEntry.timestamp,
+    EventType.name.label("event_type"),
+    LogEntry.guild_id,
+    LogEntry.author_id,
+    Author.name.label("author_name"),
+    LogEntry.description,
+    LogEntry.details,
+)
+
+
+def _select_logs(*extra):
+    """SELECT of _COLUMNS with the event type and author names joined in from their lookup tables."""
+    return (select(*_COLUMNS, *extra).select_from(LogEntry)
+            .outerjoin(EventType, EventType.code == LogEntry.event_code)
+            .outerjoin(Author, Author.id == LogEntry.author_id))
+
+
+def _id_param(name: str, value) -> int:
+    snowflake = to_snowflake(value)
+    if snowflake is None:
+        raise ValueError(f"invalid {name}")
+    return snowflake
+
+
+def _event_code(event_type: str):
+    # Scalar subquery: resolved once, so the (guild_id, event_code, ...) index is still used
+    return select(EventType.code).where(EventType.name == event_type).scalar_subquery()
+
+
+def _search_match(text_query: str):
+    """Full-text predicate matching the ix_logs_search GIN index, plus the parsed query."""
+    tsquery = func.websearch_to_tsquery("simple", text_query)
+    vector = literal_column(SEARCH_VECTOR_SQL)
+    return vector.op("@@")(tsquery), vector, tsquery
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor(); raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(ts), int(row_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+def build_logs_query(guild_id: str | None = None, event_type: str | None = None, author_id: str | None = None,
+                     since: datetime | None = None, until: datetime | None = None, text_query: str | None = None,
+                     cursor: str | None = None, limit: int = DEFAULT_PAGE_SIZE):
+    """Build a newest-first page query over `logs` using a (timestamp, id) keyset cursor.
+
+    The filters line up with the composite indexes on LogEntry
+    ((guild_id, timestamp, id), (guild_id, event_type, timestamp, id),
+    (guild_id, author_id, timestamp, id)), so each page is an index range
+    scan that starts where the previous page ended instead of skipping
+    OFFSET rows. Ids are compared as BIGINT, so a non-numeric guild_id or
+    author_id raises ValueError. One extra row is fetched to tell whether a next page exists.
+    `text_query` uses the full-text index (websearch syntax: words, "phrases",
+    -exclusions, OR).
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    stmt = _select_logs()
+    if guild_id:
+        stmt = stmt.where(LogEntry.guild_id == _id_param("guild_id", guild_id))
+    if event_type:
+        stmt = stmt.where(LogEntry.event_code == _event_code(event_type))
+    if author_id:
+        stmt = stmt.where(LogEntry.author_id == _id_param("author_id", author_id))
+    if since:
+        stmt = stmt.where(LogEntry.timestamp >= since)
+    if until:
+        stmt = stmt.where(LogEntry.timestamp < until)
+    if text_query:
+        stmt = stmt.where(_search_match(text_query)[0])
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(LogEntry.timestamp, LogEntry.id) < tuple_(ts, row_id))
+    return stmt.order_by(LogEntry.timestamp.desc(), LogEntry.id.desc()).limit(limit + 1), limit
+
+
+def row_to_dict(row) -> dict:
+    # Snowflakes stay strings in the API: they don't fit a JSON (double) number
+    return {
+        "id": row.id,
+        "timestamp": row.timestamp.isoformat() + "Z" if row.timestamp else None,
+        "event_type": row.event_type,
+        "guild_id": str(row.guild_id) if row.guild_id is not None else None,
+        "author_id": str(row.author_id) if row.author_id is not None else None,
+        "author_name": row.author_name,
+        "description": row.description,
+        "details": row.details,
+    }
+
+
+def build_search_query(text_query: str, guild_id: str | None = None, event_type: str | None = None,
+                       limit: int = 25):
+    """Build a relevance-ranked full-text search over description and message content."""
+    match, vector, tsquery = _search_match(text_query)
+    rank = func.ts_rank(vector, tsquery).label("rank")
+    stmt = _select_logs(rank).where(match)
+    if guild_id:
+        stmt = stmt.where(LogEntry.guild_id == _id_param("guild_id", guild_id))
+    if event_type:
+        stmt = stmt.where(LogEntry.event_code == _event_code(event_type))
+    limit = max(1, min(int(limit), MAX_SEARCH_RESULTS))
+    return stmt.order_by(rank.desc(), LogEntry.timestamp.desc()).limit(limit)
+
+
+async def search_logs(text_query: str, guild_id: str | None = None, event_type: str | None = None,
+                      limit: int = 25) -> list[dict]:
+    """Run build_search_query() and return rows as dicts (with a `rank` key)."""
+    stmt = build_search_query(text_query, guild_id=guild_id, event_type=event_type, limit=limit)
+    async with udb.async_engine.connect() as conn:
+        result = await conn.execute(stmt)
+        rows = result.all()
+    hits = []
+    for row in rows:
+        hit = row_to_dict(row)
+        hit["rank"] = round(float(row.rank), 4)
+        hits.append(hit)
+    return hits
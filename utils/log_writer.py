@@ -0,0 +1,438 @@
+# utils/log_writer.py
+import asyncio
+import logging
+import time
+logger = logging.getLogger(__name__)
+
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import utils.database as udb
+from utils.database import LogEntry, copy_log_rows
+from utils.dimensions import Dimensions
+from utils.rollups import bump_hourly
+from utils.metrics import DB_WRITE_SECONDS, DB_BATCH_ROWS
+
+OVERFLOW_POLICIES = ("block", "drop_newest", "drop_oldest")
+
+# Failures that say nothing about the rows themselves: the batch is spooled and retried later.
+# asyncio.TimeoutError (raised by wait_for past write_timeout) is not a TimeoutError before 3.11.
+_TRANSIENT_ERRORS = (sa_exc.OperationalError, sa_exc.InterfaceError, sa_exc.TimeoutError, asyncio.TimeoutError,
+                     TimeoutError, OSError)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """True for connection and timeout errors; anything else means the database rejected the rows."""
+    return isinstance(exc, _TRANSIENT_ERRORS) or bool(getattr(exc, "connection_invalidated", False))
+
+
+class LogWriter:
+    """Background writer that batches log rows into multi-row INSERTs.
+
+    Listeners enqueue plain row dicts (event_type, author_id, author_name,
+    guild_id, ... as strings) and return immediately; a single worker task
+    drains the queue and flushes a batch when either `batch_size` rows are
+    buffered or `flush_interval` seconds have passed since the first
+    buffered row.
+
+    The queue is bounded by `max_queue`. When it is full the overflow policy
+    decides what happens:
+    - block: wait up to `put_timeout` seconds for space, then drop the row
+    - drop_newest: drop the incoming row
+    - drop_oldest: evict the oldest queued row to make room
+
+    If a `spool` is given, batches that fail with a connection error (or
+    take longer than `write_timeout`) are appended to it instead of being
+    lost, and further batches go straight to the spool until a replay task
+    has drained it back into Postgres. Rows carry a client-generated
+    `event_id` and are inserted with ON CONFLICT DO NOTHING, so a replayed
+    row is written at most once. Any other error means the database
+    rejected the rows: the batch is split in halves until the offending rows
+    are isolated, and those are moved to the spool's dead-letter file (or
+    counted as failed without a spool), so one bad row never stalls the rest.
+
+    Rows whose event type is in `copy_event_types` are written with binary
+    COPY through a staging table instead (when a batch holds at least
+    `copy_min_rows` of them), which is much cheaper for high-volume types.
+
+    Rows are converted to the compact table form (BIGINT ids, SMALLINT event
+    code, author names in `authors`) only at write time, so queued and
+    spooled rows keep the same format across schema changes. Once
+    check_schema() has found `logs` in any other layout, nothing is written
+    to it (rows are spooled, or counted as failed without a spool) until a
+    later check, every `replay_interval` seconds, finds it converted.
+
+    hold() keeps rows away from Postgres while the database is still being
+    set up at startup: they are spooled, or left in the queue without a
+    spool, until release().
+    """
+
+    def __init__(self, batch_size: int = 200, flush_interval: float = 1.0, max_queue: int = 10000,
+                 overflow_policy: str = "block", put_timeout: float = 2.0, spool=None,
+                 write_timeout: float = 5.0, replay_interval: float = 10.0, copy_event_types=None,
+                 copy_min_rows: int = 100):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            logger.warning(f"Unknown writer overflow policy '{overflow_policy}', using 'block'")
+            overflow_policy = "block"
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.01, float(flush_interval))
+        self.overflow_policy = overflow_policy
+        self.put_timeout = put_timeout
+        self._queue = asyncio.Queue(maxsize=max(1, int(max_queue)))
+        self.spool = spool
+        self.write_timeout = write_timeout
+        self.replay_interval = replay_interval
+        # Event types written through COPY (see copy_log_rows); "*" means all of them
+        self.copy_event_types = frozenset(copy_event_types or ())
+        self.copy_min_rows = max(1, int(copy_min_rows))
+        self.dimensions = Dimensions()
+        # logs_schema_state() as of the last check_schema(); None until checked
+        self.schema_state = None
+        self._task = None
+        self._replay_task = None
+        self._closing = False
+        self._held = False
+        self._released = asyncio.Event()
+        self._replay_wakeup = asyncio.Event()
+        # Start in spool mode if a previous run left rows on disk, so order is kept
+        self._db_available = not (spool is not None and spool.has_pending())
+        # Counters exposed for diagnostics
+        self.stats = {"enqueued": 0, "written": 0, "dropped": 0, "batches": 0, "failed": 0,
+                      "spooled": 0, "replayed": 0, "copied": 0,
+                      "dead_lettered": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def schema_blocked(self) -> bool:
+        return self.schema_state not in (None, "compact")
+
+    def hold(self):
+        """Write nothing to Postgres until release() (e.g. while startup migrations run)."""
+        self._held = True
+        self._released.clear()
+        if self.spool is not None:
+            # Like an outage: after release, replay drains the spool before new rows go direct
+            self._db_available = False
+
+    def release(self):
+        """Resume writing to Postgres; rows spooled while held are replayed right away."""
+        self._held = False
+        self._released.set()
+        self._replay_wakeup.set()
+
+    async def check_schema(self) -> str | None:
+        """Look up the layout of `logs`; writes are held back until it is 'compact'."""
+        try:
+            async with udb.async_engine.connect() as conn:
+                state = await conn.run_sync(udb.logs_schema_state)
+        except Exception as e:
+            logger.warning(f"Could not check the logs table layout: {e!r}")
+            return self.schema_state
+        if state != self.schema_state:
+            if state == "compact":
+                if self.schema_state is not None:
+                    logger.info("The logs table now uses the compact layout; resuming writes.")
+            else:
+                logger.error(f"The logs table is in the '{state}' layout, which this release cannot write. "
+                             f"Apply migration 4 (python -m utils.migrations up --include-manual); until then "
+                             f"log rows are {'spooled' if self.spool is not None else 'not stored'}.")
+            self.schema_state = state
+        return state
+
+    def start(self):
+        """Start the worker task on the running loop (no-op if already running)."""
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._task = asyncio.create_task(self._run(), name="log-writer")
+            logger.info(f"Log writer started (batch_size={self.batch_size}, flush_interval={self.flush_interval}s, "
+                        f"max_queue={self._queue.maxsize}, policy={self.overflow_policy})")
+        # Also re-checks a blocked schema, so it runs without a spool too
+        if self._replay_task is None or self._replay_task.done():
+            self._replay_task = asyncio.create_task(self._replay_loop(), name="log-spool-replay")
+
+    async def enqueue(self, row: dict) -> bool:
+        """Queue a row for writing. Returns False if the row was dropped."""
+        if self._closing:
+            self.stats["dropped"] += 1
+            logger.warning("Log writer is shutting down; dropping log row.")
+            return False
+        try:
+            self._queue.put_nowait(row)
+            self.stats["enqueued"] += 1
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.overflow_policy == "drop_oldest":
+            try:
+                self._queue.get_nowait()
+                self._queue.task_done()
+                self.stats["dropped"] += 1
+            except asyncio.QueueEmpty:
+                pass
+            self._queue.put_nowait(row)
+            self.stats["enqueued"] += 1
+            return True
+
+        if self.overflow_policy == "block":
+            try:
+                await asyncio.wait_for(self._queue.put(row), timeout=self.put_timeout)
+                self.stats["enqueued"] += 1
+                return True
+            except asyncio.TimeoutError:
+                pass
+
+        self.stats["dropped"] += 1
+        logger.warning(f"Log writer queue full ({self._queue.maxsize}); dropping '{row.get('event_type')}' row.")
+        return False
+
+    async def enqueue_many(self, rows: list[dict]) -> int:
+        """Queue several rows at once (e.g. one event fanned out to many guilds).
+
+        Rows that fit are added without suspending; only the overflow goes
+        through enqueue() and its overflow policy. Returns the number queued.
+        """
+        fast = 0
+        for row in rows:
+            if self._closing or self._queue.full():
+                break
+            self._queue.put_nowait(row)
+            fast += 1
+        self.stats["enqueued"] += fast
+        queued = fast
+        for row in rows[fast:]:
+            queued += await self.enqueue(row)
+        return queued
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if self._held and self.spool is None and not self._closing:
+                # Nowhere to put rows yet; leave them queued
+                await self._released.wait()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0 or self._closing:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: list[dict]):
+        if self.schema_blocked:
+            if self.spool is None:
+                self.stats["failed"] += len(batch)
+                return
+        elif (self._db_available and not self._held) or self.spool is None:
+            try:
+                rejected = await self._write_isolating(batch)
+            except Exception as e:
+                if self.spool is None:
+                    self.stats["failed"] += len(batch)
+                    logger.error(f"Failed to write {len(batch)} log rows to database: {e!r}", exc_info=True)
+                    return
+                self._db_available = False
+                logger.warning(f"Database write failed ({e!r}); spooling log rows to disk until it recovers.")
+            else:
+                await self._dead_letter(rejected)
+                logger.debug(f"Flushed {len(batch) - len(rejected)} log rows to DB.")
+                return
+        try:
+            await self.spool.append(batch)
+            self.stats["spooled"] += len(batch)
+        except Exception as e:
+            self.stats["failed"] += len(batch)
+            logger.error(f"Failed to spool {len(batch)} log rows: {e}", exc_info=True)
+
+    async def _write(self, batch: list[dict], replay: bool = False):
+        start = time.perf_counter()
+        await asyncio.wait_for(self._insert_rows(batch), timeout=self.write_timeout)
+        if replay:
+            self.stats["replayed"] += len(batch)
+            return
+        DB_WRITE_SECONDS.observe(time.perf_counter() - start)
+        DB_BATCH_ROWS.observe(len(batch))
+        self.stats["written"] += len(batch)
+        self.stats["batches"] += 1
+
+    async def _write_isolating(self, batch: list[dict], replay: bool = False) -> list[tuple[dict, str]]:
+        """Write `batch`; on a permanent error, bisect it and return the rejected rows with their errors.
+
+        Transient errors propagate so the caller can spool what is left
+        (halves already committed are skipped on replay by event_id).
+        """
+        try:
+            await self._write(batch, replay=replay)
+            return []
+        except Exception as e:
+            if is_transient(e):
+                raise
+            error = repr(e)[:500]
+            # Statement-level errors (missing table/column) reject every row alike
+            if len(batch) == 1 or isinstance(e, sa_exc.ProgrammingError):
+                logger.error(f"Database rejected {len(batch)} log row(s) ({batch[0].get('event_type')!r}, ...): {error}")
+                return [(row, error) for row in batch]
+            logger.warning(f"Database rejected a batch of {len(batch)} log rows ({error}); splitting it.")
+        mid = len(batch) // 2
+        return (await self._write_isolating(batch[:mid], replay=replay)
+                + await self._write_isolating(batch[mid:], replay=replay))
+
+    async def _dead_letter(self, rejected: list[tuple[dict, str]]):
+        if not rejected:
+            return
+        self.stats["dead_lettered"] += len(rejected)
+        if self.spool is None:
+            self.stats["failed"] += len(rejected)
+            return
+        try:
+            await self.spool.dead_letter([row for row, _ in rejected], [error for _, error in rejected])
+        except Exception as e:
+            self.stats["failed"] += len(rejected)
+            logger.error(f"Failed to dead-letter {len(rejected)} log rows: {e}", exc_info=True)
+
+    def _split_for_copy(self, batch: list[dict]) -> tuple[list[dict], list[dict]]:
+        """Partition a batch into (COPY rows, INSERT rows) by event type.
+
+        COPY only pays off for larger groups; below `copy_min_rows` the rows
+        go through the regular INSERT.
+        """
+        if not self.copy_event_types:
+            return [], batch
+        if "*" in self.copy_event_types:
+            copy_rows, rows = batch, []
+        else:
+            copy_rows = [r for r in batch if r["event_type"] in self.copy_event_types]
+            rows = [r for r in batch if r["event_type"] not in self.copy_event_types]
+        if len(copy_rows) < self.copy_min_rows:
+            return [], batch
+        return copy_rows, rows
+
+    async def _insert_rows(self, batch: list[dict]):
+        # executemany on INSERT lets SQLAlchemy emit multi-row VALUES batches.
+        # Rows already written are skipped via the unique event_id index; no
+        # conflict target is named because on a partitioned table that index
+        # is (event_id, timestamp). RETURNING only yields rows actually
+        # inserted, so the hourly rollups never count a replayed row twice.
+        copy_rows, rows = self._split_for_copy(batch)
+        copy_rows = await self.dimensions.to_db_rows(copy_rows) if copy_rows else []
+        rows = await self.dimensions.to_db_rows(rows) if rows else []
+        authors = self.dimensions.changed_authors(batch)
+        async with udb.async_engine.begin() as conn:
+            await self.dimensions.upsert_authors(conn, authors)
+            inserted = []
+            if copy_rows:
+                inserted.extend(await copy_log_rows(conn, copy_rows))
+            if rows:
+                stmt = (pg_insert(LogEntry).on_conflict_do_nothing()
+                        .returning(LogEntry.guild_id, LogEntry.event_code, LogEntry.timestamp))
+                inserted.extend((await conn.execute(stmt, rows)).all())
+            await bump_hourly(conn, inserted)
+        self.dimensions.remember_authors(authors)
+        self.stats["copied"] += len(copy_rows)
+
+    async def _replay_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._replay_wakeup.wait(), timeout=self.replay_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._replay_wakeup.clear()
+            try:
+                if self.schema_blocked:
+                    await self.check_schema()
+                await self.replay()
+            except Exception:
+                logger.exception("Spool replay failed unexpectedly")
+
+    async def replay(self) -> int:
+        """Drain spooled segments into the logs table. Returns the number of rows replayed."""
+        if self.spool is None or self.schema_blocked or self._held:
+            return 0
+        if not self.spool.has_pending():
+            self._db_available = True
+            return 0
+        self.spool.seal()
+        chunk = max(self.batch_size, 1000)
+        total = 0
+        start = asyncio.get_running_loop().time()
+        for path in self.spool.sealed_segments():
+            rows = await asyncio.to_thread(self.spool.read_segment, path)
+            try:
+                rejected = []
+                for i in range(0, len(rows), chunk):
+                    rejected += await self._write_isolating(rows[i:i + chunk], replay=True)
+            except Exception as e:
+                self._db_available = False
+                logger.info(f"Spool replay paused; database still unavailable ({e!r}).")
+                break
+            # Rejected rows can never be replayed; set them aside so the segment can go
+            await self._dead_letter(rejected)
+            self.spool.remove_segment(path)
+            total += len(rows) - len(rejected)
+        else:
+            # Everything sealed made it in; rows spooled meanwhile go out next round
+            self._db_available = True
+        if total:
+            elapsed = asyncio.get_running_loop().time() - start
+            logger.info(f"Replayed {total} spooled log rows in {elapsed:.2f}s.")
+        return total
+
+    async def _drain_unstarted(self):
+        while not self._queue.empty():
+            batch = []
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def stop(self, timeout: float = 5.0):
+        """Flush everything still queued, then stop the worker."""
+        self._closing = True
+        # A held writer without a spool gets one last attempt at Postgres
+        self._released.set()
+        if self._task is None:
+            # Never started: hand the queue to _flush directly (spooled while held)
+            try:
+                await asyncio.wait_for(self._drain_unstarted(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Log writer did not drain within {timeout}s; {self._queue.qsize()} rows not written.")
+        else:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Log writer did not drain within {timeout}s; {self._queue.qsize()} rows not written.")
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._replay_task is not None:
+            self._replay_task.cancel()
+            try:
+                await self._replay_task
+            except asyncio.CancelledError:
+                pass
+            self._replay_task = None
+        if self.spool is not None:
+            self.spool.close()
+        logger.info(f"Log writer stopped (written={self.stats['written']}, dropped={self.stats['dropped']}, "
+                    f"failed={self.stats['failed']}, spooled={self.stats['spooled']})")
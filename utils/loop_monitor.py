@@ -0,0 +1,189 @@
+# utils/loop_monitor.py
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime
+logger = logging.getLogger(__name__)
+
+from utils.metrics import LOOP_LAG_SECONDS, LOOP_LAG_LAST, SLOW_CALLBACKS, SLOW_CALLBACK_SECONDS
+
+
+class LoopLagMonitor:
+    """Samples event-loop lag: how much later than requested a short sleep wakes up.
+
+    Lag here means some callback held the loop; every listener, DB write and
+    Discord send queued behind it was delayed by the same amount. The last
+    `window` samples are kept for /diagnose.
+    """
+
+    def __init__(self, interval: float = 0.5, window: int = 600):
+        self.interval = max(0.05, float(interval))
+        self._samples = deque(maxlen=max(1, int(window)))
+        self._task = None
+        self.last_lag = 0.0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def summary(self) -> dict:
+        """Lag statistics in milliseconds over the retained window."""
+        values = sorted(self._samples)
+        if not values:
+            return {"samples": 0, "last_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        p99 = values[min(len(values) - 1, int(0.99 * len(values)))]
+        return {"samples": len(values), "last_ms": round(self.last_lag * 1000, 2),
+                "p99_ms": round(p99 * 1000, 2), "max_ms": round(values[-1] * 1000, 2)}
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.last_lag = lag
+            self._samples.append(lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            LOOP_LAG_LAST.set(lag)
+
+
+def describe_handle(handle) -> str:
+    """Readable name for the callback behind an asyncio Handle (task coroutine or function)."""
+    callback = getattr(handle, "_callback", None)
+    owner = getattr(callback, "__self__", None)
+    if isinstance(owner, asyncio.Task):
+        coro = owner.get_coro()
+        name = getattr(coro, "__qualname__", None) or type(coro).__name__
+        task_name = owner.get_name()
+        # discord.py runs every listener through Client._run_event in a task named after the event
+        if task_name and not task_name.startswith("Task-"):
+            return f"task:{name}[{task_name}]"
+        return f"task:{name}"
+    if isinstance(owner, asyncio.Future):
+        return f"future-callback:{type(owner).__name__}"
+    name = getattr(callback, "__qualname__", None) or getattr(callback, "__name__", None) or repr(callback)
+    module = getattr(callback, "__module__", None)
+    return f"{module}.{name}" if module else name
+
+
+class SlowCallbackDetector:
+    """Opt-in profiler that reports event-loop callbacks running longer than `threshold_ms`.
+
+    Wraps asyncio's Handle._run (every callback and task step goes through
+    it) to time each callback. A watchdog thread polls the running callback
+    and captures the loop thread's stack while it is still blocking, so the
+    report shows *where* it was stuck, not only which coroutine. Findings go
+    to the log, to Prometheus and to a ring buffer shown by /diagnose.
+
+    The wrapper adds two perf_counter() calls per callback, so it is only
+    installed when SLOW_CALLBACK_MS is set.
+    """
+
+    def __init__(self, threshold_ms: float = 100.0, keep: int = 50, max_stack_frames: int = 25):
+        self.threshold = max(1.0, float(threshold_ms)) / 1000
+        self.max_stack_frames = max_stack_frames
+        self.recent = deque(maxlen=max(1, int(keep)))
+        self.counts = Counter()
+        self.worst = {}
+        self._original_run = None
+        self._thread_id = None
+        # (handle, started_at) of the callback currently running on the loop thread
+        self._current = None
+        self._captured = {}
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    @property
+    def installed(self) -> bool:
+        return self._original_run is not None
+
+    def install(self):
+        """Patch asyncio.Handle._run and start the watchdog; call from the loop thread."""
+        if self.installed:
+            return
+        self._thread_id = threading.get_ident()
+        original = asyncio.events.Handle._run
+        detector = self
+
+        def _run(handle):
+            if threading.get_ident() != detector._thread_id:
+                return original(handle)
+            started = time.perf_counter()
+            detector._current = (handle, started)
+            try:
+                return original(handle)
+            finally:
+                detector._current = None
+                elapsed = time.perf_counter() - started
+                if elapsed >= detector.threshold:
+                    detector._record(handle, elapsed)
+
+        self._original_run = original
+        asyncio.events.Handle._run = _run
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="slow-callback-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Slow-callback detector installed (threshold {self.threshold * 1000:.0f} ms)")
+
+    def uninstall(self):
+        if not self.installed:
+            return
+        asyncio.events.Handle._run = self._original_run
+        self._original_run = None
+        self._stop.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    def _watch(self):
+        poll = max(0.005, self.threshold / 2)
+        while not self._stop.wait(poll):
+            current = self._current
+            if current is None:
+                continue
+            handle, started = current
+            if time.perf_counter() - started < self.threshold or id(handle) in self._captured:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = traceback.format_stack(frame, limit=self.max_stack_frames)
+            # Discard the sample if the loop moved on while we were reading the frame
+            if self._current is current:
+                self._captured[id(handle)] = (handle, "".join(stack))
+
+    def _record(self, handle, elapsed: float):
+        name = describe_handle(handle)
+        captured = self._captured.pop(id(handle), None)
+        stack = captured[1] if captured and captured[0] is handle else None
+        self._captured.clear()
+        entry = {
+            "at": datetime.utcnow().isoformat() + "Z",
+            "callback": name,
+            "duration_ms": round(elapsed * 1000, 1),
+            "stack": stack,
+        }
+        self.recent.append(entry)
+        self.counts[name] += 1
+        self.worst[name] = max(self.worst.get(name, 0.0), entry["duration_ms"])
+        SLOW_CALLBACKS.labels(name).inc()
+        SLOW_CALLBACK_SECONDS.observe(elapsed)
+        logger.warning(f"Slow event-loop callback: {name} took {entry['duration_ms']:.1f} ms"
+                       + (f"\n{stack}" if stack else ""))
+
+    def top(self, n: int = 5) -> list[tuple[str, int, float]]:
+        """(callback, count, worst_ms) for the most frequent offenders."""
+        return [(name, count, self.worst.get(name, 0.0)) for name, count in self.counts.most_common(n)]
@@ -0,0 +1,118 @@
+# utils/member_index.py
+import asyncio
+import logging
+logger = logging.getLogger(__name__)
+
+# Members indexed between event-loop yields during a full rebuild
+_REBUILD_YIELD_EVERY = 5000
+
+
+class MemberIndex:
+    """Maintained user_id -> guild membership index across every guild the bot is in.
+
+    Replaces rebuilding a set of all member ids on each /status: the number
+    of unique users is simply the number of keys. Each user holds a reference
+    per guild they share with the bot and disappears when the last one goes.
+    Most users share a single guild, so that case is stored as a bare guild
+    id; only users in several guilds get a set.
+
+    Kept current by member join/leave and guild join/leave events (see
+    attach()); a full rebuild runs on every READY.
+    """
+
+    def __init__(self):
+        self._guilds: dict[int, int | set[int]] = {}
+        # Index being built by rebuild(); live events are applied to it too
+        self._building = None
+
+    @property
+    def unique_count(self) -> int:
+        return len(self._guilds)
+
+    def __len__(self) -> int:
+        return len(self._guilds)
+
+    def guilds_for(self, user_id: int) -> tuple[int, ...]:
+        """Ids of the guilds that `user_id` shares with the bot."""
+        entry = self._guilds.get(user_id)
+        if entry is None:
+            return ()
+        if isinstance(entry, int):
+            return (entry,)
+        return tuple(entry)
+
+    def add(self, user_id: int, guild_id: int):
+        entry = self._guilds.get(user_id)
+        if entry is None:
+            self._guilds[user_id] = guild_id
+        elif isinstance(entry, int):
+            if entry != guild_id:
+                self._guilds[user_id] = {entry, guild_id}
+        else:
+            entry.add(guild_id)
+
+    def remove(self, user_id: int, guild_id: int):
+        entry = self._guilds.get(user_id)
+        if entry is None:
+            return
+        if isinstance(entry, int):
+            if entry == guild_id:
+                del self._guilds[user_id]
+            return
+        entry.discard(guild_id)
+        if len(entry) == 1:
+            self._guilds[user_id] = next(iter(entry))
+        elif not entry:
+            del self._guilds[user_id]
+
+    def add_guild(self, guild):
+        for member in guild.members:
+            self.add(member.id, guild.id)
+
+    def remove_guild(self, guild):
+        for member in guild.members:
+            self.remove(member.id, guild.id)
+
+    async def rebuild(self, guilds):
+        """Re-index every member of `guilds`, yielding to the loop periodically."""
+        fresh = MemberIndex()
+        self._building = fresh
+        seen = 0
+        try:
+            for guild in list(guilds):
+                for member in guild.members:
+                    fresh.add(member.id, guild.id)
+                    seen += 1
+                    if seen % _REBUILD_YIELD_EVERY == 0:
+                        await asyncio.sleep(0)
+        finally:
+            self._building = None
+        self._guilds = fresh._guilds
+        logger.info(f"Member index rebuilt: {self.unique_count} unique users across {len(guilds)} guilds.")
+
+    # --- gateway listeners (registered by attach) ---
+
+    def _apply(self, method: str, *args):
+        getattr(self, method)(*args)
+        if self._building is not None:
+            getattr(self._building, method)(*args)
+
+    async def _on_member_join(self, member):
+        self._apply("add", member.id, member.guild.id)
+
+    async def _on_raw_member_remove(self, payload):
+        # Raw variant fires even if the member was not cached
+        self._apply("remove", payload.user.id, payload.guild_id)
+
+    async def _on_guild_join(self, guild):
+        self._apply("add_guild", guild)
+
+    async def _on_guild_remove(self, guild):
+        self._apply("remove_guild", guild)
+
+    def attach(self, bot):
+        """Register the listeners that keep the index current on `bot`."""
+        bot.add_listener(self._on_member_join, "on_member_join")
+        bot.add_listener(self._on_raw_member_remove, "on_raw_member_remove")
+        bot.add_listener(self._on_guild_join, "on_guild_join")
+        bot.add_listener(self._on_guild_remove, "on_guild_remove")
@@ -0,0 +1,80 @@
+# utils/message_archive.py
+import json
+import logging
+import zlib
+from datetime import datetime
+logger = logging.getLogger(__name__)
+
+from sqlalchemy import select
+import utils.database as udb
+from utils.database import LogEntry
+
+ARCHIVE_VERSION = 1
+ARCHIVE_PAGE_SIZE = 15
+
+
+def pack_messages(records) -> bytes:
+    """Compress the deleted messages of a purge into one blob for `logs.archive`.
+
+    The payload is columnar JSON (one list per field, author names stored
+    once and referenced by index), ordered by message id, then zlib
+    compressed. Purges are usually a few authors repeating similar text, so
+    this compresses far better than per-message rows or row-wise JSON.
+    """
+    records = sorted(records, key=lambda r: r.id)
+    authors = {}
+    for r in records:
+        authors.setdefault((r.author_id, r.author_name), len(authors))
+    payload = {
+        "v": ARCHIVE_VERSION,
+        "authors": [[author_id, name] for author_id, name in authors],
+        "id": [r.id for r in records],
+        "author": [authors[(r.author_id, r.author_name)] for r in records],
+        "bot": [int(r.bot) for r in records],
+        "created": [round(r.created_at) for r in records],
+        "content": [r.content for r in records],
+        "attachments": [r.attachments or "" for r in records],
+    }
+    return zlib.compress(json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode(), 6)
+
+
+def unpack_messages(blob: bytes) -> list[dict]:
+    """Inverse of pack_messages(): one dict per message, oldest first."""
+    payload = json.loads(zlib.decompress(blob))
+    if payload.get("v") != ARCHIVE_VERSION:
+        raise ValueError(f"unsupported archive version {payload.get('v')}")
+    authors = payload["authors"]
+    messages = []
+    for i, message_id in enumerate(payload["id"]):
+        author_id, author_name = authors[payload["author"][i]]
+        messages.append({
+            "id": message_id,
+            "author_id": author_id,
+            "author_name": author_name,
+            "bot": bool(payload["bot"][i]),
+            "created_at": datetime.utcfromtimestamp(payload["created"][i]),
+            "content": payload["content"][i],
+            "attachments": payload["attachments"][i] or None,
+        })
+    return messages
+
+
+async def fetch_archive(entry: str, guild_id: str) -> tuple[dict, list[dict]] | None:
+    """Load a bulk-delete archive by log id or event_id, scoped to `guild_id`.
+
+    Returns (entry info, messages) or None if there is no archived entry.
+    """
+    stmt = select(LogEntry.id, LogEntry.event_id, LogEntry.timestamp, LogEntry.details, LogEntry.archive).where(
+        LogEntry.guild_id == int(guild_id), LogEntry.archive.is_not(None))
+    entry = entry.strip()
+    if entry.isdigit():
+        stmt = stmt.where(LogEntry.id == int(entry))
+    else:
+        stmt = stmt.where(LogEntry.event_id == entry)
+    async with udb.async_engine.connect() as conn:
+        row = (await conn.execute(stmt.limit(1))).first()
+    if row is None:
+        return None
+    info = {"id": row.id, "event_id": row.event_id, "timestamp": row.timestamp, "details": row.details or {},
+            "archive_bytes": len(row.archive)}
+    return info, unpack_messages(row.archive)
@@ -0,0 +1,323 @@
+# utils/message_cache.py
+import asyncio
+import logging
+import os
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+logger = logging.getLogger(__name__)
+
+# Rough per-record overhead (object, slots, OrderedDict entry) used for the byte budget
+_RECORD_OVERHEAD = 200
+# Evicted records are written to the spill store in batches of this size
+_SPILL_BATCH = 500
+
+
+class CachedMessage:
+    """Compact copy of the parts of a message the logger needs after it is gone."""
+    __slots__ = ("id", "channel_id", "guild_id", "author_id", "author_name", "bot", "content",
+                 "attachments", "created_at")
+
+    def __init__(self, id: int, channel_id: int, guild_id: int | None, author_id: int, author_name: str,
+                 bot: bool, content: str, attachments: str | None = None, created_at: float = 0.0):
+        self.id = id
+        self.channel_id = channel_id
+        self.guild_id = guild_id
+        self.author_id = author_id
+        self.author_name = author_name
+        self.bot = bot
+        self.content = content
+        self.attachments = attachments
+        self.created_at = created_at
+
+    @classmethod
+    def from_message(cls, message) -> "CachedMessage":
+        author = message.author
+        attachments = "\n".join(a.url for a in message.attachments) if message.attachments else None
+        return cls(message.id, message.channel.id, message.guild.id if message.guild else None,
+                   author.id, str(author), bool(author.bot),
+                   # Bot messages are cached only to recognise their deletion
+                   "" if author.bot else (message.content or ""),
+                   None if author.bot else attachments,
+                   message.created_at.timestamp())
+
+    @property
+    def size(self) -> int:
+        return _RECORD_OVERHEAD + len(self.content) + len(self.author_name) + len(self.attachments or "")
+
+    def as_tuple(self) -> tuple:
+        return (self.id, self.channel_id, self.guild_id, self.author_id, self.author_name, int(self.bot),
+                self.content, self.attachments, self.created_at)
+
+
+class _SpillStore:
+    """SQLite file holding records evicted from memory, capped at `max_rows`.
+
+    Every statement runs on one dedicated worker thread (which also keeps
+    them in order), so spilling and lookups never block the event loop.
+    """
+
+    def __init__(self, path: str, max_rows: int):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_rows = max(1000, int(max_rows))
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="message-spill")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY, channel_id INTEGER, guild_id INTEGER, "
+            "author_id INTEGER, author_name TEXT, bot INTEGER, content TEXT, attachments TEXT, created_at REAL)")
+        self._rows = self._conn.execute("SELECT count(*) FROM messages").fetchone()[0]
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def put_many_sync(self, records: list[CachedMessage]):
+        self._conn.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                               [r.as_tuple() for r in records])
+        self._rows += len(records)
+        if self._rows > self.max_rows * 1.1:
+            # Snowflake ids grow with time, so the smallest ids are the oldest messages
+            self._conn.execute("DELETE FROM messages WHERE id IN "
+                               "(SELECT id FROM messages ORDER BY id LIMIT ?)", (self._rows - self.max_rows,))
+            self._rows = self._conn.execute("SELECT count(*) FROM messages").fetchone()[0]
+        self._conn.commit()
+
+    async def put_many(self, records: list[CachedMessage]):
+        await self._call(self.put_many_sync, records)
+
+    def _pop_many_sync(self, ids: list[int]) -> list[CachedMessage]:
+        found = []
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = self._conn.execute(f"SELECT * FROM messages WHERE id IN ({marks})", chunk).fetchall()
+            if rows:
+                self._conn.execute(f"DELETE FROM messages WHERE id IN ({marks})", chunk)
+                self._rows -= len(rows)
+            found.extend(CachedMessage(r[0], r[1], r[2], r[3], r[4], bool(r[5]), r[6], r[7], r[8]) for r in rows)
+        if found:
+            self._conn.commit()
+        return found
+
+    async def pop_many(self, ids: list[int]) -> list[CachedMessage]:
+        return await self._call(self._pop_many_sync, ids)
+
+    def _close_sync(self):
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+
+    async def close(self):
+        await self._call(self._close_sync)
+        self._executor.shutdown(wait=False)
+
+
+class MessageCache:
+    """Memory-bounded LRU of message contents, fed from on_message.
+
+    discord.py only hands on_message_delete/on_message_edit a message it
+    still holds in its own (small, whole-object) cache, so on busy servers
+    most deletions arrive without content. This cache keeps a compact
+    CachedMessage per message instead, bounded by both `max_messages` and
+    `max_bytes` of content; the raw delete/edit listeners resolve from it.
+
+    With `spill_path` set, records evicted from memory are written in
+    batches to a local SQLite file (at most `spill_max_rows` rows) and
+    looked up there on a memory miss. The SQLite work runs on the spill
+    store's own thread: put() only schedules a background flush, and the
+    lookups are coroutines that await the spill file only on a memory miss.
+    """
+
+    def __init__(self, max_messages: int = 50000, max_bytes: int = 32 * 1024 * 1024,
+                 spill_path: str | None = None, spill_max_rows: int = 500000):
+        self.max_messages = max(0, int(max_messages))
+        self.max_bytes = max(0, int(max_bytes))
+        self._records: OrderedDict[int, CachedMessage] = OrderedDict()
+        self._bytes = 0
+        # Evicted records waiting to be written to the spill store
+        self._pending: dict[int, CachedMessage] = {}
+        # Records handed to the spill thread by the flush in progress
+        self._writing: dict[int, CachedMessage] = {}
+        self._flush_task = None
+        self._spill = None
+        if spill_path and self.enabled:
+            try:
+                self._spill = _SpillStore(spill_path, spill_max_rows)
+            except Exception as e:
+                logger.error(f"Failed to open message cache spill store at {spill_path}: {e}")
+        # Counters exposed for diagnostics
+        self.stats = {"added": 0, "hits": 0, "spill_hits": 0, "misses": 0, "evicted": 0, "spilled": 0}
+        self._bot = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_messages > 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    @property
+    def hit_rate(self) -> float | None:
+        hits = self.stats["hits"] + self.stats["spill_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else None
+
+    def add(self, message):
+        if not self.enabled or message.guild is None:
+            return
+        self.put(CachedMessage.from_message(message))
+
+    def put(self, record: CachedMessage):
+        old = self._records.pop(record.id, None)
+        if old is not None:
+            self._bytes -= old.size
+        self._records[record.id] = record
+        self._bytes += record.size
+        self.stats["added"] += 1
+        while self._records and (len(self._records) > self.max_messages or self._bytes > self.max_bytes):
+            _, evicted = self._records.popitem(last=False)
+            self._bytes -= evicted.size
+            self.stats["evicted"] += 1
+            if self._spill is not None:
+                self._pending[evicted.id] = evicted
+        if len(self._pending) >= _SPILL_BATCH:
+            self._schedule_flush()
+
+    def update_content(self, message_id: int, content: str):
+        """Record an edit so the next edit/delete shows the latest content."""
+        record = self._records.get(message_id)
+        if record is not None:
+            if record.bot:
+                return
+            self._bytes -= record.size
+            record.content = content or ""
+            self._bytes += record.size
+            self._records.move_to_end(message_id)
+        elif message_id in self._pending:
+            self._pending[message_id].content = content or ""
+        elif message_id in self._writing:
+            # The in-flight write may have taken the old content; spill it again
+            record = self._pending[message_id] = self._writing[message_id]
+            record.content = content or ""
+
+    async def get(self, message_id: int) -> CachedMessage | None:
+        """Look up a message without removing it (edits)."""
+        record = self._records.get(message_id)
+        if record is not None:
+            self.stats["hits"] += 1
+            return record
+        record = self._pending.get(message_id) or self._writing.get(message_id)
+        if record is None and self._spill is not None:
+            found = await self._spill_pop([message_id])
+            if found:
+                # Bring it back into memory; it is likely to be edited or deleted again
+                record = found[0]
+                self.put(record)
+        if record is not None:
+            self.stats["spill_hits"] += 1
+            return record
+        self.stats["misses"] += 1
+        return None
+
+    async def pop(self, message_id: int) -> CachedMessage | None:
+        """Look up and forget a deleted message."""
+        found = await self.pop_many([message_id])
+        return found.get(message_id)
+
+    async def pop_many(self, message_ids) -> dict[int, CachedMessage]:
+        """Look up and forget several deleted messages (bulk deletes). Returns {id: record} for the hits."""
+        found = {}
+        missing = []
+        # Being written right now: answered from memory, but the spilled copy must go too
+        stale = []
+        for message_id in message_ids:
+            record = self._records.pop(message_id, None)
+            if record is not None:
+                self._bytes -= record.size
+                self.stats["hits"] += 1
+                found[message_id] = record
+                continue
+            record = self._pending.pop(message_id, None)
+            if record is None and message_id in self._writing:
+                record = self._writing[message_id]
+                stale.append(message_id)
+            if record is not None:
+                self.stats["spill_hits"] += 1
+                found[message_id] = record
+                continue
+            missing.append(message_id)
+        recovered = []
+        if (missing or stale) and self._spill is not None:
+            recovered = [r for r in await self._spill_pop(missing + stale) if r.id not in found]
+        for record in recovered:
+            found[record.id] = record
+        self.stats["spill_hits"] += len(recovered)
+        self.stats["misses"] += len(missing) - len(recovered)
+        return found
+
+    async def _spill_pop(self, ids: list[int]) -> list[CachedMessage]:
+        try:
+            return await self._spill.pop_many(ids)
+        except Exception as e:
+            logger.warning(f"Message cache spill lookup failed: {e}")
+            return []
+
+    def _schedule_flush(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            return  # the running flush picks up the new records when it loops
+        try:
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush(), name="message-cache-spill")
+        except RuntimeError:
+            # No event loop (scripts): write inline
+            records = list(self._pending.values())
+            self._pending = {}
+            try:
+                self._spill.put_many_sync(records)
+                self.stats["spilled"] += len(records)
+            except Exception as e:
+                logger.warning(f"Failed to spill {len(records)} cached messages: {e}")
+
+    async def flush(self):
+        """Write pending evicted records to the spill store."""
+        while self._spill is not None and self._pending:
+            self._writing = self._pending
+            self._pending = {}
+            try:
+                await self._spill.put_many(list(self._writing.values()))
+                self.stats["spilled"] += len(self._writing)
+            except Exception as e:
+                logger.warning(f"Failed to spill {len(self._writing)} cached messages: {e}")
+            finally:
+                self._writing = {}
+
+    async def close(self):
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        await self.flush()
+        if self._spill is not None:
+            await self._spill.close()
+
+    # --- gateway listeners (registered by attach) ---
+
+    async def _on_message(self, message):
+        # Never cache the bot's own messages (mostly log embeds)
+        me = self._bot.user if self._bot is not None else None
+        if me is not None and message.author.id == me.id:
+            return
+        self.add(message)
+
+    def attach(self, bot):
+        """Register the on_message listener that feeds the cache on `bot`."""
+        self._bot = bot
+        if self.enabled:
+            bot.add_listener(self._on_message, "on_message")
@@ -0,0 +1,164 @@
+# utils/metrics.py
+import functools
+import logging
+import time
+logger = logging.getLogger(__name__)
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Hot-path metrics, observed inline. Totals that components already keep in
+# their `stats` dicts are exported by _BotStatsCollector at scrape time
+# instead of being counted twice.
+LISTENER_EVENTS = Counter("sentry_listener_events_total", "Gateway events handled per enabled LoggerCog listener", ["event"])
+LISTENER_ERRORS = Counter("sentry_listener_errors_total", "LoggerCog listener invocations that raised", ["event"])
+LISTENER_SECONDS = Histogram("sentry_listener_seconds", "Time spent in a LoggerCog listener", ["event"])
+
+DB_WRITE_SECONDS = Histogram("sentry_db_write_seconds", "Latency of one batched INSERT into logs",
+                             buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+DB_BATCH_ROWS = Histogram("sentry_db_batch_rows", "Rows per batched INSERT",
+                          buckets=(1, 5, 10, 25, 50, 100, 200, 500, 1000, 2000))
+
+DISCORD_SEND_SECONDS = Histogram("sentry_discord_send_seconds", "Latency of channel.send() for log embeds",
+                                 ["outcome"])
+
+AUDIT_LOOKUP_SECONDS = Histogram("sentry_audit_lookup_seconds", "Audit-log actor lookup latency",
+                                 ["result"], buckets=(0.0001, 0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5))
+
+LOOP_LAG_SECONDS = Histogram("sentry_event_loop_lag_seconds", "How late the event loop woke a periodic sleeper",
+                             buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+LOOP_LAG_LAST = Gauge("sentry_event_loop_lag_last_seconds", "Most recent event-loop lag sample")
+SLOW_CALLBACKS = Counter("sentry_slow_callbacks_total", "Event-loop callbacks over SLOW_CALLBACK_MS", ["callback"])
+SLOW_CALLBACK_SECONDS = Histogram("sentry_slow_callback_seconds", "Duration of callbacks over SLOW_CALLBACK_MS",
+                                  buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+
+
+def instrumented(func):
+    """Count and time a LoggerCog listener under its event name.
+
+    Apply below `@commands.Cog.listener()`; functools.wraps keeps the
+    function name discord.py uses to pick the event.
+    """
+    event = func.__name__[3:] if func.__name__.startswith("on_") else func.__name__
+    events = LISTENER_EVENTS.labels(event)
+    errors = LISTENER_ERRORS.labels(event)
+    seconds = LISTENER_SECONDS.labels(event)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        events.inc()
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            seconds.observe(time.perf_counter() - start)
+    return wrapper
+
+
+class _BotStatsCollector:
+    """Exports the counters kept by the writer, dispatcher and caches at scrape time."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    def collect(self):
+        bot = self.bot
+        writer = getattr(bot, "log_writer", None)
+        if writer is not None:
+            rows = CounterMetricFamily("sentry_writer_rows", "Log rows handled by the DB writer", labels=["outcome"])
+            for outcome in ("enqueued", "written", "dropped", "failed", "spooled", "replayed", "dead_lettered"):
+                rows.add_metric([outcome], writer.stats.get(outcome, 0))
+            yield rows
+            yield CounterMetricFamily("sentry_writer_copied_rows", "Rows written through the COPY ingest path",
+                                      value=writer.stats.get("copied", 0))
+            yield CounterMetricFamily("sentry_writer_batches", "Batched INSERTs committed",
+                                      value=writer.stats.get("batches", 0))
+            yield GaugeMetricFamily("sentry_writer_queue_depth", "Rows waiting for the DB writer",
+                                    value=writer.queue_depth)
+            if writer.spool is not None:
+                yield GaugeMetricFamily("sentry_spool_segments", "Spool segments waiting for replay",
+                                        value=writer.spool.pending_segments())
+
+        dispatcher = getattr(bot, "embed_dispatcher", None)
+        if dispatcher is not None:
+            embeds = CounterMetricFamily("sentry_dispatch_embeds", "Log embeds handled by the dispatcher",
+                                         labels=["outcome"])
+            for outcome, key in (("enqueued", "enqueued"), ("sent", "embeds"), ("dropped", "dropped"),
+                                 ("failed", "failed")):
+                embeds.add_metric([outcome], dispatcher.stats.get(key, 0))
+            yield embeds
+            yield CounterMetricFamily("sentry_dispatch_messages", "Messages sent to log channels",
+                                      value=dispatcher.stats.get("messages", 0))
+            yield CounterMetricFamily("sentry_discord_rate_limited", "429 responses received while sending embeds",
+                                      value=dispatcher.stats.get("rate_limited", 0))
+            yield GaugeMetricFamily("sentry_dispatch_queue_depth", "Embeds waiting to be sent",
+                                    value=dispatcher.queue_depth)
+
+        audit = getattr(bot, "audit_cache", None)
+        if audit is not None:
+            lookups = CounterMetricFamily("sentry_audit_lookups", "Audit-log actor lookups", labels=["result"])
+            for result, key in (("hit", "hits"), ("waited_hit", "waited_hits"), ("miss", "misses")):
+                lookups.add_metric([result], audit.stats.get(key, 0))
+            yield lookups
+
+        cache = getattr(bot, "message_cache", None)
+        if cache is not None:
+            lookups = CounterMetricFamily("sentry_message_cache_lookups", "Deleted/edited message lookups",
+                                          labels=["result"])
+            for result, key in (("hit", "hits"), ("spill_hit", "spill_hits"), ("miss", "misses")):
+                lookups.add_metric([result], cache.stats.get(key, 0))
+            yield lookups
+            yield CounterMetricFamily("sentry_message_cache_evictions", "Messages evicted from the in-memory cache",
+                                      value=cache.stats.get("evicted", 0))
+            yield GaugeMetricFamily("sentry_message_cache_entries", "Messages held in memory", value=len(cache))
+            yield GaugeMetricFamily("sentry_message_cache_bytes", "Approximate size of the in-memory message cache",
+                                    value=cache.bytes)
+
+        get_cog = getattr(bot, "get_cog", None)
+        logger_cog = get_cog("LoggerCog") if get_cog else None
+        burst = getattr(logger_cog, "burst", None)
+        if burst is not None:
+            yield CounterMetricFamily("sentry_bursts", "Bursts that switched an event group to summaries",
+                                      value=burst.stats["bursts"])
+            yield CounterMetricFamily("sentry_burst_aggregated_events", "Events folded into burst summaries",
+                                      value=burst.stats["aggregated"])
+
+        startup = getattr(bot, "startup", None)
+        if startup is not None:
+            stages = GaugeMetricFamily("sentry_startup_stage_seconds", "Duration of each finished startup stage",
+                                       labels=["stage"])
+            for name, entry in startup.stages.items():
+                if entry["seconds"] is not None:
+                    stages.add_metric([name], entry["seconds"])
+            yield stages
+            milestones = GaugeMetricFamily("sentry_startup_milestone_seconds",
+                                           "Seconds from process start to each startup milestone", labels=["milestone"])
+            for name, at in startup.milestones.items():
+                milestones.add_metric([name], at)
+            yield milestones
+
+        latency = bot.latency
+        if latency == latency and latency != float("inf"):
+            yield GaugeMetricFamily("sentry_gateway_latency_seconds", "Discord gateway heartbeat latency",
+                                    value=latency)
+        yield GaugeMetricFamily("sentry_guilds", "Guilds the bot is in", value=len(bot.guilds))
+
+
+_registered_bot_collector = None
+
+
+def register_bot(bot):
+    """Expose the bot's component stats on /metrics (idempotent)."""
+    global _registered_bot_collector
+    if _registered_bot_collector is not None:
+        REGISTRY.unregister(_registered_bot_collector)
+    _registered_bot_collector = _BotStatsCollector(bot)
+    REGISTRY.register(_registered_bot_collector)
+
+
+def render_latest() -> tuple[bytes, str]:
+    """Return (body, content type) for a /metrics response."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,318 @@
+# utils/migrations.py
+"""Versioned schema migrations for existing databases.
+
+create_all() only creates missing tables, so columns and indexes added after
+a table exists reach production through the versions in MIGRATIONS. They run
+at startup from init_db_async() (MIGRATE_ON_STARTUP) or from the command line:
+
+    python -m utils.migrations status
+    python -m utils.migrations up                  # same as startup: stops before manual versions
+    python -m utils.migrations up --include-manual # also long-running versions
+    python -m utils.migrations up --to 3
+
+Each version is a list of steps; once all of them succeed the version is
+recorded in `schema_migrations`. Steps are written to be re-runnable, so a
+version interrupted half-way is simply applied again. To stay online on a
+large `logs` table:
+- SQL steps run in one transaction under a short lock_timeout and are retried
+  when the lock is busy, instead of queueing every writer behind them
+- indexes are built CONCURRENTLY (plain builds on a partitioned table), and
+  an invalid index left by an interrupted build is dropped and rebuilt
+- backfills update one id range per transaction and sleep between batches
+A session advisory lock keeps two bot instances from migrating at once.
+"""
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime
+logger = logging.getLogger(__name__)
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+import utils.database as udb
+from utils.database import SchemaMigration, SEARCH_VECTOR_SQL
+
+# Arbitrary key for pg_advisory_lock, shared by every process running migrations
+_ADVISORY_LOCK_KEY = 0x5E47_0001
+_LOCK_NOT_AVAILABLE = "55P03"
+
+
+def _is_partitioned(conn, table: str) -> bool:
+    return conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table}).scalar() == "p"
+
+
+class Sql:
+    """Statements run together in one transaction under MIGRATION_LOCK_TIMEOUT_MS."""
+
+    def __init__(self, *statements: str):
+        self.statements = statements
+
+    def describe(self) -> str:
+        return "; ".join(s.split("\n")[0][:60] for s in self.statements)
+
+    def run(self, runner: "MigrationRunner"):
+        runner.with_lock_retries(self._run)
+
+    def _run(self, lock_timeout_ms: int):
+        with udb.engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL lock_timeout = '{lock_timeout_ms}ms'"))
+            for stmt in self.statements:
+                conn.execute(text(stmt))
+
+
+class CreateIndex:
+    """CREATE [UNIQUE] INDEX CONCURRENTLY IF NOT EXISTS, outside any transaction."""
+
+    def __init__(self, name: str, table: str, definition: str, unique: bool = False):
+        self.name = name
+        self.table = table
+        self.definition = definition
+        self.unique = unique
+
+    def describe(self) -> str:
+        return f"index {self.name}"
+
+    def run(self, runner: "MigrationRunner"):
+        runner.with_lock_retries(self._run)
+
+    def _run(self, lock_timeout_ms: int):
+        with udb.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            # The build itself may take minutes; only waiting for the lock is bounded
+            conn.execute(text("SET statement_timeout = 0"))
+            conn.execute(text(f"SET lock_timeout = '{lock_timeout_ms}ms'"))
+            concurrently = "" if _is_partitioned(conn, self.table) else "CONCURRENTLY"
+            valid = conn.execute(text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+                                 {"name": self.name}).scalar()
+            if valid is False:
+                logger.warning(f"Dropping invalid index {self.name} left by an interrupted build.")
+                conn.execute(text(f"DROP INDEX {concurrently} IF EXISTS {self.name}"))
+            unique = "UNIQUE " if self.unique else ""
+            conn.execute(text(f"CREATE {unique}INDEX {concurrently} IF NOT EXISTS {self.name} "
+                              f"ON {self.table} {self.definition}"))
+
+
+class Backfill:
+    """Statements over `table` taking :lo / :hi id bounds, applied one id range per transaction.
+
+    The statements should skip rows that are already done, so re-running an
+    interrupted backfill only touches what is left. Rows inserted after the
+    run started (id above the max(id) read at the start) are not visited.
+    """
+
+    def __init__(self, *statements: str, table: str = "logs"):
+        self.statements = statements
+        self.table = table
+
+    def describe(self) -> str:
+        return f"backfill {self.table}"
+
+    def run(self, runner: "MigrationRunner", start_id: int | None = None) -> int:
+        with udb.engine.connect() as conn:
+            lo, hi = conn.execute(text(f"SELECT min(id), max(id) FROM {self.table}")).one()
+        if lo is None:
+            return 0
+        lo = max(lo, start_id or lo)
+        updated = 0
+        started = time.monotonic()
+        while lo <= hi:
+            end = lo + runner.batch_size
+            with udb.engine.begin() as conn:
+                for stmt in self.statements:
+                    result = conn.execute(text(stmt), {"lo": lo, "hi": end})
+                # The last statement is the UPDATE whose rowcount is reported
+                updated += result.rowcount or 0
+            lo = end
+            elapsed = time.monotonic() - started
+            logger.info(f"Backfilled {self.table} ids < {end} of {hi} ({updated} rows, "
+                        f"{updated / max(elapsed, 1e-9):.0f} rows/s); resume with --start-id {end}")
+            if lo <= hi and runner.batch_sleep > 0:
+                time.sleep(runner.batch_sleep)
+        return updated
+
+
+class Call:
+    """A Python step: fn(runner) for changes that need more than plain statements."""
+
+    def __init__(self, fn, description: str):
+        self.fn = fn
+        self.description = description
+
+    def describe(self) -> str:
+        return self.description
+
+    def run(self, runner: "MigrationRunner"):
+        self.fn(runner)
+
+
+class Migration:
+    """One schema version.
+
+    `manual` marks versions that rewrite a large table; startup (auto) stops
+    before them and they are applied from the CLI. `applied_if(conn)` lets a
+    version be recorded without running when the schema already has it (e.g.
+    tables created by create_all() from the current models).
+    """
+
+    def __init__(self, version: int, name: str, steps: list, manual: bool = False, applied_if=None):
+        self.version = version
+        self.name = name
+        self.steps = steps
+        self.manual = manual
+        self.applied_if = applied_if
+
+
+def _compact_logs(runner: "MigrationRunner"):
+    from utils.compact_schema import migrate
+    migrate(runner.batch_size, runner.batch_sleep, runner.lock_timeout_ms)
+
+
+def _is_compact(conn) -> bool:
+    return udb.logs_schema_state(conn) == "compact"
+
+
+MIGRATIONS = [
+    Migration(1, "logs_event_id", [
+        Sql("ALTER TABLE logs ADD COLUMN IF NOT EXISTS event_id VARCHAR(32)"),
+        CreateIndex("ix_logs_event_id", "logs", "(event_id)", unique=True),
+    ]),
+    Migration(2, "logs_search_index", [
+        CreateIndex("ix_logs_search", "logs", "USING gin (" + SEARCH_VECTOR_SQL + ")"),
+    ]),
+    Migration(3, "logs_archive", [
+        Sql("ALTER TABLE logs ADD COLUMN IF NOT EXISTS archive BYTEA"),
+    ]),
+    Migration(4, "logs_compact_schema", [
+        Call(_compact_logs, "BIGINT ids, event codes and authors table (utils.compact_schema)"),
+    ], manual=True, applied_if=_is_compact),
+    Migration(5, "logs_range_indexes", [
+        CreateIndex("ix_logs_timestamp", "logs", "(timestamp)"),
+        CreateIndex("ix_logs_guild_ts", "logs", "(guild_id, timestamp, id)"),
+        CreateIndex("ix_logs_guild_event_ts", "logs", "(guild_id, event_code, timestamp, id)"),
+        CreateIndex("ix_logs_guild_author_ts", "logs", "(guild_id, author_id, timestamp, id)"),
+    ]),
+    # Daily counts are summed from log_event_hourly now
+    Migration(6, "drop_log_event_counts", [
+        Sql("DROP TABLE IF EXISTS log_event_counts"),
+    ]),
+]
+
+
+class MigrationRunner:
+    def __init__(self, migrations: list[Migration] | None = None, lock_timeout_ms: int | None = None,
+                 batch_size: int | None = None, batch_sleep: float | None = None, lock_retries: int = 5):
+        self.migrations = sorted(migrations or MIGRATIONS, key=lambda m: m.version)
+        self.lock_timeout_ms = int(lock_timeout_ms or udb.MIGRATION_LOCK_TIMEOUT_MS)
+        self.batch_size = max(100, int(batch_size or udb.MIGRATION_BATCH_SIZE))
+        self.batch_sleep = udb.MIGRATION_BATCH_SLEEP_MS / 1000 if batch_sleep is None else batch_sleep
+        self.lock_retries = max(1, int(lock_retries))
+
+    def with_lock_retries(self, fn):
+        """Run fn(lock_timeout_ms), retrying with backoff while the table lock is unavailable."""
+        for attempt in range(1, self.lock_retries + 1):
+            try:
+                return fn(self.lock_timeout_ms)
+            except DBAPIError as e:
+                if getattr(e.orig, "pgcode", None) != _LOCK_NOT_AVAILABLE or attempt == self.lock_retries:
+                    raise
+                logger.warning(f"Migration step could not get its lock within {self.lock_timeout_ms} ms "
+                               f"(attempt {attempt}/{self.lock_retries}); retrying.")
+                time.sleep(attempt)
+
+    def applied(self) -> dict[int, datetime]:
+        SchemaMigration.__table__.create(bind=udb.engine, checkfirst=True)
+        with udb.engine.connect() as conn:
+            return dict(conn.execute(text("SELECT version, applied_at FROM schema_migrations")).all())
+
+    def pending(self) -> list[Migration]:
+        applied = self.applied()
+        return [m for m in self.migrations if m.version not in applied]
+
+    def _record(self, migration: Migration, duration_ms: int):
+        with udb.engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO schema_migrations (version, name, applied_at, duration_ms) "
+                "VALUES (:version, :name, :applied_at, :duration_ms) ON CONFLICT (version) DO NOTHING"
+            ), {"version": migration.version, "name": migration.name, "applied_at": datetime.utcnow(),
+                "duration_ms": duration_ms})
+
+    def apply(self, migration: Migration):
+        started = time.monotonic()
+        if migration.applied_if is not None:
+            with udb.engine.connect() as conn:
+                already = migration.applied_if(conn)
+        else:
+            already = False
+        if not already:
+            logger.info(f"Applying schema migration {migration.version} ({migration.name})...")
+            for step in migration.steps:
+                step_started = time.monotonic()
+                step.run(self)
+                logger.info(f"  {step.describe()} ({time.monotonic() - step_started:.2f}s)")
+        duration_ms = int((time.monotonic() - started) * 1000)
+        self._record(migration, duration_ms)
+        logger.info(f"Schema migration {migration.version} ({migration.name}) "
+                    f"{'recorded' if already else 'applied'} in {duration_ms} ms.")
+
+    def migrate(self, target: int | None = None, include_manual: bool = False) -> list[int]:
+        """Apply pending versions in order (up to `target`). Returns the versions applied."""
+        done = []
+        with udb.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+            if not lock_conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": _ADVISORY_LOCK_KEY}).scalar():
+                logger.warning("Another process is running schema migrations; skipping.")
+                return done
+            try:
+                for migration in self.pending():
+                    if target is not None and migration.version > target:
+                        break
+                    if migration.manual and not include_manual:
+                        with udb.engine.connect() as conn:
+                            satisfied = migration.applied_if is not None and migration.applied_if(conn)
+                        if not satisfied:
+                            logger.warning(
+                                f"Schema migration {migration.version} ({migration.name}) is long-running and "
+                                f"must be applied with `python -m utils.migrations up --include-manual`; "
+                                f"later migrations wait for it.")
+                            break
+                    self.apply(migration)
+                    done.append(migration.version)
+            finally:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _ADVISORY_LOCK_KEY})
+        if not done:
+            logger.info("Database schema is up to date.")
+        return done
+
+
+def migrate(target: int | None = None, include_manual: bool = False) -> list[int]:
+    """Apply pending schema migrations with the configured MIGRATION_* settings."""
+    return MigrationRunner().migrate(target=target, include_manual=include_manual)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=("status", "up"))
+    parser.add_argument("--to", type=int, help="Stop after this version")
+    parser.add_argument("--include-manual", action="store_true", help="Also apply long-running versions")
+    parser.add_argument("--lock-timeout-ms", type=int)
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--batch-sleep", type=float, help="Seconds between backfill batches")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    runner = MigrationRunner(lock_timeout_ms=args.lock_timeout_ms, batch_size=args.batch_size,
+                             batch_sleep=args.batch_sleep)
+    try:
+        if args.command == "status":
+            applied = runner.applied()
+            for m in runner.migrations:
+                state = f"applied {applied[m.version]:%Y-%m-%d %H:%M}" if m.version in applied else "pending"
+                print(f"{m.version:>4}  {m.name:<24} {state}{'  (manual)' if m.manual else ''}")
+            return
+        runner.migrate(target=args.to, include_manual=args.include_manual)
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
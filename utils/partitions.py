@@ -0,0 +1,184 @@
+# utils/partitions.py
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+logger = logging.getLogger(__name__)
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+import utils.database as udb
+
+PARTITIONED_MODES = ("daily", "monthly")
+DEFAULT_PARTITION = "logs_default"
+
+# Partitioned variant of the LogEntry table. Postgres requires the partition
+# key in every unique constraint, so the primary key and the event_id index
+# include `timestamp`.
+_PARTITIONED_LOGS_DDL = """
+CREATE TABLE logs (
+    id SERIAL NOT NULL,
+    event_id VARCHAR(32),
+    timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+    event_code SMALLINT,
+    author_id BIGINT,
+    description VARCHAR,
+    guild_id BIGINT,
+    details JSONB,
+    archive BYTEA,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp)
+"""
+
+
+def period_start(mode: str, day: date) -> date:
+    return day.replace(day=1) if mode == "monthly" else day
+
+
+def next_period(mode: str, start: date) -> date:
+    if mode == "monthly":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def partition_name(mode: str, start: date) -> str:
+    return f"logs_p{start:%Y%m}" if mode == "monthly" else f"logs_p{start:%Y%m%d}"
+
+
+def _parse_partition_name(name: str) -> tuple[str, date] | None:
+    suffix = name[len("logs_p"):] if name.startswith("logs_p") else ""
+    try:
+        if len(suffix) == 8:
+            return "daily", datetime.strptime(suffix, "%Y%m%d").date()
+        if len(suffix) == 6:
+            return "monthly", datetime.strptime(suffix, "%Y%m").date()
+    except ValueError:
+        pass
+    return None
+
+
+def is_partitioned(conn) -> bool:
+    kind = conn.execute(text(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = 'logs' AND n.nspname = current_schema()"
+    )).scalar()
+    return kind == "p"
+
+
+def prepare_partitioned_logs(conn, mode: str, ahead: int) -> bool:
+    """Create `logs` as a range-partitioned table if it does not exist yet (sync connection).
+
+    Called from init_db_async() before create_all(). Returns False if an existing,
+    unpartitioned `logs` table is found; that table is left untouched.
+    """
+    exists = conn.execute(text("SELECT to_regclass('logs') IS NOT NULL")).scalar()
+    if not exists:
+        conn.execute(text(_PARTITIONED_LOGS_DDL))
+        for idx in udb.LogEntry.__table__.indexes:
+            if idx.name != "ix_logs_event_id":
+                conn.execute(CreateIndex(idx))
+        conn.execute(text("CREATE UNIQUE INDEX ix_logs_event_id ON logs (event_id, timestamp)"))
+        conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF logs DEFAULT"))
+        logger.info(f"Created range-partitioned logs table ({mode} partitions).")
+    elif not is_partitioned(conn):
+        logger.warning(f"LOGS_PARTITIONING={mode} but the existing 'logs' table is not partitioned; "
+                       f"continuing with the regular table.")
+        return False
+    ensure_partitions(conn, mode, ahead)
+    return True
+
+
+def ensure_partitions(conn, mode: str, ahead: int, today: date | None = None) -> list[str]:
+    """Create the current partition plus `ahead` future ones (idempotent, sync connection)."""
+    start = period_start(mode, today or datetime.utcnow().date())
+    created = []
+    for _ in range(max(1, ahead) + 1):
+        end = next_period(mode, start)
+        name = partition_name(mode, start)
+        exists = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+        if not exists:
+            conn.execute(text(
+                f"CREATE TABLE {name} PARTITION OF logs FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            ))
+            created.append(name)
+        start = end
+    if created:
+        logger.info(f"Created log partitions: {', '.join(created)}")
+    return created
+
+
+def list_partitions(conn) -> list[tuple[str, date, date]]:
+    """Return (name, start, end) for every range partition of `logs` (sync connection)."""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'logs'::regclass ORDER BY c.relname"
+    )).scalars().all()
+    parts = []
+    for name in names:
+        parsed = _parse_partition_name(name)
+        if parsed is None:
+            continue
+        mode, start = parsed
+        parts.append((name, start, next_period(mode, start)))
+    return parts
+
+
+async def drop_partitions_before(cutoff: datetime, lock_timeout_ms: int = 5000) -> list[str]:
+    """Detach and drop every partition whose whole range is older than `cutoff`.
+
+    Each partition is handled in its own short transaction with a lock
+    timeout, so a busy parent table makes us retry next run rather than
+    queueing the live writer behind us.
+    """
+    async with udb.async_engine.connect() as conn:
+        parts = await conn.run_sync(list_partitions)
+    dropped = []
+    for name, _start, end in parts:
+        if end > cutoff.date():
+            continue
+        try:
+            async with udb.async_engine.begin() as conn:
+                await conn.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+                await conn.execute(text(f"ALTER TABLE logs DETACH PARTITION {name}"))
+                await conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+        except Exception as e:
+            logger.warning(f"Could not drop log partition {name}: {e}")
+    return dropped
+
+
+class PartitionMaintainer:
+    """Keeps future partitions of `logs` created across day/month rollovers."""
+
+    def __init__(self, mode: str, ahead: int = 3):
+        self.mode = mode
+        self.ahead = ahead
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="log-partitions")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def ensure(self) -> list[str]:
+        async with udb.async_engine.begin() as conn:
+            if not await conn.run_sync(is_partitioned):
+                return []
+            return await conn.run_sync(ensure_partitions, self.mode, self.ahead)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.ensure()
+            except Exception as e:
+                logger.warning(f"Log partition maintenance failed: {e}")
+            now = datetime.utcnow()
+            next_midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+            await asyncio.sleep((next_midnight - now).total_seconds() + 60)
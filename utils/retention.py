@@ -0,0 +1,126 @@
+# utils/retention.py
+import asyncio
+import logging
+from datetime import datetime, timedelta
+logger = logging.getLogger(__name__)
+
+from sqlalchemy import text
+import utils.database as udb
+from utils.partitions import PARTITIONED_MODES, DEFAULT_PARTITION, drop_partitions_before, is_partitioned
+
+
+class RetentionJob:
+    """Daily purge of log rows older than `retention_days` (FR-7).
+
+    Rows are deleted in short transactions over primary-key ranges of
+    `batch_size` ids, sleeping `batch_sleep` seconds between chunks, so no
+    long-running transaction or lock competes with the live writer. The
+    `timestamp < cutoff` predicate is evaluated inside each id range, so rows
+    that were inserted late (e.g. replayed from the spool) are kept until they
+    actually expire.
+
+    When `logs` is range-partitioned (LOGS_PARTITIONING), whole partitions
+    older than the cutoff are detached and dropped instead, which is O(1)
+    per partition; only the small default partition is deleted row-wise.
+    """
+
+    def __init__(self, bot, interval_hours: float = 24.0, initial_delay: float = 300.0):
+        self.bot = bot
+        self.interval = max(60.0, float(interval_hours) * 3600)
+        self.initial_delay = initial_delay
+        self._task = None
+        self.last_run = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="log-retention")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        await asyncio.sleep(self.initial_delay)
+        while True:
+            days = self.bot.config.get("retention_days")
+            if days:
+                try:
+                    await self.purge(days)
+                except Exception:
+                    logger.exception("Retention purge failed")
+            else:
+                logger.debug("retention_days not configured; skipping log purge.")
+            await asyncio.sleep(self.interval)
+
+    async def purge(self, days: int) -> dict:
+        """Delete rows older than `days` days. Returns a summary dict."""
+        batch_size = max(100, int(self.bot.config.get("retention_batch_size", 5000)))
+        batch_sleep = float(self.bot.config.get("retention_batch_sleep", 0.5))
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        if udb.LOGS_PARTITIONING in PARTITIONED_MODES:
+            async with udb.async_engine.connect() as conn:
+                partitioned = await conn.run_sync(is_partitioned)
+            if partitioned:
+                return await self._purge_partitions(days, cutoff, started)
+
+        async with udb.async_engine.connect() as conn:
+            lo = (await conn.execute(text("SELECT min(id) FROM logs"))).scalar()
+            hi = (await conn.execute(text("SELECT max(id) FROM logs WHERE timestamp < :cutoff"),
+                                     {"cutoff": cutoff})).scalar()
+
+        deleted = 0
+        batches = 0
+        if lo is not None and hi is not None:
+            start_id = lo
+            while start_id <= hi:
+                end_id = start_id + batch_size
+                async with udb.async_engine.begin() as conn:
+                    result = await conn.execute(
+                        text("DELETE FROM logs WHERE id >= :lo AND id < :hi AND timestamp < :cutoff"),
+                        {"lo": start_id, "hi": end_id, "cutoff": cutoff},
+                    )
+                deleted += result.rowcount or 0
+                batches += 1
+                start_id = end_id
+                if start_id <= hi and batch_sleep > 0:
+                    await asyncio.sleep(batch_sleep)
+
+        elapsed = loop.time() - started
+        rate = deleted / elapsed if elapsed > 0 else 0.0
+        self.last_run = {
+            "finished_at": datetime.utcnow().isoformat() + "Z",
+            "cutoff": cutoff.isoformat() + "Z",
+            "deleted": deleted,
+            "batches": batches,
+            "seconds": round(elapsed, 2),
+            "rows_per_second": round(rate, 1),
+        }
+        logger.info(f"Retention purge removed {deleted} rows older than {days} days in {batches} batches "
+                    f"({elapsed:.1f}s, {rate:.0f} rows/s).")
+        return self.last_run
+
+    async def _purge_partitions(self, days: int, cutoff: datetime, started: float) -> dict:
+        dropped = await drop_partitions_before(cutoff)
+        async with udb.async_engine.begin() as conn:
+            result = await conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < :cutoff"),
+                                        {"cutoff": cutoff})
+        deleted = result.rowcount or 0
+        elapsed = asyncio.get_running_loop().time() - started
+        self.last_run = {
+            "finished_at": datetime.utcnow().isoformat() + "Z",
+            "cutoff": cutoff.isoformat() + "Z",
+            "dropped_partitions": dropped,
+            "deleted": deleted,
+            "seconds": round(elapsed, 2),
+        }
+        logger.info(f"Retention purge dropped {len(dropped)} partitions older than {days} days "
+                    f"({', '.join(dropped) or 'none'}) and {deleted} default-partition rows in {elapsed:.1f}s.")
+        return self.last_run
@@ -0,0 +1,221 @@
+# utils/rollups.py
+"""Hourly event rollups: (guild, event code, UTC hour) -> rows written.
+
+The log writer bumps `log_event_hourly` in the same transaction as each
+batch (bump_hourly), so /stats and /api/stats read trends from at most
+window x event types rows instead of scanning `logs`. rebuild_hourly()
+recomputes a time range from raw rows in bulk, e.g. to fill history that
+predates the table:
+
+    python -m utils.rollups rebuild                  # everything in logs
+    python -m utils.rollups rebuild --days 30 --guild-id 123
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time as _time
+from collections import Counter
+from datetime import datetime, time, timedelta
+logger = logging.getLogger(__name__)
+
+from sqlalchemy import func, literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import utils.database as udb
+from utils.database import EventType, LogEventHourly
+from utils.dimensions import to_snowflake
+
+BUCKETS = ("hour", "day")
+MAX_STATS_DAYS = 366
+
+# Conflicts with the ROW EXCLUSIVE lock bump_hourly's upsert takes. Writer
+# batches that already bumped the table commit first, so the statements below
+# (each with a snapshot taken after the lock) see their rows. Batches that
+# bump later wait for the rebuild to commit, and their rows are not yet
+# visible to it. Either way every row is counted exactly once.
+_REBUILD_LOCK = "LOCK TABLE log_event_hourly IN SHARE ROW EXCLUSIVE MODE"
+_REBUILD_DELETE = "DELETE FROM log_event_hourly WHERE hour >= :lo AND hour < :hi"
+_REBUILD_INSERT = (
+    "INSERT INTO log_event_hourly (guild_id, hour, event_code, count) "
+    "SELECT coalesce(guild_id, 0), date_trunc('hour', timestamp), coalesce(event_code, 0), count(*) "
+    "FROM logs WHERE timestamp >= :lo AND timestamp < :hi {guild_filter}"
+    "GROUP BY 1, 2, 3"
+)
+
+
+def hour_bucket(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def aggregate_hourly(rows) -> list[dict]:
+    """Group inserted rows ((guild_id, event_code, timestamp) tuples) into hourly increments."""
+    counts = Counter()
+    for guild_id, event_code, timestamp in rows:
+        counts[(guild_id or 0, hour_bucket(timestamp or datetime.utcnow()), event_code or 0)] += 1
+    # Sorted so concurrent upserts lock rollup rows in the same order
+    return [{"guild_id": g, "hour": h, "event_code": c, "count": n} for (g, h, c), n in sorted(counts.items())]
+
+
+async def bump_hourly(conn, rows):
+    """Add the rows just inserted into `logs` to log_event_hourly, in the caller's transaction."""
+    increments = aggregate_hourly(rows)
+    if not increments:
+        return
+    stmt = pg_insert(LogEventHourly).values(increments)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[LogEventHourly.guild_id, LogEventHourly.hour, LogEventHourly.event_code],
+        set_={"count": LogEventHourly.count + stmt.excluded.count},
+    )
+    await conn.execute(stmt)
+
+
+def trend_window(days: int, bucket: str, now: datetime | None = None) -> tuple[datetime, datetime, list[datetime]]:
+    """[since, until) covering the last `days` days, ending with the current hour/day, plus its bucket starts."""
+    now = now or datetime.utcnow()
+    if bucket == "day":
+        until = datetime.combine(now.date(), time()) + timedelta(days=1)
+        step = timedelta(days=1)
+    else:
+        until = hour_bucket(now) + timedelta(hours=1)
+        step = timedelta(hours=1)
+    since = until - timedelta(days=days)
+    return since, until, [since + i * step for i in range(int((until - since) / step))]
+
+
+async def fetch_trend(guild_id=None, days: int = 7, event_type: str | None = None, bucket: str | None = None,
+                      now: datetime | None = None) -> dict:
+    """Per-event-type counts over the last `days` days, in hour or day buckets, from the rollups.
+
+    Raises ValueError for a non-numeric guild_id or an unknown bucket.
+    """
+    days = max(1, min(int(days), MAX_STATS_DAYS))
+    bucket = bucket or ("hour" if days <= 2 else "day")
+    if bucket not in BUCKETS:
+        raise ValueError(f"invalid bucket (use {' or '.join(BUCKETS)})")
+    since, until, starts = trend_window(days, bucket, now)
+
+    # Inlined (bucket is validated) so SELECT and GROUP BY are the same expression
+    start = func.date_trunc(literal_column(f"'{bucket}'"), LogEventHourly.hour).label("bucket")
+    stmt = (select(start, EventType.name, func.sum(LogEventHourly.count))
+            .select_from(LogEventHourly)
+            .outerjoin(EventType, EventType.code == LogEventHourly.event_code)
+            .where(LogEventHourly.hour >= since, LogEventHourly.hour < until)
+            .group_by(start, EventType.name))
+    if guild_id:
+        snowflake = to_snowflake(guild_id)
+        if snowflake is None:
+            raise ValueError("invalid guild_id")
+        stmt = stmt.where(LogEventHourly.guild_id == snowflake)
+    if event_type:
+        stmt = stmt.where(LogEventHourly.event_code ==
+                          select(EventType.code).where(EventType.name == event_type).scalar_subquery())
+    async with udb.async_engine.connect() as conn:
+        rows = (await conn.execute(stmt)).all()
+
+    index = {s: i for i, s in enumerate(starts)}
+    series = {}
+    for start_at, name, count in rows:
+        i = index.get(start_at)
+        if i is None:
+            continue
+        series.setdefault(name or "unknown", [0] * len(starts))[i] += int(count)
+    totals = sorted(((name, sum(values)) for name, values in series.items()), key=lambda t: (-t[1], t[0]))
+    return {
+        "guild_id": str(guild_id) if guild_id else None,
+        "bucket": bucket,
+        "since": since.isoformat() + "Z",
+        "until": until.isoformat() + "Z",
+        "buckets": [s.isoformat() + "Z" for s in starts],
+        "series": series,
+        "totals": dict(totals),
+        "total": sum(t for _, t in totals),
+    }
+
+
+async def rebuild_hourly(since: datetime | None = None, until: datetime | None = None, guild_id=None,
+                         chunk_hours: int = 24, sleep: float = 0.0) -> dict:
+    """Recompute log_event_hourly from `logs` for [since, until), one chunk of hours per transaction.
+
+    Defaults to everything in `logs`. Each chunk replaces its rollup rows
+    with a GROUP BY over the (timestamp-indexed) range while holding a lock
+    that makes the writer's rollup upserts wait, so it is safe to run while
+    the bot keeps writing. Keep chunks small enough that this wait stays
+    well under the writer's WRITER_WRITE_TIMEOUT.
+    """
+    snowflake = None
+    if guild_id:
+        snowflake = to_snowflake(guild_id)
+        if snowflake is None:
+            raise ValueError("invalid guild_id")
+    if since is None:
+        async with udb.async_engine.connect() as conn:
+            since = (await conn.execute(text("SELECT min(timestamp) FROM logs"))).scalar()
+        if since is None:
+            return {"chunks": 0, "rows": 0, "seconds": 0.0}
+    until = until or datetime.utcnow()
+    # Whole hours only: a partial hour would replace its rollup row with a partial count
+    if until != hour_bucket(until):
+        until = hour_bucket(until) + timedelta(hours=1)
+    lo = hour_bucket(since)
+    step = timedelta(hours=max(1, int(chunk_hours)))
+    guild_filter = "AND guild_id = :guild_id " if snowflake is not None else ""
+    delete_sql = text(_REBUILD_DELETE + (" AND guild_id = :guild_id" if snowflake is not None else ""))
+    insert_sql = text(_REBUILD_INSERT.format(guild_filter=guild_filter))
+
+    started = _time.monotonic()
+    chunks = 0
+    written = 0
+    while lo < until:
+        hi = min(lo + step, until)
+        params = {"lo": lo, "hi": hi}
+        if snowflake is not None:
+            params["guild_id"] = snowflake
+        async with udb.async_engine.begin() as conn:
+            # A busy day can take longer to aggregate than the bot's statement_timeout
+            await conn.execute(text("SET LOCAL statement_timeout = 0"))
+            await conn.execute(text(_REBUILD_LOCK))
+            await conn.execute(delete_sql, params)
+            written += (await conn.execute(insert_sql, params)).rowcount or 0
+        chunks += 1
+        lo = hi
+        if lo < until and sleep > 0:
+            await asyncio.sleep(sleep)
+    elapsed = _time.monotonic() - started
+    logger.info(f"Rebuilt hourly rollups from {since:%Y-%m-%d %H:00} to {until:%Y-%m-%d %H:00}: "
+                f"{written} rows in {chunks} chunks ({elapsed:.1f}s).")
+    return {"chunks": chunks, "rows": written, "seconds": round(elapsed, 2)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=("rebuild",))
+    parser.add_argument("--days", type=int, help="Only the last N days (default: all of logs)")
+    parser.add_argument("--since", help="ISO-8601 start (UTC)")
+    parser.add_argument("--until", help="ISO-8601 end (UTC, exclusive)")
+    parser.add_argument("--guild-id")
+    parser.add_argument("--chunk-hours", type=int, default=24, help="Hours recomputed per transaction")
+    parser.add_argument("--sleep", type=float, default=0.0, help="Seconds to pause between chunks")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    since = datetime.fromisoformat(args.since) if args.since else None
+    if args.days:
+        since = hour_bucket(datetime.utcnow()) - timedelta(days=args.days)
+    until = datetime.fromisoformat(args.until) if args.until else None
+
+    async def _run():
+        try:
+            return await rebuild_hourly(since, until, guild_id=args.guild_id, chunk_hours=args.chunk_hours,
+                                        sleep=args.sleep)
+        finally:
+            await udb.async_engine.dispose()
+
+    try:
+        print(asyncio.run(_run()))
+    except Exception as e:
+        logger.error(f"Rollup rebuild failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
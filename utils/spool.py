@@ -0,0 +1,173 @@
+# utils/spool.py
+import asyncio
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+logger = logging.getLogger(__name__)
+
+FSYNC_POLICIES = ("always", "interval", "never")
+_SEGMENT_PREFIX = "segment-"
+_SEGMENT_SUFFIX = ".jsonl"
+_DEAD_LETTER_PREFIX = "dead-letter-"
+
+
+def _encode_row(row: dict) -> str:
+    rec = dict(row)
+    ts = rec.get("timestamp")
+    if isinstance(ts, datetime):
+        rec["timestamp"] = ts.isoformat()
+    if rec.get("archive") is not None:
+        rec["archive"] = base64.b64encode(rec["archive"]).decode()
+    return json.dumps(rec, separators=(",", ":"), default=str)
+
+
+def _decode_row(line: str) -> dict:
+    rec = json.loads(line)
+    ts = rec.get("timestamp")
+    if isinstance(ts, str):
+        rec["timestamp"] = datetime.fromisoformat(ts)
+    # Segments written before the archive column existed lack the key
+    archive = rec.get("archive")
+    rec["archive"] = base64.b64decode(archive) if archive else None
+    return rec
+
+
+class LogSpool:
+    """Append-only on-disk spool of log rows, used while Postgres is unavailable.
+
+    Rows are written as JSON lines into numbered segment files under
+    `directory`. The active segment is rotated once it grows past
+    `segment_bytes`. `fsync` controls durability:
+    - always: fsync after every append
+    - interval: fsync at most every `fsync_interval` seconds
+    - never: leave flushing to the OS
+
+    Replay reads whole segments oldest-first; a segment is only deleted after
+    its rows were committed, so a crash mid-replay re-sends rows, which the
+    writer de-duplicates by `event_id`.
+
+    Rows the database rejects outright (constraint or data errors) are moved
+    to daily `dead-letter-YYYYMMDD.jsonl` files next to the segments, with the
+    error in a `dead_letter_error` field. They are never replayed.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 4 * 1024 * 1024, fsync: str = "interval",
+                 fsync_interval: float = 1.0):
+        if fsync not in FSYNC_POLICIES:
+            logger.warning(f"Unknown spool fsync policy '{fsync}', using 'interval'")
+            fsync = "interval"
+        self.directory = directory
+        self.segment_bytes = max(4096, int(segment_bytes))
+        self.fsync = fsync
+        self.fsync_interval = float(fsync_interval)
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_path = None
+        self._last_fsync = 0.0
+        os.makedirs(self.directory, exist_ok=True)
+        self._seq = max([self._segment_seq(p) for p in self._segments()] or [0])
+
+    @staticmethod
+    def _segment_seq(path: str) -> int:
+        name = os.path.basename(path)
+        try:
+            return int(name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)])
+        except Exception:
+            return 0
+
+    def _segments(self) -> list[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        paths = [os.path.join(self.directory, n) for n in names
+                 if n.startswith(_SEGMENT_PREFIX) and n.endswith(_SEGMENT_SUFFIX)]
+        return sorted(paths, key=self._segment_seq)
+
+    def pending_segments(self) -> int:
+        return len(self._segments())
+
+    def has_pending(self) -> bool:
+        return bool(self._segments())
+
+    def _rotate_locked(self):
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+            self._file.close()
+        self._file = None
+        self._file_path = None
+
+    def _append_sync(self, rows: list[dict]):
+        data = "".join(_encode_row(r) + "\n" for r in rows)
+        with self._lock:
+            if self._file is None:
+                self._seq += 1
+                self._file_path = os.path.join(self.directory, f"{_SEGMENT_PREFIX}{self._seq:012d}{_SEGMENT_SUFFIX}")
+                self._file = open(self._file_path, "a", encoding="utf-8")
+            self._file.write(data)
+            self._file.flush()
+            now = time.monotonic()
+            if self.fsync == "always" or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval):
+                os.fsync(self._file.fileno())
+                self._last_fsync = now
+            if self._file.tell() >= self.segment_bytes:
+                self._rotate_locked()
+
+    async def append(self, rows: list[dict]):
+        """Append rows to the active segment (file I/O runs in a worker thread)."""
+        await asyncio.to_thread(self._append_sync, rows)
+
+    def _dead_letter_sync(self, rows: list[dict], errors: list[str]):
+        path = os.path.join(self.directory, f"{_DEAD_LETTER_PREFIX}{datetime.utcnow():%Y%m%d}{_SEGMENT_SUFFIX}")
+        data = "".join(_encode_row({**r, "dead_letter_error": err}) + "\n" for r, err in zip(rows, errors))
+        with self._lock:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(data)
+                f.flush()
+                if self.fsync != "never":
+                    os.fsync(f.fileno())
+
+    async def dead_letter(self, rows: list[dict], errors: list[str]):
+        """Set rows aside that the database rejected, with the error for each (never replayed)."""
+        await asyncio.to_thread(self._dead_letter_sync, rows, errors)
+
+    def seal(self):
+        """Close the active segment so it becomes eligible for replay."""
+        with self._lock:
+            self._rotate_locked()
+
+    def sealed_segments(self) -> list[str]:
+        with self._lock:
+            active = self._file_path
+        return [p for p in self._segments() if p != active]
+
+    @staticmethod
+    def read_segment(path: str) -> list[dict]:
+        rows = []
+        with open(path, encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rows.append(_decode_row(line))
+                except Exception:
+                    # a torn final line after a crash; everything before it is intact
+                    logger.warning(f"Skipping unreadable spool record {os.path.basename(path)}:{lineno}")
+        return rows
+
+    @staticmethod
+    def remove_segment(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        self.seal()
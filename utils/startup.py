@@ -0,0 +1,69 @@
+# utils/startup.py
+import logging
+import time
+from contextlib import contextmanager
+logger = logging.getLogger(__name__)
+
+import psutil
+
+
+class StartupTimer:
+    """Per-stage timings of the startup pipeline, measured from process start.
+
+    `with timer.stage("database"):` times a stage (stages may overlap: the
+    DB stage runs while the gateway connects); mark() records a milestone
+    the first time it is reached. A stage that handles its own errors can
+    set `entry["ok"] = False`. Both are served on /health, /metrics and
+    /diagnose; log_summary() logs them once the bot is listening.
+    """
+
+    def __init__(self):
+        try:
+            self.process_start = psutil.Process().create_time()
+        except Exception:
+            self.process_start = time.time()
+        self.stages: dict[str, dict] = {}
+        self.milestones: dict[str, float] = {}
+
+    def elapsed(self) -> float:
+        """Seconds since the process started."""
+        return time.time() - self.process_start
+
+    def mark(self, name: str):
+        if name not in self.milestones:
+            self.milestones[name] = round(self.elapsed(), 3)
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.time()
+        entry = {"start": round(started - self.process_start, 3), "seconds": None, "ok": None}
+        self.stages[name] = entry
+        try:
+            yield entry
+            if entry["ok"] is None:
+                entry["ok"] = True
+        except BaseException:
+            entry["ok"] = False
+            raise
+        finally:
+            entry["seconds"] = round(time.time() - started, 3)
+            logger.info(f"Startup stage '{name}' took {entry['seconds']:.3f}s"
+                        f"{'' if entry['ok'] else ' (failed)'}")
+
+    @property
+    def complete(self) -> bool:
+        return "listening" in self.milestones
+
+    def summary(self) -> dict:
+        return {
+            "complete": self.complete,
+            "listening_after_seconds": self.milestones.get("listening"),
+            "milestones": dict(self.milestones),
+            "stages": {name: dict(entry) for name, entry in self.stages.items()},
+        }
+
+    def log_summary(self):
+        stages = ", ".join(f"{name} {e['seconds']:.2f}s" for name, e in self.stages.items()
+                           if e["seconds"] is not None)
+        milestones = ", ".join(f"{name} @{at:.2f}s" for name, at in self.milestones.items())
+        logger.info(f"Startup timings: {milestones} | stages: {stages or 'none'}")